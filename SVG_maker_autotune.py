@@ -0,0 +1,281 @@
+"""パス数・点数・SVGサイズの上限に合わせた抽出パラメータの自動調整
+
+画像の各所から切り出した窓（代理画像）でガウシアンサイズとCanny閾値の組み合わせを並列に評価し、上限を満たす中で
+エッジの網羅率（最も細かい候補で検出したエッジのうち、候補のパスの近くにあるものの割合）が
+最も高い組み合わせを選ぶ。ブラーはガウシアンサイズごとに1回だけ行い、Canny閾値の候補で使い回す。
+選んだ組み合わせだけを原寸で抽出して確認し、上限を超えた場合は見積もりを補正して次の候補を確認する。
+
+使い方:
+    python SVG_maker_autotune.py input.png --max-paths 300
+    python SVG_maker_autotune.py input.png --max-points 20000 --sheet candidates.png --output input.svg
+    python SVG_maker_autotune.py input.png --max-bytes 500000 --json result.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from SVG_maker_core import (MIN_CONTOUR_POINTS, blur_image, detect_edges, extract_edge_contours, read_image,
+                            simplify_paths)
+
+DEFAULT_GAUSSIAN_SIZES = (3, 5, 7, 11, 15, 21, 31)
+DEFAULT_CANNY1 = (25, 50, 100, 150, 200, 300)
+DEFAULT_CANNY_RATIOS = (2.0, 3.0)   # canny2 = canny1 × 比率
+PROXY_PIXELS = 640_000              # 代理画像（切り出した窓の合計）の画素数
+PROXY_WINDOWS = 3                   # 窓を縦横に並べる数（3なら9か所）
+BUDGETS = {"max_paths": "paths", "max_points": "points", "max_bytes": "bytes"}
+BYTES_PER_PATH = 70                 # SVGのパス1本あたりのおおよそのバイト数（要素と属性）
+BYTES_PER_POINT = 20                # 点1つあたりのおおよそのバイト数（"L x,y "）
+
+
+def sample_windows(image, pixels=PROXY_PIXELS, grid=PROXY_WINDOWS):
+    """画像の各所から原寸のまま切り出した窓のリストと、全体の面積に対する倍率を返す
+
+    縮小した画像ではノイズや細かな模様が平均されてパス数を大きく見誤るため、
+    代理画像は縮小せずに格子状に並べた窓を切り出して作る（画像が小さければ全体を1つの窓にする）。
+    """
+    h, w = image.shape[:2]
+    if h * w <= pixels:
+        return [image], 1.0
+    side = int((pixels / (grid * grid)) ** 0.5)
+    win_w, win_h = min(w, side), min(h, side)
+    windows = []
+    for row in range(grid):
+        for column in range(grid):
+            cx = int((column + 0.5) * w / grid)
+            cy = int((row + 0.5) * h / grid)
+            x0 = min(max(0, cx - win_w // 2), w - win_w)
+            y0 = min(max(0, cy - win_h // 2), h - win_h)
+            windows.append(image[y0:y0 + win_h, x0:x0 + win_w])
+    return windows, (h * w) / float(sum(window.shape[0] * window.shape[1] for window in windows))
+
+
+def candidate_grid(gaussian_sizes=DEFAULT_GAUSSIAN_SIZES, canny1_values=DEFAULT_CANNY1, ratios=DEFAULT_CANNY_RATIOS):
+    """評価する (gaussian_size, canny1, canny2) の組み合わせ"""
+    return [(g, c1, min(1000, int(round(c1 * ratio))))
+            for g in gaussian_sizes for c1 in canny1_values for ratio in ratios]
+
+
+def _count_points(contours, closed_flags, tolerance):
+    if tolerance <= 0:
+        return sum(len(contour) for contour in contours)
+    return sum(len(cv2.approxPolyDP(contour, tolerance, closed))
+               for contour, closed in zip(contours, closed_flags))
+
+
+def _evaluate_blur(windows, references, area_ratio, gaussian_size, canny_pairs, mode, tolerance, sheet_window):
+    """1つのガウシアンサイズで各窓のブラーを1回だけ行い、Canny閾値の候補をまとめて評価する"""
+    blurred = [blur_image(window, gaussian_size) for window in windows]
+    kernel = np.ones((3, 3), dtype=np.uint8)
+    reference_count = max(1, sum(int(np.count_nonzero(reference)) for reference in references))
+    results = []
+    for canny1, canny2 in canny_pairs:
+        paths = points = covered = 0
+        sheet_mask = None
+        for i, (image, reference) in enumerate(zip(blurred, references)):
+            edges = detect_edges(image, canny1, canny2)
+            _, valid_contours, closed_flags = extract_edge_contours(edges, mode, MIN_CONTOUR_POINTS)
+            mask = np.zeros_like(edges)
+            cv2.polylines(mask, valid_contours, False, 255)
+            covered += int(np.count_nonzero((cv2.dilate(mask, kernel) > 0) & reference))
+            paths += len(valid_contours)
+            points += _count_points(valid_contours, closed_flags, tolerance)
+            if i == sheet_window:
+                sheet_mask = mask
+        # 窓の合計から画像全体の値を面積比で見積もる
+        paths *= area_ratio
+        points *= area_ratio
+        results.append({
+            "gaussian_size": gaussian_size, "canny1": canny1, "canny2": canny2,
+            "paths": int(round(paths)),
+            "points": int(round(points)),
+            "bytes": int(round(paths * BYTES_PER_PATH + points * BYTES_PER_POINT)),
+            "coverage": covered / reference_count,
+            "mask": sheet_mask,
+        })
+    return results
+
+
+def evaluate_candidates(image, candidates, mode="contour", tolerance=1.0, proxy_pixels=PROXY_PIXELS, workers=None):
+    """代理画像で全候補を評価し、(評価結果のリスト, 一覧画像に使う窓) を返す"""
+    windows, area_ratio = sample_windows(image, proxy_pixels)
+    # 網羅率の基準は最も細かい候補（最小のブラーと閾値）で検出したエッジ
+    finest = min(candidates)
+    references = [detect_edges(blur_image(window, finest[0]), finest[1], finest[2]) > 0 for window in windows]
+    # 一覧画像には最もエッジの多い窓を使う
+    sheet_window = int(np.argmax([np.count_nonzero(reference) for reference in references]))
+
+    by_blur = {}
+    for gaussian_size, canny1, canny2 in candidates:
+        by_blur.setdefault(gaussian_size, []).append((canny1, canny2))
+    with ThreadPoolExecutor(max_workers=workers or min(len(by_blur), os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(_evaluate_blur, windows, references, area_ratio, g, pairs, mode, tolerance,
+                                   sheet_window)
+                   for g, pairs in by_blur.items()]
+        results = [result for future in futures for result in future.result()]
+    return results, windows[sheet_window]
+
+
+def rank_candidates(results, budgets, calibration=None):
+    """上限を満たす候補を網羅率の高い順に並べる（calibrationは見積もりに掛ける補正係数）"""
+    calibration = calibration or {}
+    feasible = []
+    for result in results:
+        if all(result[metric] * calibration.get(metric, 1.0) <= budgets[name]
+               for name, metric in BUDGETS.items() if budgets.get(name) is not None):
+            feasible.append(result)
+    # 網羅率が同じなら点数の少ない方を選ぶ
+    return sorted(feasible, key=lambda r: (-r["coverage"], r["points"], r["gaussian_size"], r["canny1"]))
+
+
+def confirm_candidate(image, candidate, mode="contour", tolerance=1.0):
+    """候補のパラメータで原寸の画像を抽出し、実際のパス数・点数・SVGのバイト数を返す"""
+    from SVG_maker_headless import make_headless_editor, set_headless_image
+
+    editor = make_headless_editor({"gaussian_size": candidate["gaussian_size"], "canny1": candidate["canny1"],
+                                   "canny2": candidate["canny2"], "extraction_mode": mode,
+                                   "simplify_tolerance": tolerance})
+    editor.redraw_suspended = True
+    set_headless_image(editor, image)
+    editor.update_edges()
+    svg_text = editor.export_svg_text()
+    paths = simplify_paths(editor.smoothed_paths, tolerance) if tolerance > 0 else editor.smoothed_paths
+    return {"paths": len(editor.smoothed_paths), "points": sum(len(path) for path in paths),
+            "bytes": len(svg_text.encode("utf-8"))}, svg_text
+
+
+def autotune(image, budgets, candidates=None, mode="contour", tolerance=1.0, proxy_pixels=PROXY_PIXELS,
+             workers=None, max_confirm=4):
+    """上限を満たし網羅率が最も高いパラメータを探す
+
+    戻り値は {"best": 採用した候補（原寸での値 "confirmed" 付き、無ければNone）, "results": 全候補,
+    "proxy": 一覧画像に使う窓, "svg": 採用した候補のSVG文字列, "seconds": {段階: 秒}}。
+    """
+    seconds = {}
+    start = time.perf_counter()
+    results, proxy = evaluate_candidates(image, candidates or candidate_grid(), mode, tolerance, proxy_pixels, workers)
+    seconds["proxy_search"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calibration = {}
+    best, svg_text = None, None
+    confirmed_keys = set()
+    for _ in range(max_confirm):
+        ranked = [r for r in rank_candidates(results, budgets, calibration)
+                  if (r["gaussian_size"], r["canny1"], r["canny2"]) not in confirmed_keys]
+        if not ranked:
+            break
+        candidate = ranked[0]
+        confirmed_keys.add((candidate["gaussian_size"], candidate["canny1"], candidate["canny2"]))
+        actual, text = confirm_candidate(image, candidate, mode, tolerance)
+        candidate["confirmed"] = actual
+        if all(actual[metric] <= budgets[name] for name, metric in BUDGETS.items() if budgets.get(name) is not None):
+            best, svg_text = candidate, text
+            break
+        # 原寸で上限を超えたら、その候補の実測値と見積もりの比で以降の見積もりを補正する
+        for metric in BUDGETS.values():
+            if candidate[metric] > 0:
+                calibration[metric] = max(calibration.get(metric, 1.0), actual[metric] / candidate[metric])
+    seconds["confirm"] = time.perf_counter() - start
+    return {"best": best, "results": results, "proxy": proxy, "svg": svg_text, "seconds": seconds}
+
+
+def contact_sheet(results, proxy_shape, best=None, thumb=200, columns=None):
+    """評価した候補のエッジ（最もエッジの多い窓）を縮小画像の一覧にする（採用した候補は赤枠）"""
+    h, w = proxy_shape[:2]
+    scale = thumb / max(h, w)
+    tw, th = max(1, int(w * scale)), max(1, int(h * scale))
+    label_height = 34
+    columns = columns or int(np.ceil(np.sqrt(len(results))))
+    rows = int(np.ceil(len(results) / columns))
+    sheet = np.full((rows * (th + label_height), columns * tw, 3), 255, dtype=np.uint8)
+    for i, result in enumerate(results):
+        row, column = divmod(i, columns)
+        x, y = column * tw, row * (th + label_height)
+        tile = cv2.resize(255 - result["mask"], (tw, th), interpolation=cv2.INTER_AREA)
+        sheet[y:y + th, x:x + tw] = cv2.cvtColor(tile, cv2.COLOR_GRAY2BGR)
+        text = f"g{result['gaussian_size']} c{result['canny1']}/{result['canny2']}"
+        cv2.putText(sheet, text, (x + 3, y + th + 13), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+        text = f"{result['paths']}p {result['points']}pt {result['coverage']:.0%}"
+        cv2.putText(sheet, text, (x + 3, y + th + 28), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (80, 80, 80), 1, cv2.LINE_AA)
+        color = (0, 0, 255) if result is best else (200, 200, 200)
+        cv2.rectangle(sheet, (x, y), (x + tw - 1, y + th + label_height - 1), color, 3 if result is best else 1)
+    return sheet
+
+
+def write_image(path, image):
+    """画像を保存する（日本語パス対応）"""
+    ok, data = cv2.imencode(os.path.splitext(path)[1] or ".png", image)
+    if not ok:
+        raise ValueError(f"画像を保存できません: {path}")
+    data.tofile(path)
+
+
+def _parse_values(text, kind=int):
+    return tuple(kind(value) for value in text.split(",") if value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="上限に合わせて抽出パラメータを自動調整する")
+    parser.add_argument("image")
+    parser.add_argument("--max-paths", type=int, help="パス数の上限")
+    parser.add_argument("--max-points", type=int, help="点数（簡略化後）の上限")
+    parser.add_argument("--max-bytes", type=int, help="SVGのサイズ（バイト）の上限")
+    parser.add_argument("--extraction-mode", choices=["contour", "centerline"], default="contour")
+    parser.add_argument("--simplify-tolerance", type=float, default=1.0)
+    parser.add_argument("--gaussian-sizes", default=",".join(map(str, DEFAULT_GAUSSIAN_SIZES)))
+    parser.add_argument("--canny1", default=",".join(map(str, DEFAULT_CANNY1)), help="Canny閾値1の候補（カンマ区切り）")
+    parser.add_argument("--canny-ratios", default=",".join(map(str, DEFAULT_CANNY_RATIOS)),
+                        help="Canny閾値2 = 閾値1 × 比率 の比率の候補")
+    parser.add_argument("--proxy-pixels", type=int, default=PROXY_PIXELS, help="代理画像（切り出す窓の合計）の画素数")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--sheet", help="候補の一覧画像（PNG）の保存先")
+    parser.add_argument("--output", help="採用したパラメータで原寸から作ったSVGの保存先")
+    parser.add_argument("--json", help="全候補の評価結果をJSONで保存する")
+    args = parser.parse_args(argv)
+
+    budgets = {name: getattr(args, name) for name in BUDGETS}
+    if all(value is None for value in budgets.values()):
+        parser.error("--max-paths / --max-points / --max-bytes のいずれかを指定してください")
+    image = read_image(args.image)
+    if image is None:
+        print(f"画像を読み込めません: {args.image}", file=sys.stderr)
+        return 1
+
+    candidates = candidate_grid(_parse_values(args.gaussian_sizes), _parse_values(args.canny1),
+                                _parse_values(args.canny_ratios, float))
+    result = autotune(image, budgets, candidates, args.extraction_mode, args.simplify_tolerance,
+                      args.proxy_pixels, args.workers)
+    best = result["best"]
+    print(f"{len(candidates)}候補を評価（代理画像 {result['seconds']['proxy_search']:.2f}秒、"
+          f"原寸での確認 {result['seconds']['confirm']:.2f}秒）", file=sys.stderr)
+
+    if args.sheet:
+        write_image(args.sheet, contact_sheet(result["results"], result["proxy"].shape, best))
+    if args.json:
+        fields = ("gaussian_size", "canny1", "canny2", "paths", "points", "bytes", "coverage", "confirmed")
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"budgets": budgets, "seconds": result["seconds"],
+                       "best": {k: best[k] for k in fields if k in best} if best else None,
+                       "candidates": [{k: r[k] for k in fields if k in r} for r in result["results"]]},
+                      f, ensure_ascii=False, indent=2)
+    if best is None:
+        print("上限を満たすパラメータが見つかりませんでした", file=sys.stderr)
+        return 1
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(result["svg"])
+    confirmed = best["confirmed"]
+    print(f"--gaussian-size {best['gaussian_size']} --canny1 {best['canny1']} --canny2 {best['canny2']}"
+          f"  （{confirmed['paths']}パス / {confirmed['points']}点 / {confirmed['bytes']}バイト、"
+          f"網羅率 {best['coverage']:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
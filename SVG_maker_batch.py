@@ -0,0 +1,584 @@
+"""マニフェスト駆動の一括変換（再開・分割実行・複数ノード対応）
+
+キューディレクトリの構成:
+    queue.json       変換パラメータと作成日時
+    manifest.jsonl   作業項目（1行1件: id, source, output）
+    state/xx/<id>.running  処理中の印（O_EXCLで作成した者だけが処理する）
+    state/xx/<id>.done     完了（所要時間などのJSON、一時ファイルからの置き換えで作成）
+    state/xx/<id>.failed   失敗（エラー内容のJSON）
+印が何もない項目が未処理。中央のサーバーを置かず、共有ディスク（NFSなど）上のファイル操作だけで
+複数ノードが同じキューから項目を取り合う。中断した実行は同じコマンドで再開でき、完了済みは飛ばす。
+更新時刻が --stale-seconds より古い .running は止まったノードの残りとみなして取り直す。
+
+--pipeline を付けると、読み込み・デコード（スレッド）、輪郭抽出（プロセスプール）、SVG書き出し（スレッド）を
+上限付きの待ち行列でつないだ段階別のパイプラインで処理する。NFSからの読み込みやSVGの書き出しを
+他の画像の輪郭抽出と重ねて行い、終了時に段階ごとの稼働率と待ち行列の長さを表示する。
+
+使い方:
+    python SVG_maker_batch.py init queue/ --input images/ --output-dir svg/ --canny1 80
+    python SVG_maker_batch.py run queue/ --workers 4            # このマシンで4プロセス
+    python SVG_maker_batch.py run queue/ --shard 0/3            # 3台のうち1台目の担当分
+    python SVG_maker_batch.py run queue/ --pipeline --workers 4 --readers 2 --writers 2 --depth 8
+    python SVG_maker_batch.py status queue/
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import statistics
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from SVG_maker_journal import EXTRACT_PARAMS
+
+QUEUE_FILE = "queue.json"
+MANIFEST_FILE = "manifest.jsonl"
+STATE_DIR = "state"
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.bmp", "*.tif", "*.tiff")
+
+
+def item_id(source):
+    """入力パスから決まる作業項目ID"""
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:20]
+
+
+def _state_path(queue_dir, item, status):
+    return os.path.join(queue_dir, STATE_DIR, item["id"][:2], f"{item['id']}.{status}")
+
+
+def _write_json_atomic(path, data):
+    temp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def init_queue(queue_dir, input_dir, output_dir, params, patterns=IMAGE_PATTERNS):
+    """入力ディレクトリ以下の画像からマニフェストを作る（既存のマニフェストには新しい画像だけ追加）"""
+    os.makedirs(os.path.join(queue_dir, STATE_DIR), exist_ok=True)
+    manifest_path = os.path.join(queue_dir, MANIFEST_FILE)
+    known = {item["id"] for item in load_manifest(queue_dir)} if os.path.exists(manifest_path) else set()
+
+    added = 0
+    with open(manifest_path, "a", encoding="utf-8") as f:
+        for root, dirs, files in os.walk(input_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if not any(fnmatch.fnmatch(name.lower(), pattern) for pattern in patterns):
+                    continue
+                source = os.path.abspath(os.path.join(root, name))
+                relative = os.path.relpath(source, os.path.abspath(input_dir))
+                item = {
+                    "id": item_id(source),
+                    "source": source,
+                    "output": os.path.abspath(os.path.join(output_dir, os.path.splitext(relative)[0] + ".svg")),
+                }
+                if item["id"] in known:
+                    continue
+                known.add(item["id"])
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                added += 1
+    _write_json_atomic(os.path.join(queue_dir, QUEUE_FILE), {"params": params, "created": time.time()})
+    return added
+
+
+def load_manifest(queue_dir):
+    items = []
+    with open(os.path.join(queue_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                items.append(json.loads(line))
+    return items
+
+
+def item_status(queue_dir, item):
+    """pending / running / done / failed"""
+    for status in ("done", "failed", "running"):
+        if os.path.exists(_state_path(queue_dir, item, status)):
+            return status
+    return "pending"
+
+
+def _remove_stale_lock(lock_path, observed, stale_seconds):
+    """古い .running（observed はその stat）を取り除く（取り除けたらTrue）
+
+    同じ古い印を複数のノードが同時に見つけても取り直すのが1ノードだけになるよう、古い印ごとの
+    取り直しの印を O_EXCL で作れたノードだけが、印がまだ見つけたときのものかを確かめてから取り除く。
+    先に取り直したノードの新しい印は更新時刻が変わるため、後から来たノードは取り除かない。
+    """
+    marker_path = f"{lock_path}.reclaim.{observed.st_mtime_ns}"
+    try:
+        fd = os.open(marker_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # 取り直しの途中で止まったノードの印は、十分に古ければ消して次の機会に取り直す
+        try:
+            if time.time() - os.stat(marker_path).st_mtime >= stale_seconds:
+                os.remove(marker_path)
+        except FileNotFoundError:
+            pass
+        return False
+    os.close(fd)
+    try:
+        try:
+            current = os.stat(lock_path)
+        except FileNotFoundError:
+            return True
+        if current.st_mtime_ns != observed.st_mtime_ns or current.st_ino != observed.st_ino:
+            return False
+        os.remove(lock_path)
+        return True
+    finally:
+        try:
+            os.remove(marker_path)
+        except FileNotFoundError:
+            pass
+
+
+def claim(queue_dir, item, stale_seconds, retry_failed=False):
+    """項目の処理権を取る（取れたらTrue）。止まったノードの古い .running は取り直す"""
+    if os.path.exists(_state_path(queue_dir, item, "done")):
+        return False
+    failed_path = _state_path(queue_dir, item, "failed")
+    if os.path.exists(failed_path) and not retry_failed:
+        return False
+
+    lock_path = _state_path(queue_dir, item, "running")
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    owner = json.dumps({"host": socket.gethostname(), "pid": os.getpid(), "claimed": time.time()})
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                observed = os.stat(lock_path)
+            except FileNotFoundError:
+                continue
+            if time.time() - observed.st_mtime < stale_seconds:
+                return False
+            if not _remove_stale_lock(lock_path, observed, stale_seconds):
+                return False
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(owner)
+        # 完了の記録と行き違いになった場合は処理しない
+        if os.path.exists(_state_path(queue_dir, item, "done")):
+            os.remove(lock_path)
+            return False
+        return True
+    return False
+
+
+def finish(queue_dir, item, status, record):
+    """結果を記録して処理中の印を外す"""
+    _write_json_atomic(_state_path(queue_dir, item, status), record)
+    if status == "done":
+        try:
+            os.remove(_state_path(queue_dir, item, "failed"))
+        except FileNotFoundError:
+            pass
+    try:
+        os.remove(_state_path(queue_dir, item, "running"))
+    except FileNotFoundError:
+        pass
+
+
+def convert_item(editor, item):
+    """1枚を変換し、段階ごとの所要時間を返す"""
+    from SVG_maker_headless import load_headless_image
+
+    stages = {}
+    start = time.perf_counter()
+    if not load_headless_image(editor, item["source"]):
+        raise ValueError(f"画像を読み込めません: {item['source']}")
+    stages["decode"] = time.perf_counter() - start
+    editor.update_edges()
+    for event in editor.profiler.last_operation():
+        if event["depth"] <= 1:
+            stages[event["name"]] = event["duration"]
+
+    os.makedirs(os.path.dirname(item["output"]), exist_ok=True)
+    temp_output = f"{item['output']}.{socket.gethostname()}.{os.getpid()}.tmp"
+    editor.export_svg(temp_output)
+    os.replace(temp_output, item["output"])
+    stages["save_svg"] = editor.profiler.last_root["duration"]
+    return stages, {"paths": len(editor.smoothed_paths), "width": editor.w, "height": editor.h}
+
+
+def run_worker(queue_dir, shard=(0, 1), worker=(0, 1), stale_seconds=3600, retry_failed=False,
+               cache_dir=None, limit=None):
+    """キューから項目を取りながら変換する（1ノード・1プロセス分）。処理件数を返す"""
+    from SVG_maker_headless import make_headless_editor
+
+    with open(os.path.join(queue_dir, QUEUE_FILE), "r", encoding="utf-8") as f:
+        params = json.load(f)["params"]
+    editor = make_headless_editor(dict(params, cache_dir=cache_dir))
+    editor.redraw_suspended = True
+
+    shard_index, shard_count = shard
+    items = [item for i, item in enumerate(load_manifest(queue_dir)) if i % shard_count == shard_index]
+    # 同じ担当分を複数プロセスで処理するとき、取り合いを減らすため開始位置をずらす
+    worker_index, worker_count = worker
+    offset = len(items) * worker_index // max(1, worker_count)
+    items = items[offset:] + items[:offset]
+
+    node = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    for item in items:
+        if limit is not None and processed >= limit:
+            break
+        if not claim(queue_dir, item, stale_seconds, retry_failed):
+            continue
+        started = time.time()
+        try:
+            stages, counts = convert_item(editor, item)
+        except Exception as e:
+            finish(queue_dir, item, "failed", {
+                "node": node, "started": started, "finished": time.time(),
+                "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc(),
+            })
+        else:
+            finish(queue_dir, item, "done", {
+                "node": node, "started": started, "finished": time.time(),
+                "seconds": time.time() - started, "stages": stages, "counts": counts,
+            })
+        processed += 1
+    return processed
+
+
+def _worker_process(queue_dir, shard, worker, stale_seconds, retry_failed, cache_dir, limit):
+    run_worker(queue_dir, shard, worker, stale_seconds, retry_failed, cache_dir, limit)
+
+
+def run_local(queue_dir, workers, shard=(0, 1), stale_seconds=3600, retry_failed=False, cache_dir=None, limit=None):
+    """このマシンで複数プロセスを起動して処理する（各プロセスが別ノードとして振る舞う）"""
+    if workers <= 1:
+        run_worker(queue_dir, shard, (0, 1), stale_seconds, retry_failed, cache_dir, limit)
+        return
+    processes = [multiprocessing.Process(target=_worker_process,
+                                         args=(queue_dir, shard, (i, workers), stale_seconds, retry_failed,
+                                               cache_dir, limit))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+_pipeline_editor = None  # パイプラインの輪郭抽出プロセスごとのヘッドレスエディタ
+_END = object()          # 待ち行列の終わりの印
+
+
+def _init_pipeline_worker(params, cache_dir):
+    """輪郭抽出プロセスの初期化（重いモジュールの読み込みとエディタの作成をここで済ませる）"""
+    global _pipeline_editor
+    from SVG_maker_headless import make_headless_editor
+    _pipeline_editor = make_headless_editor(dict(params, cache_dir=cache_dir))
+    _pipeline_editor.redraw_suspended = True
+
+
+def _pipeline_compute(image, source):
+    """輪郭抽出と保存前の簡略化を行い、(簡略化したパス, {段階名: 秒}, 件数) を返す"""
+    from SVG_maker_core import simplify_paths
+    from SVG_maker_headless import set_headless_image
+
+    start = time.perf_counter()
+    editor = _pipeline_editor
+    set_headless_image(editor, image, source)
+    editor.update_edges()
+    stages = {event["name"]: event["duration"] for event in editor.profiler.last_operation() if event["depth"] <= 1}
+    # export_svg と同じく（許容誤差が0より大きいときだけ）全パスをまとめて簡略化しておき、
+    # 書き出し段階は文字列化と保存だけにする
+    tolerance = editor.get_simplify_tolerance()
+    paths = simplify_paths(editor.smoothed_paths, tolerance) if tolerance > 0 else editor.smoothed_paths
+    stages["compute"] = time.perf_counter() - start
+    return paths, stages, {"paths": len(editor.smoothed_paths), "width": editor.w, "height": editor.h}
+
+
+class PipelineStats:
+    """段階ごとの稼働時間と、段階間の待ち行列の長さ（一定間隔で標本を取る）"""
+
+    def __init__(self, workers):
+        self.workers = dict(workers)    # {段階名: 並列数}
+        self.busy = {name: 0.0 for name in self.workers}
+        self.items = {name: 0 for name in self.workers}
+        self.depths = {}                # {待ち行列名: [標本]}
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.busy[stage] += seconds
+            self.items[stage] += 1
+
+    def sample(self, depths):
+        with self._lock:
+            for name, depth in depths.items():
+                self.depths.setdefault(name, []).append(depth)
+
+    def report(self):
+        """段階ごとの件数・稼働率（稼働時間 / (経過時間 × 並列数)）と待ち行列の平均・最大の長さ"""
+        wall = max(1e-9, time.perf_counter() - self.started)
+        with self._lock:
+            return {
+                "wall_seconds": wall,
+                "stages": {name: {"workers": workers, "items": self.items[name], "busy_seconds": self.busy[name],
+                                  "utilization": self.busy[name] / (wall * workers)}
+                           for name, workers in self.workers.items()},
+                "queues": {name: {"mean": statistics.fmean(samples), "max": max(samples)}
+                           for name, samples in self.depths.items() if samples},
+            }
+
+
+def run_pipeline(queue_dir, shard=(0, 1), workers=2, readers=2, writers=2, depth=4, stale_seconds=3600,
+                 retry_failed=False, cache_dir=None, limit=None, sample_interval=0.05):
+    """読み込み・デコード → 輪郭抽出 → SVG書き出しの段階別パイプラインで担当分を変換し、段階の統計を返す
+
+    段階の間は長さ depth の待ち行列でつなぎ、後ろの段階が詰まったら前の段階が待つ。
+    輪郭抽出に同時に渡すのは workers + depth 枚まで。
+    """
+    import cv2
+    import numpy as np
+    from SVG_maker_core import write_svg
+
+    with open(os.path.join(queue_dir, QUEUE_FILE), "r", encoding="utf-8") as f:
+        params = json.load(f)["params"]
+    shard_index, shard_count = shard
+    items = iter([item for i, item in enumerate(load_manifest(queue_dir)) if i % shard_count == shard_index])
+    items_lock = threading.Lock()
+    claimed = [0]
+    node = f"{socket.gethostname()}:{os.getpid()}"
+    stats = PipelineStats({"read": readers, "decode": readers, "compute": workers, "write": writers})
+    decoded = queue.Queue(depth)
+    results = queue.Queue(depth)
+    pending = set()
+    stop = threading.Event()
+
+    def fail(item, started, error):
+        finish(queue_dir, item, "failed", {
+            "node": node, "started": started, "finished": time.time(), "error": error,
+        })
+
+    def next_item():
+        with items_lock:
+            for item in items:
+                if limit is not None and claimed[0] >= limit:
+                    return None
+                if claim(queue_dir, item, stale_seconds, retry_failed):
+                    claimed[0] += 1
+                    return item
+            return None
+
+    def reader():
+        try:
+            while True:
+                item = next_item()
+                if item is None:
+                    return
+                started = time.time()
+                try:
+                    start = time.perf_counter()
+                    data = np.fromfile(item["source"], dtype=np.uint8)
+                    read = time.perf_counter() - start
+                    stats.add("read", read)
+                    start = time.perf_counter()
+                    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+                    decode = time.perf_counter() - start
+                    stats.add("decode", decode)
+                except Exception as e:  # 壊れた画像で cv2.error などが出ても読み込み側を止めない
+                    fail(item, started, f"{type(e).__name__}: {e}")
+                    continue
+                if image is None:
+                    fail(item, started, f"ValueError: 画像を読み込めません: {item['source']}")
+                    continue
+                decoded.put((item, started, image, {"read": read, "decode": decode}))
+        finally:
+            decoded.put(_END)
+
+    def writer():
+        while True:
+            entry = results.get()
+            if entry is _END:
+                return
+            item, started, paths, stages, counts = entry
+            try:
+                start = time.perf_counter()
+                os.makedirs(os.path.dirname(item["output"]), exist_ok=True)
+                temp_output = f"{item['output']}.{socket.gethostname()}.{os.getpid()}.tmp"
+                write_svg(paths, counts["width"], counts["height"], temp_output)
+                os.replace(temp_output, item["output"])
+                stages["write"] = time.perf_counter() - start
+                stats.add("write", stages["write"])
+            except Exception as e:
+                fail(item, started, f"{type(e).__name__}: {e}")
+                continue
+            finish(queue_dir, item, "done", {
+                "node": node, "started": started, "finished": time.time(),
+                "seconds": time.time() - started, "stages": stages, "counts": counts,
+            })
+
+    def monitor():
+        while not stop.wait(sample_interval):
+            stats.sample({"decoded": decoded.qsize(), "compute": len(pending), "write": results.qsize()})
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, daemon=True) for _ in range(writers)]
+    threads.append(threading.Thread(target=monitor, daemon=True))
+    for thread in threads:
+        thread.start()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pipeline_worker,
+                             initargs=(params, cache_dir)) as executor:
+        submitted = {}
+        running_readers = readers
+        while running_readers or pending:
+            if running_readers and len(pending) < workers + depth:
+                # 輪郭抽出に空きがあればデコード済みの画像を渡す（処理中があれば終わったものの回収も見る）
+                try:
+                    entry = decoded.get(timeout=sample_interval if pending else None)
+                except queue.Empty:
+                    entry = None
+                if entry is _END:
+                    running_readers -= 1
+                elif entry is not None:
+                    item, started, image, stages = entry
+                    future = executor.submit(_pipeline_compute, image, item["source"])
+                    submitted[future] = (item, started, stages)
+                    pending.add(future)
+                done, _ = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                item, started, stages = submitted.pop(future)
+                try:
+                    paths, compute_stages, counts = future.result()
+                except Exception as e:
+                    fail(item, started, f"{type(e).__name__}: {e}")
+                    continue
+                stats.add("compute", compute_stages["compute"])
+                stages.update(compute_stages)
+                results.put((item, started, paths, stages, counts))   # 書き出しが詰まっていればここで待つ
+
+    for _ in range(writers):
+        results.put(_END)
+    for thread in threads[readers:-1]:
+        thread.join()
+    stop.set()
+    return stats.report()
+
+
+def queue_report(queue_dir):
+    """状態ごとの件数と、完了分の所要時間・スループット（ノード別）を集計する"""
+    counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+    durations = []
+    stage_totals = {}
+    nodes = {}
+    first_start = last_finish = None
+    for item in load_manifest(queue_dir):
+        status = item_status(queue_dir, item)
+        counts[status] += 1
+        if status != "done":
+            continue
+        try:
+            with open(_state_path(queue_dir, item, "done"), "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        durations.append(record["seconds"])
+        for stage, seconds in record.get("stages", {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+        node = nodes.setdefault(record["node"], {"items": 0, "seconds": 0.0})
+        node["items"] += 1
+        node["seconds"] += record["seconds"]
+        first_start = record["started"] if first_start is None else min(first_start, record["started"])
+        last_finish = record["finished"] if last_finish is None else max(last_finish, record["finished"])
+
+    report = {"counts": counts, "nodes": nodes, "stage_totals": stage_totals}
+    if durations:
+        ordered = sorted(durations)
+        wall = max(1e-9, last_finish - first_start)
+        report.update({
+            "median_seconds": statistics.median(ordered),
+            "p95_seconds": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            "wall_seconds": wall,
+            "items_per_second": len(durations) / wall,
+        })
+    return report
+
+
+def _parse_fraction(text):
+    index, count = (int(value) for value in text.split("/"))
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"不正な分割指定です: {text}")
+    return index, count
+
+
+def main(argv=None):
+    from SVG_maker_edges import DEFAULT_EDGE_METHOD, EDGE_BACKENDS
+
+    parser = argparse.ArgumentParser(description="マニフェスト駆動の一括変換")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = commands.add_parser("init", help="入力ディレクトリからキューを作成（再実行で新しい画像を追加）")
+    init_parser.add_argument("queue_dir")
+    init_parser.add_argument("--input", required=True)
+    init_parser.add_argument("--output-dir", required=True)
+    init_parser.add_argument("--gaussian-size", type=int, default=15)
+    init_parser.add_argument("--canny1", type=int, default=200)
+    init_parser.add_argument("--canny2", type=int, default=300)
+    init_parser.add_argument("--extraction-mode", choices=["contour", "centerline"], default="contour")
+    init_parser.add_argument("--simplify-tolerance", type=float, default=1.0)
+    init_parser.add_argument("--edge-method", choices=list(EDGE_BACKENDS), default=DEFAULT_EDGE_METHOD)
+
+    run_parser = commands.add_parser("run", help="キューの未処理項目を変換")
+    run_parser.add_argument("queue_dir")
+    run_parser.add_argument("--workers", type=int, default=1, help="このマシンで起動するプロセス数")
+    run_parser.add_argument("--shard", type=_parse_fraction, default=(0, 1), help="担当分 i/n（manifestのi番目から n件おき）")
+    run_parser.add_argument("--stale-seconds", type=float, default=3600)
+    run_parser.add_argument("--retry-failed", action="store_true")
+    run_parser.add_argument("--cache-dir", help="抽出結果のキャッシュの保存先")
+    run_parser.add_argument("--limit", type=int, help="1プロセスあたりの最大処理件数")
+    run_parser.add_argument("--pipeline", action="store_true",
+                            help="読み込み・輪郭抽出・書き出しを段階別に重ねて処理（--workers は輪郭抽出のプロセス数）")
+    run_parser.add_argument("--readers", type=int, default=2, help="--pipeline の読み込み・デコードのスレッド数")
+    run_parser.add_argument("--writers", type=int, default=2, help="--pipeline のSVG書き出しのスレッド数")
+    run_parser.add_argument("--depth", type=int, default=4, help="--pipeline の段階間の待ち行列の長さ")
+
+    status_parser = commands.add_parser("status", help="進み具合とスループットを表示")
+    status_parser.add_argument("queue_dir")
+
+    args = parser.parse_args(argv)
+    if args.command == "init":
+        params = {name: getattr(args, name) for name in EXTRACT_PARAMS}
+        added = init_queue(args.queue_dir, args.input, args.output_dir, params)
+        print(f"{added}件を追加しました")
+    elif args.command == "run":
+        started = time.time()
+        if args.pipeline:
+            report = run_pipeline(args.queue_dir, args.shard, max(1, args.workers), max(1, args.readers),
+                                  max(1, args.writers), max(1, args.depth), args.stale_seconds, args.retry_failed,
+                                  args.cache_dir, args.limit)
+            for name, stage in report["stages"].items():
+                print(f"{name:<8} {stage['items']:>6}件 稼働率{stage['utilization'] * 100:5.1f}% "
+                      f"({stage['workers']}並列, {stage['busy_seconds']:.1f}秒)", file=sys.stderr)
+            for name, depth in report["queues"].items():
+                print(f"待ち行列 {name:<8} 平均{depth['mean']:.1f} 最大{depth['max']}", file=sys.stderr)
+        else:
+            run_local(args.queue_dir, args.workers, args.shard, args.stale_seconds, args.retry_failed,
+                      args.cache_dir, args.limit)
+        print(f"処理時間: {time.time() - started:.1f}秒", file=sys.stderr)
+        print(json.dumps(queue_report(args.queue_dir)["counts"], ensure_ascii=False))
+    elif args.command == "status":
+        print(json.dumps(queue_report(args.queue_dir), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
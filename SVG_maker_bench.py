@@ -0,0 +1,382 @@
+"""輪郭抽出ツールの処理段階ごとのベンチマーク
+
+決定的に生成した合成画像（線画・ノイズ入り写真・密な文字・大判スキャン）に対して、
+読み込み・エッジ検出の各段階（Cannyならブラー・Canny）・輪郭抽出・スプライン補間・描画（オフスクリーンAgg）・
+パス再生成・消しゴム/ペン処理・SVG保存・プロジェクト保存/読込・キャッシュからの復元の時間と、ドラッグ中の描画遅延（p95）を
+個別に計測し、JSONで出力する。
+
+使い方:
+    python SVG_maker_bench.py --sizes 1,8 --output bench.json
+    python SVG_maker_bench.py --sizes 1,8 --baseline bench.json --tolerance 0.2
+    python SVG_maker_bench.py --startup --kinds "" --output startup.json
+--startup を付けるとGUIの起動時間（モジュール読み込み、表示環境があればウィンドウ表示まで）も計測する。
+基準JSONを指定すると各段階の閾値（基準値 × (1 + tolerance)）を超えた段階を報告し、終了コード1を返す。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from SVG_maker_headless import MouseEvent, make_headless_editor, set_headless_renderer
+from SVG_maker_core import PathPyramid, extract_edge_contours, read_image, simplify_paths
+from SVG_maker_edges import DEFAULT_EDGE_METHOD, EDGE_BACKENDS, get_backend
+from SVG_maker_project import PROJECT_EXTENSION
+from SVG_maker_raster import RENDERERS
+
+KINDS = ("line_art", "photo_noise", "dense_text", "scan")
+DEFAULT_SIZES = (1, 8)  # メガピクセル（32, 100 は --sizes で指定）
+
+
+def generate_image(kind, megapixels, seed=0):
+    """種類とサイズ（メガピクセル）から決定的な合成画像を生成する"""
+    side = int(round((megapixels * 1_000_000) ** 0.5))
+    w = side * 4 // 3
+    h = int(megapixels * 1_000_000) // w
+    rng = np.random.default_rng(seed)
+    scale = side / 1000
+
+    if kind == "line_art":
+        img = np.full((h, w, 3), 255, dtype=np.uint8)
+        for _ in range(int(60 * megapixels ** 0.5)):
+            center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            radius = int(rng.integers(10, 120) * scale) + 1
+            cv2.circle(img, center, radius, (0, 0, 0), max(1, int(3 * scale)))
+        for _ in range(int(80 * megapixels ** 0.5)):
+            p1 = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            p2 = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            cv2.line(img, p1, p2, (0, 0, 0), max(1, int(2 * scale)))
+        return img
+
+    if kind == "photo_noise":
+        yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+        base = 128 + 60 * np.sin(xx / (w / 7)) * np.cos(yy / (h / 5))
+        img = np.repeat(base[:, :, None], 3, axis=2)
+        for _ in range(int(25 * megapixels ** 0.5)):
+            center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            axes = (int(rng.integers(20, 200) * scale) + 1, int(rng.integers(20, 200) * scale) + 1)
+            color = tuple(float(c) for c in rng.integers(0, 255, 3))
+            cv2.ellipse(img, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+        img += rng.normal(0, 12, img.shape).astype(np.float32)
+        return np.clip(img, 0, 255).astype(np.uint8)
+
+    if kind == "dense_text":
+        img = np.full((h, w, 3), 255, dtype=np.uint8)
+        font_scale = 0.8 * scale + 0.2
+        line_height = int(30 * font_scale) + 4
+        chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+        for y in range(line_height, h, line_height):
+            text = "".join(chars[i] for i in rng.integers(0, len(chars), max(1, w // int(18 * font_scale + 1))))
+            cv2.putText(img, text, (5, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), 1, cv2.LINE_AA)
+        return img
+
+    if kind == "scan":
+        paper = rng.normal(235, 6, (h, w)).astype(np.float32)
+        img = np.repeat(paper[:, :, None], 3, axis=2)
+        margin = w // 12
+        for y in range(margin, h - margin, max(8, int(40 * scale))):
+            if rng.random() < 0.8:
+                x_end = int(margin + (w - 2 * margin) * rng.uniform(0.4, 1.0))
+                cv2.rectangle(img, (margin, y), (x_end, y + max(2, int(12 * scale))), (40, 40, 40), -1)
+        cv2.rectangle(img, (margin // 2, margin // 2), (w - margin // 2, h - margin // 2), (0, 0, 0), max(1, int(4 * scale)))
+        return np.clip(img, 0, 255).astype(np.uint8)
+
+    raise ValueError(f"unknown image kind: {kind}")
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def _stroke(w, h, count=40):
+    """画像の中央を横切る軌跡"""
+    xs = np.linspace(w * 0.2, w * 0.8, count)
+    ys = h * 0.5 + np.sin(np.linspace(0, np.pi * 2, count)) * h * 0.1
+    return [(float(x), float(y)) for x, y in zip(xs, ys)]
+
+
+def _interaction(editor, mode, stroke):
+    """軌跡を描いたときの処理時間（再描画を除く）を計測する"""
+    editor.tool_mode.set(mode)
+    editor.drawing = True
+    editor.trace_points = list(stroke)
+    editor.redraw_suspended = True
+    try:
+        elapsed, _ = _timed(editor.on_trace_release, MouseEvent(*stroke[-1]))
+    finally:
+        editor.redraw_suspended = False
+    return elapsed
+
+
+def _motion_latency(editor, stroke, interval):
+    """一定間隔で届くマウス移動イベントを再現し、(描画遅延のp95, 再描画回数) を返す"""
+    editor.profiler.latency.clear()
+    editor.tool_mode.set("pen")
+    editor.drawing = True
+    editor.trace_points = [stroke[0]]
+    redraws = 0
+    draw_images = editor.draw_images
+
+    def counted_draw():
+        nonlocal redraws
+        redraws += 1
+        draw_images()
+
+    editor.draw_images = counted_draw
+    try:
+        next_event = time.perf_counter()
+        for x, y in stroke[1:]:
+            # 次のイベントの時刻まで予約された再描画を処理する
+            while time.perf_counter() < next_event:
+                editor.master.run_due()
+            editor.on_trace_motion(MouseEvent(x, y))
+            next_event += interval
+        while editor.master.scheduled:
+            editor.master.run_due()
+    finally:
+        editor.draw_images = draw_images
+        editor.drawing = False
+        editor.trace_points = []
+    return editor.profiler.latency.percentile(0.95), redraws
+
+
+def run_case(path, params, max_regen_points):
+    """1枚の画像について各段階を1回ずつ計測し、({段階名: 秒}, 件数) を返す"""
+    stages = {}
+    counts = {}
+    editor = make_headless_editor(params)
+
+    stages["decode"], decoded = _timed(read_image, path)
+    editor.image = decoded
+    editor.filename = path
+    editor.h, editor.w = decoded.shape[:2]
+    editor.view_xlim = (0, editor.w)
+    editor.view_ylim = (editor.h, 0)
+
+    # エッジ検出の段階（Cannyならblur・canny）は方式に登録された段階名で記録する
+    edges = decoded
+    for stage_name, function in get_backend(params["edge_method"]).stages:
+        stages[stage_name], edges = _timed(function, edges, params)
+    stages["find_contours"], (_, valid_contours, _) = _timed(
+        extract_edge_contours, edges, params["extraction_mode"])
+    if params["simplify_tolerance"] > 0 and valid_contours:
+        # update_edgesと同じく簡略化した輪郭をスプライン補間の入力にする
+        stages["simplify"], simplified = _timed(
+            simplify_paths, [c[:, 0, :] for c in valid_contours], params["simplify_tolerance"])
+        valid_contours = [points.reshape(-1, 1, 2).astype(np.int32) for points in simplified]
+    stages["update_edges"], _ = _timed(editor.update_edges)
+    # 同じ画像・同じパラメータでの2回目はキャッシュから復元される
+    cached_editor = make_headless_editor(dict(params, cache_dir=os.path.join(os.path.dirname(path), "cache")))
+    cached_editor.image = decoded
+    cached_editor.h, cached_editor.w = editor.h, editor.w
+    cached_editor.result_cache.clear()
+    cached_editor.update_edges()
+    stages["update_edges_cache_hit"], _ = _timed(cached_editor.update_edges)
+    stages["generate_spline_paths"], _ = _timed(editor.generate_spline_paths, valid_contours)
+    counts["contours"] = len(valid_contours)
+    counts["paths"] = len(editor.smoothed_paths)
+    counts["path_points"] = sum(len(p) for p in editor.smoothed_paths)
+    counts["edge_points"] = len(editor.edge_points)
+
+    stages["draw_images"], _ = _timed(editor.draw_images)
+    # もう一方の描画方式でも同じ編集状態を描画して比べる（パスの段階は作り直す）
+    other = "opencv" if editor.renderer == "matplotlib" else "matplotlib"
+    set_headless_renderer(editor, other)
+    editor.path_pyramid = PathPyramid()
+    stages[f"draw_images_{other}"], _ = _timed(editor.draw_images)
+    set_headless_renderer(editor, params["renderer"])
+
+    svg_path = os.path.splitext(path)[0] + ".svg"
+    stages["save_svg"], _ = _timed(editor.export_svg, svg_path)
+    counts["svg_bytes"] = os.path.getsize(svg_path)
+
+    project_path = os.path.splitext(path)[0] + PROJECT_EXTENSION
+    stages["save_project"], _ = _timed(editor.export_project, project_path)
+    stages["load_project"], _ = _timed(make_headless_editor(params).import_project, project_path)
+    counts["project_bytes"] = os.path.getsize(project_path)
+
+    stroke = _stroke(editor.w, editor.h)
+    stages["pen"] = _interaction(editor, "pen", stroke)
+    stages["eraser"] = _interaction(editor, "eraser", stroke)
+    # 125Hzのマウス移動に対するイベント受信から描画完了までの遅延
+    stages["motion_latency_p95"], counts["motion_redraws"] = _motion_latency(editor, stroke, 0.008)
+
+    # パス再生成はエッジ点数の2乗に比例するため上限を超える場合は省略
+    if len(editor.edge_points) <= max_regen_points:
+        editor.edge_group_cache = None
+        stages["regenerate_paths_from_edges"], _ = _timed(editor.regenerate_paths_from_edges)
+        stroke = _stroke(editor.w, editor.h, 10)
+        _interaction(editor, "eraser", [(x, y + editor.h * 0.2) for x, y in stroke])
+        stages["regenerate_paths_incremental"], _ = _timed(editor.regenerate_paths_from_edges)
+
+    return stages, counts
+
+
+def run_benchmark(kinds, sizes, params, repeat, max_regen_points, workdir):
+    """すべての画像について計測し、段階ごとの中央値をまとめた結果を返す"""
+    results = []
+    for megapixels in sizes:
+        for kind in kinds:
+            path = os.path.join(workdir, f"{kind}_{megapixels}mp.png")
+            if not os.path.exists(path):
+                cv2.imwrite(path, generate_image(kind, megapixels))
+            samples = []
+            counts = {}
+            for _ in range(repeat):
+                stages, counts = run_case(path, params, max_regen_points)
+                samples.append(stages)
+            stage_names = samples[0].keys()
+            median = {name: statistics.median(sample[name] for sample in samples) for name in stage_names}
+            results.append({
+                "case": f"{kind}@{megapixels}mp",
+                "kind": kind,
+                "megapixels": megapixels,
+                "stages": median,
+                "counts": counts,
+            })
+            print(f"{kind}@{megapixels}mp: " + ", ".join(f"{k}={v:.3f}s" for k, v in median.items()),
+                  file=sys.stderr)
+    return results
+
+
+def _has_display():
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def run_startup_benchmark(repeat):
+    """新しいプロセスでGUIを起動する時間を計測し、段階ごとの中央値をまとめた結果を返す"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = ("import time; t = time.perf_counter(); import SVG_maker_gui; "
+              "print(time.perf_counter() - t)")
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=here, check=True).stdout
+        stages = {"import_gui": float(output.split()[-1]), "process_import_gui": time.perf_counter() - start}
+        if _has_display():
+            # ウィンドウを開いて描画領域を作るまでの内訳（GUI側の --startup-report を利用）
+            output = subprocess.run([sys.executable, os.path.join(here, "SVG_maker_gui.py"),
+                                     "--startup-report", "--json"],
+                                    capture_output=True, text=True, cwd=here, check=True).stdout
+            report = json.loads(output.splitlines()[-1])
+            stages.update({f"gui_{name}": seconds for name, seconds in report["timings"].items()})
+        samples.append(stages)
+    median = {name: statistics.median(sample[name] for sample in samples) for name in samples[0]}
+    print("startup: " + ", ".join(f"{k}={v:.3f}s" for k, v in median.items()), file=sys.stderr)
+    return {"case": "startup", "kind": "startup", "megapixels": 0, "stages": median,
+            "counts": {"window": int(_has_display())}}
+
+
+def compare_with_baseline(results, baseline, tolerance, min_seconds):
+    """基準値に対する閾値を各段階に付け、閾値を超えた段階のリストを返す"""
+    baseline_cases = {case["case"]: case for case in baseline.get("results", [])}
+    regressions = []
+    for case in results:
+        reference = baseline_cases.get(case["case"])
+        if reference is None:
+            continue
+        thresholds = {}
+        for stage, seconds in case["stages"].items():
+            base = reference["stages"].get(stage)
+            if base is None:
+                continue
+            # ごく短い段階は計測誤差が大きいため下限を設ける
+            threshold = max(base * (1 + tolerance), min_seconds)
+            thresholds[stage] = threshold
+            if seconds > threshold:
+                regressions.append({"case": case["case"], "stage": stage,
+                                    "baseline": base, "threshold": threshold, "seconds": seconds})
+        case["thresholds"] = thresholds
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="輪郭抽出ツールの段階別ベンチマーク")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="画像の種類（カンマ区切り）")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="画像サイズ（メガピクセル、カンマ区切り。例: 1,8,32,100）")
+    parser.add_argument("--repeat", type=int, default=3, help="各画像の計測回数（中央値を採用）")
+    parser.add_argument("--gaussian-size", type=int, default=5)
+    parser.add_argument("--canny1", type=int, default=50)
+    parser.add_argument("--canny2", type=int, default=150)
+    parser.add_argument("--extraction-mode", choices=("contour", "centerline"), default="contour")
+    parser.add_argument("--simplify-tolerance", type=float, default=1.0)
+    parser.add_argument("--edge-method", choices=list(EDGE_BACKENDS), default=DEFAULT_EDGE_METHOD)
+    parser.add_argument("--renderer", choices=RENDERERS, default="matplotlib",
+                        help="描画方式（もう一方の方式の描画時間も draw_images_<方式> として計測する）")
+    parser.add_argument("--max-redraw-fps", type=float, default=30.0,
+                        help="ドラッグ中の再描画頻度の上限（0で上限なし）")
+    parser.add_argument("--max-regen-points", type=int, default=2000,
+                        help="パス再生成を計測するエッジ点数の上限")
+    parser.add_argument("--startup", action="store_true", help="GUIの起動時間も計測する")
+    parser.add_argument("--workdir", default=None, help="合成画像とSVGの保存先（省略時は一時ディレクトリ）")
+    parser.add_argument("--output", default=None, help="結果JSONの保存先（省略時は標準出力）")
+    parser.add_argument("--baseline", default=None, help="比較する基準の結果JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="基準値からの許容増加率")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="閾値の下限（秒）")
+    args = parser.parse_args(argv)
+
+    params = {
+        "gaussian_size": args.gaussian_size,
+        "canny1": args.canny1,
+        "canny2": args.canny2,
+        "extraction_mode": args.extraction_mode,
+        "simplify_tolerance": args.simplify_tolerance,
+        "edge_method": args.edge_method,
+        "renderer": args.renderer,
+        "max_redraw_fps": args.max_redraw_fps,
+        "pen_size": 10,
+    }
+    kinds = [k for k in args.kinds.split(",") if k]
+    sizes = [float(s) if "." in s else int(s) for s in args.sizes.split(",") if s]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = args.workdir or tmpdir
+        os.makedirs(workdir, exist_ok=True)
+        results = run_benchmark(kinds, sizes, params, max(1, args.repeat), args.max_regen_points, workdir)
+    if args.startup:
+        results.append(run_startup_benchmark(max(1, args.repeat)))
+
+    report = {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "params": params,
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance, args.min_seconds)
+        report["tolerance"] = args.tolerance
+        report["regressions"] = regressions
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    for item in regressions:
+        print(f"性能低下: {item['case']} {item['stage']} {item['seconds']:.3f}s > {item['threshold']:.3f}s "
+              f"(基準 {item['baseline']:.3f}s)", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""輪郭抽出結果のディスクキャッシュ
+
+画像の画素内容のハッシュと抽出パラメータからキーを作り、抽出したエッジ点・輪郭・
+スプライン補間パスをプロジェクトファイルと同じバイナリ形式で保存する。
+合計サイズが上限を超えたら最後に使われた時刻（ファイルの更新時刻）が古いものから削除する。
+
+保存先は環境変数 SVG_MAKER_CACHE_DIR（既定: ~/.cache/svg_maker）、
+上限は SVG_MAKER_CACHE_MB（既定: 512MB）で変更できる。
+"""
+import hashlib
+import json
+import os
+
+from SVG_maker_project import ProjectFormatError, read_project, write_project
+
+# 抽出処理の内容を変えたら上げる（古いキャッシュを使わないように）
+PIPELINE_VERSION = 1
+CACHE_EXTENSION = ".svgcache"
+
+
+def image_content_hash(image):
+    """画像の画素内容のSHA-1（同じ画像を別名で開いても一致する）"""
+    digest = hashlib.sha1()
+    digest.update(f"{image.shape}:{image.dtype}".encode("ascii"))
+    digest.update(memoryview(image).cast("B") if image.flags.c_contiguous else image.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """サイズ上限付きLRUのディスクキャッシュ"""
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.environ.get(
+            "SVG_MAKER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "svg_maker"))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("SVG_MAKER_CACHE_MB", 512)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_hash, params):
+        """画像ハッシュと抽出パラメータからキーを作る"""
+        text = json.dumps({"image": image_hash, "params": params, "pipeline": PIPELINE_VERSION},
+                          sort_keys=True)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def get(self, key):
+        """キャッシュされた (メタデータ, {名前: 配列}) を返す（無ければNone）"""
+        path = self._path(key)
+        try:
+            meta, arrays = read_project(path, mmap=False)
+            os.utime(path)  # 最近使ったものとして更新時刻を進める
+        except (OSError, ValueError, KeyError, ProjectFormatError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return meta, arrays
+
+    def put(self, key, meta, arrays):
+        """結果を保存し、上限を超えた分を古い順に削除する"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_project(self._path(key), meta, arrays)
+        except OSError:
+            return False
+        self.evict()
+        return True
+
+    def entries(self):
+        """(更新時刻, サイズ, パス) のリスト"""
+        result = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return result
+        for name in names:
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((stat.st_mtime, stat.st_size, path))
+        return result
+
+    def evict(self):
+        """合計サイズが上限以下になるまで最後に使われた時刻が古いものから削除する"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,239 @@
+"""色ごとの塗りつぶし領域としてのベクター化（カラーロゴ・イラスト向け）
+
+画像を減色（k-means またはメディアンカット）してN色のラベル画像を1回だけ作り、
+各色の領域マスクをラベル画像との比較で作って、色ごとに並列で輪郭を追跡する。
+SVGは色ごとに塗りつぶしの <g> を1つ作り、穴のある領域は evenodd の複合パスにする。
+
+重ね塗り（既定）では面積の大きい色から順に下へ描き、各色の領域に後から描く色の領域も含めて
+追跡するため、簡略化で境界がずれても色の間に隙間ができない。
+
+使い方:
+    python SVG_maker_color.py logo.png --colors 8 --output logo.svg
+    python SVG_maker_color.py logo.png --colors 6 --method median-cut --workers 4 --no-stack
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from SVG_maker_core import read_image, simplify_paths
+from SVG_maker_profiler import StageProfiler
+
+QUANTIZE_METHODS = ("kmeans", "median-cut")
+MAX_SAMPLES = 50_000        # パレットを求めるときに使う画素数の上限
+ASSIGN_CHUNK = 1 << 20      # パレットへの割り当てを一度に計算する画素数
+LUT_BITS = 6                # 画素の割り当て表に使う各色成分のビット数
+
+
+def _sample_pixels(pixels, max_samples=MAX_SAMPLES, seed=0):
+    if len(pixels) <= max_samples:
+        return pixels
+    rng = np.random.default_rng(seed)
+    return pixels[rng.choice(len(pixels), max_samples, replace=False)]
+
+
+def kmeans_palette(pixels, n_colors, seed=0):
+    """k-meansで代表色を求める（間引いた画素で計算、乱数の種を固定して結果を再現可能にする）"""
+    samples = _sample_pixels(pixels, seed=seed).astype(np.float32)
+    n_colors = min(n_colors, len(np.unique(samples, axis=0)))
+    cv2.setRNGSeed(seed)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.5)
+    _, _, centers = cv2.kmeans(samples, n_colors, None, criteria, 2, cv2.KMEANS_PP_CENTERS)
+    return centers
+
+
+def median_cut_palette(pixels, n_colors, seed=0):
+    """メディアンカットで代表色を求める（値の幅が最大の箱をその色成分の中央値で分割していく）"""
+    boxes = [_sample_pixels(pixels, seed=seed).astype(np.float32)]
+    while len(boxes) < n_colors:
+        ranges = [np.ptp(box, axis=0).max() if len(box) > 1 else -1 for box in boxes]
+        index = int(np.argmax(ranges))
+        if ranges[index] <= 0:
+            break
+        box = boxes.pop(index)
+        channel = int(np.argmax(np.ptp(box, axis=0)))
+        order = np.argsort(box[:, channel], kind="stable")
+        half = len(box) // 2
+        boxes += [box[order[:half]], box[order[half:]]]
+    return np.array([box.mean(axis=0) for box in boxes], dtype=np.float32)
+
+
+def assign_labels(pixels, palette):
+    """各画素を最も近い代表色の番号にする（メモリを抑えるため一定画素数ごとにまとめて計算）"""
+    labels = np.empty(len(pixels), dtype=np.uint8)
+    palette = palette.astype(np.float32)
+    palette_norm = (palette ** 2).sum(axis=1)
+    for start in range(0, len(pixels), ASSIGN_CHUNK):
+        chunk = pixels[start:start + ASSIGN_CHUNK].astype(np.float32)
+        # |p - c|^2 = |p|^2 - 2p・c + |c|^2 のうち画素ごとに一定の |p|^2 は比較に不要
+        distance = palette_norm[None, :] - 2.0 * (chunk @ palette.T)
+        labels[start:start + ASSIGN_CHUNK] = np.argmin(distance, axis=1)
+    return labels
+
+
+def label_image(image, palette, bits=LUT_BITS):
+    """画像の全画素に代表色の番号を付ける
+
+    各色成分の上位 bits ビットで作る色の格子ごとに最も近い代表色を1回だけ求めて表にし、
+    画素ごとの距離計算を表引きに置き換える（誤差は各成分 2^(8-bits-1) 以下）。
+    """
+    shift = 8 - bits
+    levels = np.arange(1 << bits, dtype=np.float32) * (1 << shift) + ((1 << shift) - 1) / 2
+    grid = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1).reshape(-1, 3)
+    table = assign_labels(grid, palette)
+    channels = [(image[..., c] >> shift).astype(np.int32) for c in range(3)]
+    return table[(channels[0] << (2 * bits)) | (channels[1] << bits) | channels[2]]
+
+
+def quantize_image(image, n_colors=8, method="kmeans", smooth=5):
+    """画像をN色に減色し、(ラベル画像, BGRの代表色の配列, 各色の画素数) を返す
+
+    smooth > 0 なら減色前にメディアンフィルタでノイズと文字のにじみをならす。
+    """
+    if method not in QUANTIZE_METHODS:
+        raise ValueError(f"不明な減色方式です: {method}")
+    if smooth > 0:
+        ksize = int(smooth) | 1
+        image = cv2.medianBlur(image, ksize)
+    palette_function = kmeans_palette if method == "kmeans" else median_cut_palette
+    palette = palette_function(image.reshape(-1, 3), min(256, max(1, int(n_colors))))
+    labels = label_image(image, palette)
+    counts = np.bincount(labels.ravel(), minlength=len(palette))
+    return labels, np.clip(np.rint(palette), 0, 255).astype(np.uint8), counts
+
+
+def trace_mask(mask, min_area=16.0, tolerance=1.0):
+    """2値マスクの領域を (外周, [穴, ...]) のリストとして追跡する（座標は (N, 2) の配列）"""
+    contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return []
+    hierarchy = hierarchy[0]
+    areas = np.array([abs(cv2.contourArea(contour)) if len(contour) >= 3 else 0.0 for contour in contours])
+    keep = areas >= min_area
+
+    # 外周（親なし）とその穴の対応を作り、面積の小さい細かな領域は追跡結果から除く
+    outers = [i for i in np.flatnonzero(keep) if hierarchy[i][3] == -1]
+    holes_of = {i: [] for i in outers}
+    for i in np.flatnonzero(keep):
+        parent = hierarchy[i][3]
+        if parent in holes_of:
+            holes_of[parent].append(i)
+    used = outers + [j for i in outers for j in holes_of[i]]
+
+    # 閉じた折れ線として使う輪郭をまとめて簡略化
+    rings = [np.concatenate([contours[i][:, 0, :], contours[i][:1, 0, :]]) for i in used]
+    if tolerance > 0:
+        rings = simplify_paths(rings, tolerance)
+    ring_of = dict(zip(used, rings))
+
+    regions = []
+    for i in outers:
+        if len(ring_of[i]) < 4:
+            continue
+        regions.append((ring_of[i], [ring_of[j] for j in holes_of[i] if len(ring_of[j]) >= 4]))
+    return regions
+
+
+def _trace_layer(ranks, rank, stacked, min_area, tolerance):
+    # 重ね塗りでは自分より上に描く色の領域も含め、下の色との間に隙間ができないようにする
+    mask = (ranks >= rank) if stacked else (ranks == rank)
+    return trace_mask(mask.view(np.uint8), min_area, tolerance)
+
+
+def vectorize_colors(image, n_colors=8, method="kmeans", smooth=5, min_area=16.0, tolerance=1.0,
+                     stacked=True, workers=None, profiler=None):
+    """画像を色ごとの塗りつぶし領域に変換する
+
+    戻り値は描画順（下から）のレイヤーのリストで、各要素は
+    {"color": "#rrggbb", "pixels": 画素数, "regions": [(外周, [穴, ...]), ...]}。
+    """
+    profiler = profiler or StageProfiler()
+    with profiler.span("color_vectorize", colors=n_colors, method=method) as operation:
+        with profiler.span("quantize"):
+            labels, palette, counts = quantize_image(image, n_colors, method, smooth)
+
+        # 面積の大きい色から順に描画順（rank）を決め、ラベル画像をrank画像に1回で変換
+        order = [int(i) for i in np.argsort(-counts, kind="stable") if counts[i] > 0]
+        rank_of_label = np.zeros(len(palette), dtype=np.uint8)
+        rank_of_label[order] = np.arange(len(order))
+        ranks = rank_of_label[labels]
+
+        with profiler.span("trace_layers", layers=len(order)) as stage:
+            with ThreadPoolExecutor(max_workers=workers or min(len(order), os.cpu_count() or 1) or 1) as executor:
+                # 最下層は重ね塗りでは画像全体になる
+                traced = list(executor.map(lambda rank: _trace_layer(ranks, rank, stacked, min_area, tolerance),
+                                           range(len(order))))
+            stage["regions"] = sum(len(regions) for regions in traced)
+
+        layers = []
+        for rank, label in enumerate(order):
+            if not traced[rank]:
+                continue
+            b, g, r = (int(value) for value in palette[label])
+            layers.append({"color": f"#{r:02x}{g:02x}{b:02x}", "pixels": int(counts[label]),
+                           "regions": traced[rank]})
+        operation["layers"] = len(layers)
+        operation["regions"] = sum(len(layer["regions"]) for layer in layers)
+    return layers
+
+
+def region_path_data(outer, holes):
+    """外周と穴を1つの複合パスのd属性にする"""
+    parts = []
+    for ring in [outer] + list(holes):
+        points = " ".join(f"{x:g},{y:g}" for x, y in ring[:-1])
+        parts.append(f"M {points} Z")
+    return " ".join(parts)
+
+
+def build_color_svg(layers, width, height, save_path=""):
+    """レイヤーを色ごとに1つの塗りつぶしの <g> にまとめたSVGにする"""
+    import svgwrite  # 起動を速くするため初回の保存時に読み込む
+
+    # 属性の検証は書き出し時間の半分以上を占めるため省く（出力内容は同じ）
+    dwg = svgwrite.Drawing(save_path, size=(width, height), debug=False)
+    for layer in layers:
+        group = dwg.g(fill=layer["color"], stroke="none", fill_rule="evenodd")
+        for outer, holes in layer["regions"]:
+            group.add(dwg.path(d=region_path_data(outer, holes)))
+        dwg.add(group)
+    return dwg
+
+
+def write_color_svg(layers, width, height, save_path):
+    build_color_svg(layers, width, height, save_path).save()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="画像を色ごとの塗りつぶし領域のSVGに変換する")
+    parser.add_argument("image")
+    parser.add_argument("--output", help="SVGの出力先（省略時は画像と同じ名前の.svg）")
+    parser.add_argument("--colors", type=int, default=8, help="色数")
+    parser.add_argument("--method", choices=QUANTIZE_METHODS, default="kmeans")
+    parser.add_argument("--smooth", type=int, default=5, help="減色前のメディアンフィルタのサイズ（0で無効）")
+    parser.add_argument("--min-area", type=float, default=16.0, help="これより小さい領域（画素）は除外")
+    parser.add_argument("--simplify-tolerance", type=float, default=1.0)
+    parser.add_argument("--no-stack", action="store_true", help="重ね塗りせず各色の領域だけを追跡する")
+    parser.add_argument("--workers", type=int, help="輪郭追跡の並列数（省略時はCPU数）")
+    args = parser.parse_args(argv)
+
+    image = read_image(args.image)
+    if image is None:
+        print(f"画像を読み込めません: {args.image}", file=sys.stderr)
+        return 1
+    profiler = StageProfiler()
+    layers = vectorize_colors(image, args.colors, args.method, args.smooth, args.min_area,
+                              args.simplify_tolerance, not args.no_stack, args.workers, profiler)
+    output = args.output or os.path.splitext(args.image)[0] + ".svg"
+    with profiler.span("save_svg"):
+        write_color_svg(layers, image.shape[1], image.shape[0], output)
+    print(profiler.summary(), file=sys.stderr)
+    print(f"{len(layers)}色 / {sum(len(layer['regions']) for layer in layers)}領域 -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,746 @@
+"""輪郭抽出ツールのGUIに依存しない処理（画像読み込み・エッジ検出・中心線追跡・SVG出力など）"""
+from itertools import chain
+
+import cv2
+import numpy as np
+
+MIN_CONTOUR_POINTS = 10     # 抽出・編集で残すパスの最小点数（GUIと一括処理・自動調整で共通）
+
+
+def read_image(path):
+    """画像ファイルをBGR画像として読み込む（日本語パス対応、失敗時はNone）"""
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def blur_image(image, gaussian_size):
+    """グレースケールに変換してガウシアンブラーを適用する（カーネルサイズは奇数に補正）"""
+    ksize = int(gaussian_size)
+    if ksize % 2 == 0: ksize += 1
+    return cv2.GaussianBlur(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), (ksize, ksize), 0)
+
+
+def detect_edges(blurred, canny1, canny2):
+    """Cannyエッジ検出を実行する"""
+    return cv2.Canny(blurred, canny1, canny2)
+
+
+def thin_edges(edges):
+    """エッジ画像をZhang-Suen法で1画素幅に細線化する（各反復はNumPyで一括処理）"""
+    img = np.pad((edges > 0).astype(np.uint8), 1)
+
+    while True:
+        changed = False
+        for step in (0, 1):
+            p2 = img[:-2, 1:-1]
+            p3 = img[:-2, 2:]
+            p4 = img[1:-1, 2:]
+            p5 = img[2:, 2:]
+            p6 = img[2:, 1:-1]
+            p7 = img[2:, :-2]
+            p8 = img[1:-1, :-2]
+            p9 = img[:-2, :-2]
+            center = img[1:-1, 1:-1]
+
+            neighbors = [p2, p3, p4, p5, p6, p7, p8, p9]
+            count = sum(n.astype(np.int8) for n in neighbors)
+            # P2→P3→…→P9→P2 の順で0→1に変化する回数
+            transitions = sum(
+                ((neighbors[i] == 0) & (neighbors[(i + 1) % 8] == 1)).astype(np.int8)
+                for i in range(8)
+            )
+
+            if step == 0:
+                cond = (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+            else:
+                cond = (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+
+            remove = (center == 1) & (count >= 2) & (count <= 6) & (transitions == 1) & cond
+            if remove.any():
+                center[remove] = 0
+                changed = True
+
+        if not changed:
+            break
+
+    return img[1:-1, 1:-1]
+
+
+def compress_polyline(points):
+    """同じ方向に並ぶ中間点を除去する（CHAIN_APPROX_SIMPLE相当）"""
+    if len(points) <= 2:
+        return points
+    directions = np.diff(points, axis=0)
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:-1] = np.any(directions[1:] != directions[:-1], axis=1)
+    return points[keep]
+
+
+def remove_staircases(skeleton):
+    """細線の4連結の階段状の角の画素を除き、斜めにつながる8連結の1画素幅の線にする
+
+    直交する2方向（上と右など）にだけ隣接し、反対側の3画素が空いている画素は、除いても
+    2つの隣接画素が斜めにつながったままになる。向きごとに順に除くことで線が切れないようにする。
+    """
+    img = np.pad((skeleton > 0).astype(np.uint8), 1)
+    h, w = img.shape
+    center = img[1:-1, 1:-1]
+
+    def at(dy, dx):
+        return img[1 + dy:h - 1 + dy, 1 + dx:w - 1 + dx]
+
+    # (縦の隣接, 横の隣接): 上と右・右と下・下と左・左と上の角
+    for vertical, horizontal in ((-1, 1), (1, 1), (1, -1), (-1, -1)):
+        elbow = ((center == 1) & (at(vertical, 0) == 1) & (at(0, horizontal) == 1)
+                 & (at(-vertical, 0) == 0) & (at(0, -horizontal) == 0) & (at(-vertical, -horizontal) == 0))
+        center[elbow] = 0
+    return center.copy()
+
+
+def connectivity_number(skeleton):
+    """各画素の8連結の連結数（周囲の線画素が何本の枝に分かれるか。1: 端点 2: 線の途中 3以上: 分岐点）"""
+    img = np.pad((skeleton > 0).astype(np.int16), 1)
+    h, w = img.shape
+    # 右・右上・上・左上・左・左下・下・右下の順
+    ring = [img[1 + dy:h - 1 + dy, 1 + dx:w - 1 + dx]
+            for dy, dx in ((0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (1, 1))]
+    empty = [1 - n for n in ring]
+    return sum(empty[k] - empty[k] * empty[k + 1] * empty[(k + 2) % 8] for k in (0, 2, 4, 6))
+
+
+def trace_centerlines(edges, min_length=MIN_CONTOUR_POINTS):
+    """細線化したエッジを一本線のポリラインとして追跡する
+
+    階段状の画素を除いたうえで連結数3以上の画素を分岐点とし、隣り合う分岐点はまとめて1つの節点にする。
+    線は分岐点で区切り、分岐点に接する端には節点の代表画素を含めるため、同じ分岐点で終わる線の端は一致する。
+    どこにも端のない線は閉じたループとして返す。
+    戻り値は (OpenCV輪郭形式のポリラインのリスト, 閉じているかのフラグのリスト)。
+    """
+    skeleton = remove_staircases(thin_edges(edges))
+    h, w = skeleton.shape
+    connectivity = connectivity_number(skeleton)
+
+    # 0: 背景 1: 未訪問の線画素 2: 分岐点
+    state = np.pad(skeleton.astype(np.uint8), 1)
+    junctions = (skeleton == 1) & (connectivity >= 3)
+    state[1:-1, 1:-1][junctions] = 2
+    padded_w = w + 2
+    state = state.ravel()
+
+    # 隣り合う分岐点を1つの節点にまとめ、重心に最も近い画素を代表にする
+    node_count, labels = cv2.connectedComponents(np.pad(junctions.astype(np.uint8), 1), connectivity=8)
+    labels = labels.ravel()
+    representative = {}
+    for label in range(1, node_count):
+        members = np.flatnonzero(labels == label)
+        ys, xs = np.divmod(members, padded_w)
+        nearest = np.argmin((xs - xs.mean()) ** 2 + (ys - ys.mean()) ** 2)
+        representative[label] = int(members[nearest])
+
+    # 4近傍を優先して斜め方向の近道を避ける
+    offsets = (-padded_w, 1, padded_w, -1,
+               -padded_w - 1, -padded_w + 1, padded_w - 1, padded_w + 1)
+
+    def walk(start, node=None):
+        path = [representative[node], start] if node else [start]
+        state[start] = 0
+        current = start
+        while True:
+            next_idx = None
+            for off in offsets:
+                if state[current + off] == 1:
+                    next_idx = current + off
+                    break
+            if next_idx is None:
+                # 終端に隣接する分岐点があれば、その節点の代表画素で終える
+                for off in offsets:
+                    neighbor = current + off
+                    if state[neighbor] == 2 and (labels[neighbor] != node or len(path) > 3):
+                        path.append(representative[labels[neighbor]])
+                        break
+                return path
+            state[next_idx] = 0
+            path.append(next_idx)
+            current = next_idx
+
+    traced = []
+
+    # 分岐点から伸びる線
+    for junction in np.flatnonzero(state == 2):
+        for off in offsets:
+            if state[junction + off] == 1:
+                traced.append((walk(junction + off, labels[junction]), False))
+
+    # 端点から始まる開いた線
+    endpoints = np.pad((skeleton == 1) & (connectivity <= 1), 1).ravel()
+    for idx in np.flatnonzero(endpoints):
+        if state[idx] == 1:
+            traced.append((walk(idx), False))
+
+    # 残りは閉じたループ（最後の画素が始点に隣接していれば閉じている）
+    for idx in np.flatnonzero(state == 1):
+        if state[idx] == 1:
+            path = walk(idx)
+            last = path[-1]
+            closed = len(path) >= 3 and abs(last // padded_w - idx // padded_w) <= 1 and abs(last % padded_w - idx % padded_w) <= 1
+            traced.append((path, closed))
+
+    polylines = []
+    closed_flags = []
+    for path, is_closed in traced:
+        if len(path) < min_length:
+            continue
+        flat = np.array(path)
+        points = np.stack([flat % padded_w - 1, flat // padded_w - 1], axis=1)
+        points = compress_polyline(points)
+        polylines.append(points.reshape(-1, 1, 2).astype(np.int32))
+        closed_flags.append(is_closed)
+
+    return polylines, closed_flags
+
+
+def simplify_paths(paths, tolerance):
+    """全パスをまとめてDouglas-Peucker法で簡略化する（再帰を使わずNumPyで一括処理）
+
+    各反復ですべてのパスの未確定区間を同時に評価し、許容値を超える最遠点で区間を分割する。
+    入力と同じ順序で (N, 2) の配列のリストを返す。
+    """
+    arrays = [np.asarray(path, dtype=float).reshape(-1, 2) for path in paths]
+    if not arrays:
+        return []
+
+    lengths = np.array([len(a) for a in arrays])
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    points = np.concatenate(arrays) if lengths.sum() else np.zeros((0, 2))
+
+    keep = np.zeros(len(points), dtype=bool)
+    non_empty = lengths > 0
+    keep[offsets[non_empty]] = True
+    keep[(offsets + lengths - 1)[non_empty]] = True
+
+    seg_start = offsets[lengths > 2]
+    seg_end = (offsets + lengths - 1)[lengths > 2]
+
+    while seg_start.size:
+        counts = seg_end - seg_start - 1
+        seg_id = np.repeat(np.arange(len(seg_start)), counts)
+        group_offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        idx = np.arange(counts.sum()) - group_offsets[seg_id] + seg_start[seg_id] + 1
+
+        a = points[seg_start][seg_id]
+        b = points[seg_end][seg_id]
+        p = points[idx]
+        ab = b - a
+        ap = p - a
+        line_length = np.hypot(ab[:, 0], ab[:, 1])
+        cross = np.abs(ab[:, 0] * ap[:, 1] - ab[:, 1] * ap[:, 0])
+        # 始点と終点が一致する区間（閉じたパス）は点までの距離で評価
+        distance = np.where(line_length > 0, cross / np.where(line_length > 0, line_length, 1),
+                            np.hypot(ap[:, 0], ap[:, 1]))
+
+        seg_max = np.maximum.reduceat(distance, group_offsets)
+        is_max = distance == seg_max[seg_id]
+        max_seg, first = np.unique(seg_id[is_max], return_index=True)
+        split_idx = np.empty(len(seg_start), dtype=int)
+        split_idx[max_seg] = idx[is_max][first]
+
+        split = seg_max > tolerance
+        mid = split_idx[split]
+        keep[mid] = True
+
+        seg_start, seg_end = (np.concatenate([seg_start[split], mid]),
+                              np.concatenate([mid, seg_end[split]]))
+        open_segments = seg_end - seg_start > 1
+        seg_start, seg_end = seg_start[open_segments], seg_end[open_segments]
+
+    return [points[o:o + n][keep[o:o + n]] for o, n in zip(offsets, lengths)]
+
+
+def simplify_polyline(points, tolerance):
+    """1本のパスをDouglas-Peucker法で簡略化する"""
+    return simplify_paths([points], tolerance)[0]
+
+
+def extract_edge_contours(edges, mode="contour", min_points=MIN_CONTOUR_POINTS):
+    """エッジ画像から輪郭を抽出する
+
+    mode が "centerline" の場合は細線化した中心線を開いたポリラインとして追跡する。
+    戻り値は (抽出した全輪郭, 長さフィルタ後の輪郭, 閉じているかのフラグのリスト)。
+    """
+    if mode == "centerline":
+        contours, closed_flags = trace_centerlines(edges, min_points)
+        return contours, list(contours), closed_flags
+
+    contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    valid_contours = [contour for contour in contours if len(contour) >= min_points]
+    return contours, valid_contours, [True] * len(valid_contours)
+
+
+class PathTopology:
+    """パス端点の空間ハッシュとパス端の接続グラフ
+
+    各パスに安定したIDを振り、端点を格子セルのハッシュに登録する。
+    端点の検索・接続はセル近傍だけを調べるため、パス総数に依存しない。
+    """
+
+    START = 0
+    END = 1
+
+    def __init__(self, cell_size=50.0):
+        self.cell_size = float(cell_size)
+        self.paths = {}          # パスID → 点のリスト（挿入順を保持）
+        self.manual_ids = set()  # 手動パス（ペン・クロージングで作成）のID
+        self._grid = {}          # セル座標 → {(パスID, 端)}
+        self._next_id = 0
+
+    @classmethod
+    def from_paths(cls, paths, manual_paths=(), cell_size=50.0):
+        """パスのリストから索引を構築する（手動パスはオブジェクトの同一性で判定）"""
+        topology = cls(cell_size)
+        manual_objects = {id(path) for path in manual_paths}
+        for path in paths:
+            topology.add(path, manual=id(path) in manual_objects)
+        return topology
+
+    def _cell(self, point):
+        return (int(point[0] // self.cell_size), int(point[1] // self.cell_size))
+
+    def _endpoints(self, path_id):
+        path = self.paths[path_id]
+        return ((self.START, path[0]), (self.END, path[-1]))
+
+    def add(self, path, manual=False):
+        """パスを登録してIDを返す"""
+        path_id = self._next_id
+        self._next_id += 1
+        self.paths[path_id] = path
+        if manual:
+            self.manual_ids.add(path_id)
+        if len(path) >= 2:
+            for end, point in self._endpoints(path_id):
+                self._grid.setdefault(self._cell(point), set()).add((path_id, end))
+        return path_id
+
+    def remove(self, path_id):
+        """パスを削除して返す"""
+        path = self.paths[path_id]
+        if len(path) >= 2:
+            for end, point in self._endpoints(path_id):
+                cell = self._cell(point)
+                self._grid[cell].discard((path_id, end))
+                if not self._grid[cell]:
+                    del self._grid[cell]
+        del self.paths[path_id]
+        self.manual_ids.discard(path_id)
+        return path
+
+    def endpoints_near(self, point, max_distance):
+        """指定距離以内の端点を (距離, パスID, 端, 座標) のリストで返す"""
+        reach = int(np.ceil(max_distance / self.cell_size))
+        cx, cy = self._cell(point)
+        found = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for path_id, end in self._grid.get((gx, gy), ()):
+                    path = self.paths[path_id]
+                    endpoint = path[0] if end == self.START else path[-1]
+                    distance = ((point[0] - endpoint[0]) ** 2 + (point[1] - endpoint[1]) ** 2) ** 0.5
+                    if distance <= max_distance:
+                        found.append((distance, path_id, end, endpoint))
+        return found
+
+    def nearest_endpoint(self, point, max_distance):
+        """最も近い端点を (パスID, 座標, 始点かどうか) で返す（見つからなければ全てNone）"""
+        found = self.endpoints_near(point, max_distance)
+        if not found:
+            return None, None, None
+        distance, path_id, end, endpoint = min(found, key=lambda item: (item[0], item[1], item[2]))
+        return path_id, endpoint, end == self.START
+
+    def oriented(self, path_id, from_end):
+        """指定した端から始まる向きでパスを返す"""
+        path = self.paths[path_id]
+        return list(path) if from_end == self.START else list(reversed(path))
+
+    def join(self, first_id, first_is_start, second_id, second_is_start, bridge):
+        """2つのパスの端を軌跡で接続し、結合したパスのIDを返す"""
+        first = self.oriented(first_id, self.END if first_is_start else self.START)
+        second = self.oriented(second_id, self.START if second_is_start else self.END)
+        combined = first + list(bridge) + second
+        self.remove(first_id)
+        self.remove(second_id)
+        return self.add(combined, manual=True)
+
+    def close(self, path_id, start_is_start, end_is_start, bridge):
+        """同じパスの両端を軌跡で接続して閉じ、閉じたパスのIDを返す"""
+        original = self.paths[path_id]
+        if not start_is_start and end_is_start:
+            closed = list(original) + list(reversed(bridge))
+        else:
+            closed = list(original) + list(bridge)
+        self.remove(path_id)
+        return self.add(closed, manual=True)
+
+    def is_open(self, path_id):
+        path = self.paths[path_id]
+        return len(path) >= 2 and tuple(path[0]) != tuple(path[-1])
+
+    def join_within(self, max_distance):
+        """距離以内の端点どうしを1回の走査でまとめて接続し、作成したパスのIDを返す
+
+        近い順に端点の組を貪欲に確定して端の接続グラフを作り、
+        連結成分ごとに鎖（開いたパス）または閉路（閉じたパス）として1本にまとめる。
+        """
+        candidates = []
+        for path_id in list(self.paths):
+            if not self.is_open(path_id):
+                continue
+            for end, point in self._endpoints(path_id):
+                for distance, other_id, other_end, _ in self.endpoints_near(point, max_distance):
+                    if (other_id, other_end) <= (path_id, end) or not self.is_open(other_id):
+                        continue
+                    candidates.append((distance, (path_id, end), (other_id, other_end)))
+        candidates.sort()
+
+        links = {}
+        for distance, a, b in candidates:
+            if a in links or b in links:
+                continue
+            # 自身の両端どうしは十分な長さがある場合のみ閉じる
+            if a[0] == b[0] and len(self.paths[a[0]]) < 3:
+                continue
+            links[a] = b
+            links[b] = a
+
+        linked_paths = list(dict.fromkeys(node[0] for node in links))
+        visited = set()
+        created = []
+
+        def assemble(path_id, entry_end):
+            combined = []
+            while path_id not in visited:
+                visited.add(path_id)
+                combined.extend(self.oriented(path_id, entry_end))
+                exit_node = (path_id, 1 - entry_end)
+                if exit_node not in links:
+                    return combined, False
+                path_id, entry_end = links[exit_node]
+            return combined, True
+
+        # 端が未接続のパスから鎖をたどる
+        for path_id in linked_paths:
+            if path_id in visited:
+                continue
+            for end in (self.START, self.END):
+                if (path_id, end) not in links:
+                    combined, _ = assemble(path_id, end)
+                    created.append((combined, False))
+                    break
+
+        # 残りは閉路
+        for path_id in linked_paths:
+            if path_id not in visited:
+                combined, _ = assemble(path_id, self.START)
+                created.append((combined, True))
+
+        for path_id in linked_paths:
+            self.remove(path_id)
+
+        new_ids = []
+        for combined, is_cycle in created:
+            if is_cycle:
+                combined.append(combined[0])
+            new_ids.append(self.add(combined, manual=True))
+        return new_ids
+
+    def path_list(self):
+        """登録順のパスのリストを返す"""
+        return list(self.paths.values())
+
+    def manual_path_list(self):
+        """登録順の手動パスのリストを返す"""
+        return [path for path_id, path in self.paths.items() if path_id in self.manual_ids]
+
+
+class PathPyramid:
+    """パスごとの解像度別の簡略化版（ズームに応じた描画用）
+
+    各パスを許容誤差を倍々にした段階で簡略化して保持する。段階はパスの追加・編集で
+    新しいパスができたときに1回だけ作り、描画では画面の1画素に相当する誤差の段階を使う。
+    各段階は前の段階をさらに簡略化して作るため、元のパスからの誤差は許容値の2倍以内。
+    拡大表示では外接矩形が表示範囲にかからないパスを除き、描画する点数をズームによらずほぼ一定に保つ。
+    """
+
+    TOLERANCES = (0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+    def __init__(self, tolerances=TOLERANCES):
+        self.tolerances = tuple(tolerances)
+        self._entries = {}  # id(パス): (パス, 点数, 閉じているか, 外接矩形, [段階ごとの点のリスト])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, paths, is_closed):
+        """pathsにないパスの段階を捨て、新しいパス・点数の変わったパスの段階を作って、作った本数を返す
+
+        is_closed はパスが閉じているかを判定する関数（段階と一緒に1回だけ判定して保持する）。
+        """
+        entries = {}
+        new_paths = {}
+        for path in paths:
+            entry = self._entries.get(id(path))
+            if entry is not None and entry[0] is path and entry[1] == len(path):
+                entries[id(path)] = entry
+            else:
+                new_paths[id(path)] = path
+        new_paths = list(new_paths.values())
+        if new_paths:
+            arrays = [np.asarray(path, dtype=float).reshape(-1, 2) for path in new_paths]
+            levels = [[] for _ in new_paths]
+            level_paths = arrays
+            for tolerance in self.tolerances:
+                level_paths = simplify_paths(level_paths, tolerance)
+                for path_levels, points in zip(levels, level_paths):
+                    path_levels.append(points.tolist())
+            for path, points, path_levels in zip(new_paths, arrays, levels):
+                bbox = tuple(points.min(axis=0)) + tuple(points.max(axis=0)) if len(points) else None
+                entries[id(path)] = (path, len(path), is_closed(path), bbox, path_levels)
+        self._entries = entries
+        return len(new_paths)
+
+    def level_for(self, max_error):
+        """誤差 max_error（画像の画素）以内に収まる最も粗い段階の番号（-1は元のパス）"""
+        level = -1
+        for i, tolerance in enumerate(self.tolerances):
+            if tolerance * 2 <= max_error:
+                level = i
+        return level
+
+    def paths_at(self, paths, level, view=None):
+        """各パスの (段階の点のリスト, 閉じているか) を返す（update済みのパスに限る）
+
+        view=(x0, y0, x1, y1) を指定すると外接矩形がその範囲にかからないパスを除く。
+        表示中のパスを囲む閉じたパスは必ず範囲にかかるため、塗りつぶしの穴の判定は変わらない。
+        """
+        result = []
+        for path in paths:
+            _, _, closed, bbox, path_levels = self._entries[id(path)]
+            if view is not None and (bbox is None or bbox[2] < view[0] or bbox[0] > view[2]
+                                     or bbox[3] < view[1] or bbox[1] > view[3]):
+                continue
+            result.append((path if level < 0 else path_levels[level], closed))
+        return result
+
+    def closed(self, path):
+        """update 時に判定したパスが閉じているか"""
+        return self._entries[id(path)][2]
+
+
+class PathIndex:
+    """パスの外接矩形の空間索引と、一括フィルタ用のパスごとの指標
+
+    指標（点数・長さ・閉じたパスの面積・外接矩形）はパスの追加・編集で新しいパスができたときに
+    まとめて1回だけ計算し、フィルタは全パスの指標の配列に対する1回の比較で評価する。
+    外接矩形は一定の大きさの格子に登録し、クリック・矩形での検索は範囲にかかる格子のパスだけを調べる。
+    """
+
+    CELL_SIZE = 64
+    MAX_CELLS = 256     # これより多くの格子にかかるパス・検索範囲は格子を使わず全体を調べる
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._entries = {}  # id(パス): (パス, 点数, 閉じているか, x0, y0, x1, y1, 長さ, 面積)
+        self._order = []
+        self.paths = []
+        self.bboxes = np.zeros((0, 4))
+        self.points = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros(0)
+        self.areas = np.zeros(0)
+        self.closed = np.zeros(0, dtype=bool)
+        self._cell_keys = np.zeros(0, dtype=np.int64)
+        self._cell_paths = np.zeros(0, dtype=np.intp)
+        self._large = np.zeros(0, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def update(self, paths, is_closed):
+        """pathsに合わせて指標と格子を作り直し、指標を計算したパスの本数を返す（変化がなければ何もしない）"""
+        order = [id(path) for path in paths]
+        entries = {}
+        new_paths = {}
+        for path in paths:
+            entry = self._entries.get(id(path))
+            if entry is not None and entry[0] is path and entry[1] == len(path):
+                entries[id(path)] = entry
+            else:
+                new_paths[id(path)] = path
+        if not new_paths and order == self._order:
+            return 0
+        new_paths = list(new_paths.values())
+        for path, metrics in zip(new_paths, self._measure(new_paths)):
+            entries[id(path)] = (path, len(path), is_closed(path)) + metrics
+        self._entries = entries
+        self._order = order
+        self.paths = list(paths)
+
+        rows = [entries[key] for key in order]
+        self.points = np.array([row[1] for row in rows], dtype=np.int64)
+        self.closed = np.array([row[2] for row in rows], dtype=bool)
+        table = np.array([row[3:] for row in rows], dtype=np.float64).reshape(-1, 6)
+        self.bboxes = table[:, :4]
+        self.lengths = table[:, 4]
+        self.areas = np.where(self.closed, table[:, 5], 0.0)
+        self._build_grid()
+        return len(new_paths)
+
+    @staticmethod
+    def _measure(paths):
+        """各パスの (x0, y0, x1, y1, 長さ, 面積) を全パスの点をつないだ配列でまとめて計算する"""
+        counts = np.array([len(path) for path in paths], dtype=np.intp)
+        total = int(counts.sum())
+        if not total:
+            return [(np.nan,) * 4 + (0.0, 0.0)] * len(paths)
+        points = np.fromiter(chain.from_iterable(chain.from_iterable(paths)), dtype=np.float64,
+                             count=2 * total).reshape(-1, 2)
+        starts = np.concatenate([[0], np.cumsum(counts[counts > 0])[:-1]])
+        x, y = points[:, 0], points[:, 1]
+        # 次の点（各パスの最後の点は同じパスの先頭の点）
+        following = np.arange(1, len(points) + 1)
+        ends = starts + counts[counts > 0] - 1
+        following[ends] = starts
+        dx, dy = x[following] - x, y[following] - y
+        segment = np.hypot(dx, dy)
+        segment[ends] = 0.0     # 長さは開いたパスとして測る（閉じたパスは末尾に先頭の点を持つ）
+        cross = x * y[following] - x[following] * y
+        metrics = np.stack([np.minimum.reduceat(x, starts), np.minimum.reduceat(y, starts),
+                            np.maximum.reduceat(x, starts), np.maximum.reduceat(y, starts),
+                            np.add.reduceat(segment, starts), np.abs(np.add.reduceat(cross, starts)) / 2], axis=1)
+        rows = iter(map(tuple, metrics.tolist()))
+        return [next(rows) if count else (np.nan,) * 4 + (0.0, 0.0) for count in counts]
+
+    def _cell_range(self, bboxes):
+        cells = np.floor(np.nan_to_num(bboxes) / self.cell_size).astype(np.int64)
+        return cells[:, 0], cells[:, 1], cells[:, 2], cells[:, 3]
+
+    @staticmethod
+    def _cell_key(cx, cy):
+        return (cy + (1 << 24)) * (1 << 25) + (cx + (1 << 24))
+
+    def _build_grid(self):
+        cx0, cy0, cx1, cy1 = self._cell_range(self.bboxes)
+        widths, heights = cx1 - cx0 + 1, cy1 - cy0 + 1
+        counts = widths * heights
+        large = counts > self.MAX_CELLS
+        self._large = np.flatnonzero(large)
+        small = np.flatnonzero(~large & ~np.isnan(self.bboxes[:, 0]))
+        repeat = counts[small]
+        owners = np.repeat(small, repeat)
+        # パスごとに 0..格子数-1 の通し番号を振り、格子の列・行に直す
+        offsets = np.arange(len(owners)) - np.repeat(np.cumsum(repeat) - repeat, repeat)
+        cx = cx0[owners] + offsets % widths[owners]
+        cy = cy0[owners] + offsets // widths[owners]
+        keys = self._cell_key(cx, cy)
+        order = np.argsort(keys, kind="stable")
+        self._cell_keys = keys[order]
+        self._cell_paths = owners[order]
+
+    def query(self, rect):
+        """外接矩形が rect=(x0, y0, x1, y1) にかかるパスの番号（昇順）"""
+        x0, y0, x1, y1 = min(rect[0], rect[2]), min(rect[1], rect[3]), max(rect[0], rect[2]), max(rect[1], rect[3])
+        (cx0,), (cy0,), (cx1,), (cy1,) = self._cell_range(np.array([[x0, y0, x1, y1]]))
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.MAX_CELLS:
+            candidates = np.arange(len(self.paths))
+        else:
+            cx, cy = np.meshgrid(np.arange(cx0, cx1 + 1), np.arange(cy0, cy1 + 1))
+            keys = self._cell_key(cx.ravel(), cy.ravel())
+            left = np.searchsorted(self._cell_keys, keys, side="left")
+            right = np.searchsorted(self._cell_keys, keys, side="right")
+            found = [self._cell_paths[a:b] for a, b in zip(left, right) if b > a]
+            candidates = np.unique(np.concatenate(found + [self._large]))
+        boxes = self.bboxes[candidates]
+        hit = (boxes[:, 0] <= x1) & (boxes[:, 2] >= x0) & (boxes[:, 1] <= y1) & (boxes[:, 3] >= y0)
+        return candidates[hit]
+
+    def nearest(self, point, max_distance):
+        """点から max_distance 以内で最も近い線分を持つパスの番号（なければNone）"""
+        px, py = point
+        best, best_distance = None, max_distance
+        for i in self.query((px - max_distance, py - max_distance, px + max_distance, py + max_distance)):
+            points = np.asarray(self.paths[i], dtype=np.float64).reshape(-1, 2)
+            a, b = points[:-1], points[1:]
+            if len(a) == 0:
+                a = b = points
+            ab = b - a
+            length2 = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+            t = np.clip(((px - a[:, 0]) * ab[:, 0] + (py - a[:, 1]) * ab[:, 1]) / length2, 0.0, 1.0)
+            distance = np.hypot(a[:, 0] + t * ab[:, 0] - px, a[:, 1] + t * ab[:, 1] - py).min()
+            if distance <= best_distance:
+                best, best_distance = int(i), distance
+        return best
+
+    def inside(self, polygon):
+        """全点が多角形 polygon（画像座標の点の列）の内側にあるパスを示す真偽値の配列"""
+        result = np.zeros(len(self.paths), dtype=bool)
+        polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if len(polygon) < 3 or not len(self.paths):
+            return result
+        x0, y0 = np.floor(polygon.min(axis=0)).astype(int)
+        x1, y1 = np.ceil(polygon.max(axis=0)).astype(int)
+        boxes = self.bboxes
+        candidates = np.flatnonzero((boxes[:, 0] >= x0) & (boxes[:, 2] <= x1) & (boxes[:, 1] >= y0) & (boxes[:, 3] <= y1)
+                                    & (self.points > 0))
+        if not len(candidates):
+            return result
+        # 多角形を塗った画像で、候補のパスの全点をまとめて引く
+        mask = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.rint(polygon - (x0, y0)).astype(np.int32)], 1)
+        points = np.concatenate([np.asarray(self.paths[i], dtype=np.float64).reshape(-1, 2) for i in candidates])
+        columns = np.clip(np.rint(points[:, 0] - x0).astype(np.intp), 0, mask.shape[1] - 1)
+        rows = np.clip(np.rint(points[:, 1] - y0).astype(np.intp), 0, mask.shape[0] - 1)
+        counts = self.points[candidates]
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        result[candidates] = np.minimum.reduceat(mask[rows, columns], starts) > 0
+        return result
+
+    def filter(self, min_points=None, max_points=None, min_length=None, max_length=None,
+               min_area=None, max_area=None, closed=None, region=None, inside=True):
+        """条件をすべて満たすパスを示す真偽値の配列（None の条件は使わない）
+
+        面積は閉じたパスの囲む面積（開いたパスは0）。region は多角形（画像座標の点の列）で、
+        inside=True なら全点がその内側にあるパス、False ならそれ以外のパスに絞る。
+        """
+        keep = np.ones(len(self.paths), dtype=bool)
+        for values, low, high in ((self.points, min_points, max_points), (self.lengths, min_length, max_length),
+                                  (self.areas, min_area, max_area)):
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+        if closed is not None:
+            keep &= self.closed == bool(closed)
+        if region is not None:
+            within = self.inside(region)
+            keep &= within if inside else ~within
+        return keep
+
+
+def build_svg(paths, width, height, save_path="", tolerance=0.0):
+    """パスを線のみのSVGにする（tolerance > 0 なら全パスをまとめて簡略化）"""
+    if tolerance > 0:
+        paths = simplify_paths(paths, tolerance)
+
+    import svgwrite  # 起動を速くするため初回の保存時に読み込む
+
+    # 属性の検証は書き出し時間の半分以上を占めるため省く（出力内容は同じ）
+    dwg = svgwrite.Drawing(save_path, size=(width, height), debug=False)
+    for path in paths:
+        if len(path) < 2:
+            continue
+        path_data = f"M {path[0][0]},{path[0][1]} " + " ".join(f"L {x},{y}" for x, y in path[1:])
+        dwg.add(dwg.path(d=path_data, stroke='black', fill='none', stroke_width=1))
+    return dwg
+
+
+def write_svg(paths, width, height, save_path, tolerance=0.0):
+    """パスを線のみのSVGとして保存する（tolerance > 0 なら保存前に全パスをまとめて簡略化）"""
+    build_svg(paths, width, height, save_path, tolerance).save()
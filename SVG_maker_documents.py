@@ -0,0 +1,245 @@
+"""複数画像（ドキュメント）の切り替えで使う共有キャッシュと先読み
+
+デコード済みの画像と輪郭抽出の結果をメモリ使用量の上限付きLRUキャッシュで共有し、
+同じフォルダの次の画像のデコード（スレッド）と輪郭抽出（ワーカープロセス）を裏で先に済ませておく。
+ドキュメントごとの編集状態はContourEditorAppが保持する。
+
+メモリ上限は環境変数 SVG_MAKER_MEMORY_CACHE_MB（既定: 1024MB）で変更できる。
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from SVG_maker_cache import ResultCache, image_content_hash
+from SVG_maker_core import read_image
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def estimate_bytes(value):
+    """キャッシュする値のおおよそのメモリ使用量（配列はnbytes、辞書・タプル・リストは要素の合計）"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_bytes(item) for item in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """メモリ使用量の上限付きLRUキャッシュ（複数スレッドから使える）"""
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("SVG_MAKER_MEMORY_CACHE_MB", 1024)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # キー: (値, サイズ)、末尾が最近使ったもの
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """値を返す（無ければNone）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """値を保存し、上限を超えた分を最後に使われたのが古い順に捨てる（上限より大きい値は保存しない）"""
+        size = estimate_bytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+def image_cache_key(path):
+    """画像ファイルのキャッシュキー（ファイルが更新されたら別のキーになる）"""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ("image", path, None, None)
+    return ("image", path, stat.st_mtime_ns, stat.st_size)
+
+
+def extraction_cache_key(image_hash, params):
+    """輪郭抽出の結果のキャッシュキー（ディスクキャッシュと同じキー）"""
+    return ("extraction", ResultCache.make_key(image_hash, params))
+
+
+def folder_images(path):
+    """画像と同じフォルダにある画像ファイルを名前順に返す"""
+    folder = os.path.dirname(os.path.abspath(path))
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    return [os.path.join(folder, name) for name in sorted(names, key=str.lower)
+            if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def adjacent_image(path, step=1):
+    """同じフォルダの前後の画像（無ければNone）"""
+    images = folder_images(path)
+    path = os.path.abspath(path)
+    if path not in images:
+        return None
+    index = images.index(path) + step
+    return images[index] if 0 <= index < len(images) else None
+
+
+def _decode(path):
+    image = read_image(path)
+    if image is None:
+        return None
+    return image, image_content_hash(image)
+
+
+_editor = None  # 抽出用ワーカープロセスのヘッドレスエディタ
+
+
+def _init_worker():
+    global _editor
+    from SVG_maker_headless import make_headless_editor
+    _editor = make_headless_editor()
+    _editor.redraw_suspended = True
+
+
+def _extract(path, params):
+    """ワーカープロセスで輪郭抽出し、(画像ハッシュ, キャッシュ用の配列) を返す（読み込めなければNone）"""
+    from SVG_maker_headless import load_headless_image
+    for name, value in params.items():
+        getattr(_editor, name).set(value)
+    if not load_headless_image(_editor, path):
+        return None
+    _editor.update_edges()
+    return _editor.get_image_hash(), _editor.pack_extraction(_editor.edge_points, _editor.smoothed_paths)
+
+
+class Prefetcher:
+    """画像のデコードと輪郭抽出を共有のワーカーで先に済ませ、結果をMemoryCacheに入れる
+
+    ワーカーは最初の先読みで起動し、すべてのドキュメントで共有する。
+    waitの後は実行中だった先読みの結果がキャッシュに入っている。
+    """
+
+    def __init__(self, cache, workers=1):
+        self.cache = cache
+        self.workers = workers
+        self._decoder = None
+        self._extractor = None
+        self._pending = {}  # 画像パス: 実行中の (Future, 結果をキャッシュに入れる関数) のリスト
+        self._lock = threading.Lock()
+
+    def _track(self, path, future, store):
+        """実行中のFutureを記録し、終わったら結果をキャッシュに入れる"""
+        with self._lock:
+            self._pending.setdefault(path, []).append((future, store))
+
+        def finish(done):
+            store(done)
+            with self._lock:
+                jobs = [job for job in self._pending.get(path, []) if job[0] is not done]
+                if jobs:
+                    self._pending[path] = jobs
+                else:
+                    self._pending.pop(path, None)
+
+        future.add_done_callback(finish)
+
+    def _store_image(self, key, future):
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self.cache.put(key, future.result())
+
+    def _store_extraction(self, params, future):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        image_hash, arrays = future.result()
+        self.cache.put(extraction_cache_key(image_hash, params), arrays)
+
+    def load_image(self, path):
+        """(画像, 画素内容のハッシュ) を返す（キャッシュ・先読み中の結果を優先、読み込めなければNone）"""
+        key = image_cache_key(path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        self.wait(path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        loaded = _decode(path)
+        if loaded is not None:
+            self.cache.put(key, loaded)
+        return loaded
+
+    def prefetch(self, path, params=None):
+        """画像を裏でデコードし、paramsを指定した場合は輪郭抽出も行う"""
+        path = os.path.abspath(path)
+        key = image_cache_key(path)
+        with self._lock:
+            if path in self._pending:
+                return
+        cached = self.cache.get(key)
+        if cached is None:
+            if self._decoder is None:
+                self._decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+            future = self._decoder.submit(_decode, path)
+            self._track(path, future, lambda done: self._store_image(key, done))
+        elif params is not None and extraction_cache_key(cached[1], params) in self.cache:
+            return
+        if params is not None:
+            if self._extractor is None:
+                self._extractor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            params = dict(params)
+            future = self._extractor.submit(_extract, path, params)
+            self._track(path, future, lambda done: self._store_extraction(params, done))
+
+    def wait(self, path, timeout=None):
+        """指定した画像の先読みが実行中なら終わるまで待つ"""
+        with self._lock:
+            jobs = list(self._pending.get(os.path.abspath(path), []))
+        if not jobs:
+            return
+        wait([future for future, _ in jobs], timeout=timeout)
+        # 完了時のコールバックより先に戻ることがあるため、ここでも結果をキャッシュに入れる
+        for future, store in jobs:
+            if future.done():
+                store(future)
+
+    def shutdown(self):
+        for executor in (self._decoder, self._extractor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._decoder = self._extractor = None
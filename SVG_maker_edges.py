@@ -0,0 +1,247 @@
+"""輪郭抽出の前段（エッジ画像・2値画像の作成）の切り替え可能な方式
+
+各方式は処理段階 (段階名, 関数) の列で、関数は前の段階の出力と抽出パラメータを受け取る。
+最後の段階の出力（0/255の2値画像）を findContours または中心線追跡に渡す。
+段階ごとに StageProfiler のスパンを作るため、方式ごとの所要時間を段階別に比べられる。
+
+    canny            ガウシアンブラー + Canny（従来の方式）
+    bilateral_canny  バイラテラルフィルタ + Canny（輪郭を残してノイズだけをならす）
+    otsu             ガウシアンブラー + 大津の2値化（きれいな線画・ロゴ向け、Canny閾値は不要）
+    adaptive         ガウシアンブラー + 適応的2値化（照明むらのあるスキャン向け）
+    morph_gradient   ガウシアンブラー + モルフォロジー勾配 + 大津の2値化
+
+2値化の方式は前景（線・塗り）が少ない側になるよう向きを自動で決める。
+大津の閾値や前景の向きのように画像全体から決まる値は、全体を抽出したときに calibration の辞書へ記録し、
+領域再抽出では切り出した範囲から求め直さずにその値を使う（範囲ごとに閾値や向きが変わらないように）。
+方式を増やすときは register_backend で登録する。
+
+使い方（方式ごとの段階別の所要時間と抽出結果の比較）:
+    python SVG_maker_edges.py scan.png logo.png --repeat 3
+    python SVG_maker_edges.py --kinds line_art,scan --size 1 --output edges.json
+"""
+import argparse
+import json
+import statistics
+import sys
+from collections import OrderedDict, namedtuple
+
+import cv2
+
+from SVG_maker_core import blur_image, detect_edges, extract_edge_contours, read_image
+from SVG_maker_profiler import StageProfiler
+
+DEFAULT_EDGE_METHOD = "canny"
+ADAPTIVE_BLOCK_SIZE = 31    # 適応的2値化で閾値を求める近傍の大きさ
+ADAPTIVE_OFFSET = 8         # 近傍の平均からこれだけ離れた画素を前景にする
+BILATERAL_DIAMETER = 9
+BILATERAL_SIGMA = 75
+
+EdgeBackend = namedtuple("EdgeBackend", ["label", "stages", "margin", "calibrated"])
+EDGE_BACKENDS = OrderedDict()
+
+
+def register_backend(name, label, stages, margin=None, calibrated=False):
+    """エッジ検出の方式を登録する
+
+    stages は (段階名, 関数) の列で、関数は (前の段階の出力, 抽出パラメータの辞書) を受け取る。
+    margin は領域再抽出で切り出しに足す余白（画素）を抽出パラメータから求める関数。
+    calibrated は画像全体から決まる値（閾値・前景の向き）を使う方式で、段階の関数は
+    パラメータの "calibration" の辞書にその値を記録し、値があれば求め直さずに使う。
+    """
+    EDGE_BACKENDS[name] = EdgeBackend(label, tuple(stages), margin or _blur_margin, calibrated)
+
+
+def _kernel_size(params):
+    ksize = int(params["gaussian_size"])
+    return ksize + 1 if ksize % 2 == 0 else ksize
+
+
+def _blur_margin(params):
+    return _kernel_size(params) // 2 + 2
+
+
+def _blur(image, params):
+    return blur_image(image, params["gaussian_size"])
+
+
+def _gray(image, params):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _bilateral(gray, params):
+    return cv2.bilateralFilter(gray, BILATERAL_DIAMETER, BILATERAL_SIGMA, BILATERAL_SIGMA)
+
+
+def _canny(gray, params):
+    return detect_edges(gray, params["canny1"], params["canny2"])
+
+
+def _calibrated_value(params, name, compute):
+    """params["calibration"] に記録済みの値を使い、なければ compute() で求めて記録する"""
+    calibration = params.get("calibration")
+    if calibration is not None and name in calibration:
+        return calibration[name]
+    value = compute()
+    if calibration is not None:
+        calibration[name] = value
+    return value
+
+
+def _foreground(binary, params):
+    """前景が画素の半分を超える場合は反転し、少ない側を前景（255）にする"""
+    if _calibrated_value(params, "invert", lambda: cv2.countNonZero(binary) * 2 > binary.size):
+        return cv2.bitwise_not(binary)
+    return binary
+
+
+def _otsu_threshold(gray, params):
+    """大津の閾値で2値化する（閾値は calibration に記録した値があればそれを使う）"""
+    threshold = _calibrated_value(params, "threshold",
+                                  lambda: cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0])
+    _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
+    return binary
+
+
+def _otsu(gray, params):
+    return _foreground(_otsu_threshold(gray, params), params)
+
+
+def _adaptive(gray, params):
+    # 暗い線を前景にする（明るい線の画像は _foreground で反転される）
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV,
+                                   ADAPTIVE_BLOCK_SIZE, ADAPTIVE_OFFSET)
+    return _foreground(binary, params)
+
+
+def _gradient(gray, params):
+    return cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+
+
+def _gradient_threshold(gradient, params):
+    return _otsu_threshold(gradient, params)
+
+
+register_backend("canny", "Canny", [("blur", _blur), ("canny", _canny)])
+register_backend("bilateral_canny", "バイラテラル+Canny",
+                 [("gray", _gray), ("bilateral", _bilateral), ("canny", _canny)],
+                 margin=lambda params: BILATERAL_DIAMETER // 2 + 2)
+register_backend("otsu", "大津の2値化", [("blur", _blur), ("threshold", _otsu)], calibrated=True)
+register_backend("adaptive", "適応的2値化", [("blur", _blur), ("threshold", _adaptive)],
+                 margin=lambda params: _blur_margin(params) + ADAPTIVE_BLOCK_SIZE // 2, calibrated=True)
+register_backend("morph_gradient", "モルフォロジー勾配",
+                 [("blur", _blur), ("gradient", _gradient), ("threshold", _gradient_threshold)],
+                 margin=lambda params: _blur_margin(params) + 1, calibrated=True)
+
+
+def get_backend(method):
+    """方式名から登録済みの方式を返す（不明な方式はValueError）"""
+    try:
+        return EDGE_BACKENDS[method]
+    except KeyError:
+        raise ValueError(f"不明なエッジ検出方式です: {method}") from None
+
+
+def edge_margin(method, params):
+    """領域再抽出で範囲の外側に足す余白（画素）"""
+    return get_backend(method).margin(params)
+
+
+def detect_edge_image(image, method, params, profiler=None, calibration=None):
+    """BGR画像から方式に従ってエッジ画像（2値）を作る（各段階を profiler のスパンとして記録）
+
+    calibration に辞書を渡すと、画像全体から決まる値（閾値・前景の向き）を空の辞書には記録し、
+    記録済みの辞書からは求め直さずに使う（領域再抽出で全体の抽出と同じ値を使うため）。
+    """
+    backend = get_backend(method)
+    if calibration is not None:
+        params = dict(params, calibration=calibration)
+    data = image
+    for stage_name, function in backend.stages:
+        if profiler is None:
+            data = function(data, params)
+        else:
+            with profiler.span(stage_name, method=method):
+                data = function(data, params)
+    return data
+
+
+def measure_backend(image, method, params, repeat=1):
+    """方式を repeat 回実行し、段階ごとの所要時間（中央値）と抽出した輪郭の数・点数を返す"""
+    durations = {}
+    for _ in range(max(1, repeat)):
+        profiler = StageProfiler()
+        with profiler.span("extract"):
+            edges = detect_edge_image(image, method, params, profiler)
+            with profiler.span("find_contours"):
+                _, valid_contours, _ = extract_edge_contours(edges, params["extraction_mode"])
+        for event in profiler.events:
+            if event["depth"] > 0:
+                durations.setdefault(event["name"], []).append(event["duration"])
+    stages = {name: statistics.median(values) for name, values in durations.items()}
+    return {
+        "method": method,
+        "stages": stages,
+        "seconds": sum(stages.values()),
+        "contours": len(valid_contours),
+        "points": sum(len(contour) for contour in valid_contours),
+    }
+
+
+def compare_backends(images, params, methods=None, repeat=1):
+    """{名前: 画像} の各画像について全方式（または methods）を計測した結果のリストを返す"""
+    results = []
+    for name, image in images.items():
+        for method in methods or EDGE_BACKENDS:
+            result = measure_backend(image, method, params, repeat)
+            result["image"] = name
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="エッジ検出の方式ごとの段階別の所要時間と抽出結果を比較する")
+    parser.add_argument("images", nargs="*", help="比較に使う画像（省略時はベンチマークの合成画像）")
+    parser.add_argument("--kinds", default="line_art,photo_noise,dense_text,scan",
+                        help="画像を省略したときに使う合成画像の種類（カンマ区切り）")
+    parser.add_argument("--size", type=float, default=1, help="合成画像のサイズ（メガピクセル）")
+    parser.add_argument("--methods", default=",".join(EDGE_BACKENDS), help="比較する方式（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=3, help="各方式の計測回数（中央値を採用）")
+    parser.add_argument("--gaussian-size", type=int, default=5)
+    parser.add_argument("--canny1", type=int, default=50)
+    parser.add_argument("--canny2", type=int, default=150)
+    parser.add_argument("--extraction-mode", choices=["contour", "centerline"], default="contour")
+    parser.add_argument("--output", help="結果JSONの保存先")
+    args = parser.parse_args(argv)
+
+    methods = [method for method in args.methods.split(",") if method]
+    for method in methods:
+        if method not in EDGE_BACKENDS:
+            parser.error(f"不明なエッジ検出方式です: {method}")
+    if args.images:
+        images = {}
+        for path in args.images:
+            image = read_image(path)
+            if image is None:
+                print(f"画像を読み込めません: {path}", file=sys.stderr)
+                return 1
+            images[path] = image
+    else:
+        from SVG_maker_bench import generate_image
+        images = {f"{kind}_{args.size:g}mp": generate_image(kind, args.size)
+                  for kind in args.kinds.split(",") if kind}
+
+    params = {"gaussian_size": args.gaussian_size, "canny1": args.canny1, "canny2": args.canny2,
+              "extraction_mode": args.extraction_mode}
+    results = compare_backends(images, params, methods, args.repeat)
+    for result in results:
+        stages = " ".join(f"{name}={seconds * 1000:.1f}" for name, seconds in result["stages"].items())
+        print(f"{result['image']:<24} {result['method']:<16} {result['seconds'] * 1000:8.1f}ms "
+              f"輪郭{result['contours']:>6} 点{result['points']:>8}  ({stages})")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "results": results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""出力SVGの忠実度と処理コストの比較（設定の組み合わせごとの精度・再現率と所要時間）
+
+書き出すパス（export_svg と同じく簡略化したもの）を元画像と同じ解像度で cv2.polylines により描き、
+基準のエッジ画像（基準パラメータのCanny）と画素の許容距離以内で照合する。
+
+    精度 (precision)  描いたパスの画素のうち、基準のエッジから許容距離以内にあるものの割合
+    再現率 (recall)   基準のエッジの画素のうち、描いたパスから許容距離以内にあるものの割合
+
+設定の組み合わせは --grid で「パラメータ名=値,値;パラメータ名=値,...」と指定し、すべての組み合わせを
+基準パラメータに上書きして計測する。結果は表（標準エラー出力）とJSONで出力する。
+
+中心線追跡の回帰確認（--check-centerlines）では、塗りつぶした円のエッジと幅1画素の長方形を追跡し、
+1本の閉じたパスとしてすべての画素を覆うかを確かめる。
+
+使い方:
+    python SVG_maker_fidelity.py --grid "simplify_tolerance=0,1,2,4;edge_method=canny,otsu"
+    python SVG_maker_fidelity.py --check-centerlines
+    python SVG_maker_fidelity.py scan.png logo.png --grid "extraction_mode=contour,centerline" --output fidelity.json
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from SVG_maker_core import read_image, simplify_paths, trace_centerlines
+from SVG_maker_edges import detect_edge_image
+from SVG_maker_headless import make_headless_editor, set_headless_image
+from SVG_maker_journal import EXTRACT_PARAMS
+
+DEFAULT_PIXEL_TOLERANCE = 2.0
+
+
+def rasterize_paths(paths, width, height):
+    """パスを幅1画素の線として描いた2値画像（0/255）"""
+    canvas = np.zeros((height, width), dtype=np.uint8)
+    polylines = [np.rint(np.asarray(path, dtype=np.float64).reshape(-1, 2)).astype(np.int32)
+                 for path in paths if len(path) > 1]
+    if polylines:
+        cv2.polylines(canvas, polylines, False, 255, 1)
+    return canvas
+
+
+def _distance_to(binary):
+    """各画素から binary の前景までの距離（前景がなければ無限大）"""
+    if not cv2.countNonZero(binary):
+        return np.full(binary.shape, np.inf, dtype=np.float32)
+    return cv2.distanceTransform(cv2.bitwise_not(binary), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+
+
+def score(rendered, reference, tolerance=DEFAULT_PIXEL_TOLERANCE):
+    """描いたパスと基準のエッジ画像の {precision, recall, f1}（画素の許容距離 tolerance 以内を一致とみなす）"""
+    rendered_pixels = rendered > 0
+    reference_pixels = reference > 0
+    precision = float(np.mean(_distance_to(reference)[rendered_pixels] <= tolerance)) if rendered_pixels.any() else 0.0
+    recall = float(np.mean(_distance_to(rendered)[reference_pixels] <= tolerance)) if reference_pixels.any() else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def reference_edges(image, params):
+    """基準のエッジ画像（基準パラメータのガウシアンブラー + Canny）"""
+    return detect_edge_image(image, "canny", params)
+
+
+def measure_setting(image, reference, params, tolerance=DEFAULT_PIXEL_TOLERANCE, repeat=1):
+    """1つの設定で輪郭抽出とSVG書き出しを行い、所要時間（中央値）・点数・SVGのバイト数・忠実度を返す"""
+    extract_times = []
+    export_times = []
+    for _ in range(max(1, repeat)):
+        editor = make_headless_editor(params)
+        editor.redraw_suspended = True
+        set_headless_image(editor, image)
+        start = time.perf_counter()
+        editor.update_edges()
+        extract_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        svg_text = editor.export_svg_text()
+        export_times.append(time.perf_counter() - start)
+    # SVGに書き出されるのと同じ簡略化後のパスを採点する
+    tolerance_px = editor.get_simplify_tolerance()
+    exported = simplify_paths(editor.smoothed_paths, tolerance_px) if tolerance_px > 0 else editor.smoothed_paths
+    result = {
+        "params": {name: params[name] for name in EXTRACT_PARAMS},
+        "extract_seconds": statistics.median(extract_times),
+        "export_seconds": statistics.median(export_times),
+        "paths": len(exported),
+        "points": sum(len(path) for path in exported),
+        "svg_bytes": len(svg_text.encode("utf-8")),
+    }
+    result["seconds"] = result["extract_seconds"] + result["export_seconds"]
+    result.update(score(rasterize_paths(exported, editor.w, editor.h), reference, tolerance))
+    return result
+
+
+def parse_grid(text):
+    """「名前=値,値;名前=値」を {名前: [値, ...]} にする（数値に見える値は数値にする）"""
+    grid = {}
+    for part in (text or "").split(";"):
+        if not part.strip():
+            continue
+        name, _, values = part.partition("=")
+        name = name.strip()
+        if name not in EXTRACT_PARAMS:
+            raise ValueError(f"不明なパラメータです: {name}（{', '.join(EXTRACT_PARAMS)}）")
+        grid[name] = [_parse_value(value.strip()) for value in values.split(",") if value.strip()]
+        if not grid[name]:
+            raise ValueError(f"値がありません: {name}")
+    return grid
+
+
+def _parse_value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def grid_settings(base, grid):
+    """基準パラメータに grid のすべての組み合わせを上書きした設定のリスト"""
+    names = list(grid)
+    return [dict(base, **dict(zip(names, values))) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def run_fidelity(images, base, grid, tolerance=DEFAULT_PIXEL_TOLERANCE, repeat=1):
+    """{名前: 画像} のすべての画像と設定の組み合わせを計測した結果のリストを返す"""
+    settings = grid_settings(base, grid)
+    results = []
+    for name, image in images.items():
+        reference = reference_edges(image, base)
+        for params in settings:
+            result = measure_setting(image, reference, params, tolerance, repeat)
+            result["image"] = name
+            results.append(result)
+    return results
+
+
+def format_table(results, grid):
+    """結果を1設定1行の表の文字列にする"""
+    names = list(grid)
+    header = ["image"] + names + ["seconds", "points", "svg_bytes", "precision", "recall", "f1"]
+    rows = [[result["image"]] + [str(result["params"][name]) for name in names] +
+            [f"{result['seconds']:.3f}", str(result["points"]), str(result["svg_bytes"]),
+             f"{result['precision']:.3f}", f"{result['recall']:.3f}", f"{result['f1']:.3f}"]
+            for result in results]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in [header] + rows)
+
+
+def centerline_cases():
+    """中心線追跡の回帰確認に使う {名前: エッジ画像}（どちらも1本の閉じた線になるべきもの）"""
+    circle = np.zeros((200, 200), dtype=np.uint8)
+    cv2.circle(circle, (100, 100), 50, 255, -1)
+    rectangle = np.zeros((100, 120), dtype=np.uint8)
+    cv2.rectangle(rectangle, (10, 10), (90, 70), 255, 1)
+    return {"filled_circle_canny": cv2.Canny(circle, 50, 150), "rectangle_1px": rectangle}
+
+
+def check_centerlines(tolerance=1.0):
+    """中心線追跡が閉じた線を1本の閉じたパスとして取りこぼしなく返すかを確かめ、問題点のリストを返す"""
+    problems = []
+    for name, edges in centerline_cases().items():
+        polylines, closed_flags = trace_centerlines(edges)
+        h, w = edges.shape
+        recall = score(rasterize_paths(polylines, w, h), edges, tolerance)["recall"]
+        if len(polylines) != 1 or not all(closed_flags):
+            problems.append(f"{name}: 1本の閉じたパスになりません（{len(polylines)}本, 閉じている: {closed_flags}）")
+        if recall < 1.0:
+            problems.append(f"{name}: エッジの画素を覆いきれていません（再現率 {recall:.3f}）")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="設定の組み合わせごとの出力SVGの忠実度（精度・再現率）と処理コストを比較する")
+    parser.add_argument("images", nargs="*", help="比較に使う画像（省略時はベンチマークの合成画像）")
+    parser.add_argument("--kinds", default="line_art,photo_noise,dense_text,scan",
+                        help="画像を省略したときに使う合成画像の種類（カンマ区切り）")
+    parser.add_argument("--size", type=float, default=1, help="合成画像のサイズ（メガピクセル）")
+    parser.add_argument("--grid", default="simplify_tolerance=0,1,2,4",
+                        help="比較する設定（例: \"simplify_tolerance=0,1,2;edge_method=canny,otsu\"）")
+    parser.add_argument("--pixel-tolerance", type=float, default=DEFAULT_PIXEL_TOLERANCE,
+                        help="一致とみなす基準のエッジからの距離（画素）")
+    parser.add_argument("--repeat", type=int, default=1, help="各設定の計測回数（所要時間は中央値）")
+    parser.add_argument("--gaussian-size", type=int, default=5)
+    parser.add_argument("--canny1", type=int, default=50)
+    parser.add_argument("--canny2", type=int, default=150)
+    parser.add_argument("--extraction-mode", choices=["contour", "centerline"], default="contour")
+    parser.add_argument("--simplify-tolerance", type=float, default=1.0)
+    parser.add_argument("--edge-method", default="canny")
+    parser.add_argument("--output", help="結果JSONの保存先（省略時は標準出力）")
+    parser.add_argument("--check-centerlines", action="store_true",
+                        help="中心線追跡の回帰確認（円と長方形が1本の閉じたパスになるか）だけを行う")
+    args = parser.parse_args(argv)
+
+    if args.check_centerlines:
+        problems = check_centerlines()
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        print("中心線追跡: " + ("NG" if problems else "OK"), file=sys.stderr)
+        return 1 if problems else 0
+
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.images:
+        images = {}
+        for path in args.images:
+            image = read_image(path)
+            if image is None:
+                print(f"画像を読み込めません: {path}", file=sys.stderr)
+                return 1
+            images[path] = image
+    else:
+        from SVG_maker_bench import generate_image
+        images = {f"{kind}_{args.size:g}mp": generate_image(kind, args.size)
+                  for kind in args.kinds.split(",") if kind}
+
+    base = {name: getattr(args, name) for name in EXTRACT_PARAMS}
+    results = run_fidelity(images, base, grid, args.pixel_tolerance, args.repeat)
+    print(format_table(results, grid), file=sys.stderr)
+
+    text = json.dumps({"base": base, "grid": grid, "pixel_tolerance": args.pixel_tolerance, "reference": "canny",
+                       "results": results}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
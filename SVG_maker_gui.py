@@ -1,14 +1,31 @@
+import time
+_IMPORT_START = time.perf_counter()
+import hashlib
+import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
+from collections import Counter
 import cv2
 import numpy as np
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-import svgwrite
-from scipy.interpolate import splprep, splev
+from SVG_maker_color import vectorize_colors, write_color_svg
+from SVG_maker_cache import ResultCache, image_content_hash
+from SVG_maker_documents import MemoryCache, Prefetcher, adjacent_image, extraction_cache_key
+from SVG_maker_edges import DEFAULT_EDGE_METHOD, EDGE_BACKENDS, detect_edge_image, edge_margin
+from SVG_maker_journal import EXTRACT_PARAMS, EditJournal
+from SVG_maker_profiler import StageProfiler
+from SVG_maker_project import (PROJECT_EXTENSION, ProjectFormatError, file_sha1, pack_paths, read_project,
+                               unpack_paths, unpack_point_lists, write_project)
+from SVG_maker_svgimport import read_svg, to_point_lists
+from SVG_maker_raster import (RasterPanel, Viewport, blank, blend_polyline, draw_image, draw_marker, draw_points,
+                              draw_polylines, draw_rectangle, fill_evenodd)
+from SVG_maker_core import (MIN_CONTOUR_POINTS, PathIndex, PathPyramid, PathTopology, build_svg, extract_edge_contours,
+                            read_image, simplify_paths, simplify_polyline, write_svg)
 
 class ContourEditorApp:
+    MIN_CONTOUR_POINTS = MIN_CONTOUR_POINTS     # 抽出・編集で残すパスの最小点数（SVG_maker_core と共通）
+
     def __init__(self, master):
         self.master = master
         self.master.title("輪郭抽出ツール")
@@ -23,6 +40,10 @@ class ContourEditorApp:
         self.gaussian_size = tk.IntVar(value=15)
         self.canny1 = tk.IntVar(value=200)
         self.canny2 = tk.IntVar(value=300)
+        self.extraction_mode = tk.StringVar(value="contour")  # contour: 輪郭追跡 centerline: 中心線追跡
+        self.simplify_tolerance = tk.DoubleVar(value=1.0)  # Douglas-Peucker簡略化の許容誤差（px、0で無効）
+        self.edge_method = tk.StringVar(value=DEFAULT_EDGE_METHOD)  # エッジ検出の方式（SVG_maker_edgesの登録名）
+        self.color_count = tk.IntVar(value=8)  # カラーSVGの色数
         self.pen_size = tk.IntVar(value=10)
         self.pen_size_display = tk.StringVar(value="10")
         self.trajectory_threshold = tk.DoubleVar(value=0.3)  # best_scoreの閾値
@@ -71,6 +92,39 @@ class ContourEditorApp:
         
         # 手動で追加されたエッジ点を管理
         self.manual_edge_points = []
+        
+        # パス端点の索引（smoothed_pathsが外部で変更されたら再構築）
+        self.path_topology = None
+        self._topology_paths = None
+        self._topology_count = 0
+        
+        # パス再生成用のエッジ点グループとスプライン補間結果のキャッシュ
+        self.edge_group_cache = None
+        
+        # 画像全体から求めた2値化の閾値・前景の向き（領域再抽出で使う）: (パラメータ, 値の辞書)
+        self.edge_calibration = None
+        
+        # パスごとの解像度別の簡略化版（右パネルの描画でズームに応じた段階を使う）
+        self.path_pyramid = PathPyramid()
+        
+        # パスの外接矩形の空間索引と一括フィルタ用の指標、選択モードで選んだパス
+        self.path_index = PathIndex()
+        self.selected_path_ids = set()      # 選択中のパスのid
+        self.selection_region = None        # 最後に投げ縄・矩形で選んだ範囲（一括フィルタの範囲に使う）
+        
+        # 編集履歴（別の解像度の画像に再生できるよう正規化座標で記録）
+        self.journal = EditJournal()
+        
+        # 画像内容とパラメータをキーにした抽出結果のディスクキャッシュ
+        self.result_cache = ResultCache()
+        self.use_result_cache = tk.BooleanVar(value=True)
+        self._image_hash = None
+        
+        # 開いている画像（ドキュメント）ごとの編集状態と、デコード済み画像・抽出結果の共有キャッシュ
+        self.documents = []             # {"filename": パス, "state": 切り替え前に保存した編集状態}
+        self.current_document = None    # 編集中のドキュメントの番号
+        self.memory_cache = MemoryCache()
+        self.prefetcher = Prefetcher(self.memory_cache)
 
         self.drawing = False
         self.trace_points = []
@@ -81,16 +135,35 @@ class ContourEditorApp:
         self.view_ylim = None
         self.panning = False
         self.min_zoom = 1.0
+        self.redraw_suspended = False  # 編集履歴の再生中など、途中の再描画を省略する
 
         self.tool_mode = tk.StringVar(value="eraser")
+        self.selection_shape = tk.StringVar(value="lasso")   # 選択モードのドラッグ: lasso（投げ縄）/ rect（矩形）
+        self.filter_dialog = None
         self.tool_mode.trace_add('write', self.on_mode_change)
 
         self.selected_edge = None
         self.status_text = tk.StringVar(value="")
+        
+        # 処理段階ごとの計測（計測表示がオンのとき直近の操作の所要時間を表示）
+        self.profiler = StageProfiler()
+        self.profiler.listeners.append(self.update_timing_overlay)
+        self.show_timing = tk.BooleanVar(value=False)
+        self.timing_text = tk.StringVar(value="")
+        self.show_timing.trace_add('write', lambda *args: self.update_timing_overlay(None))
+        
+        # マウス移動イベントの間引き（保留中の再描画は常に1つだけ、fps上限付き）
+        self.max_redraw_fps = tk.DoubleVar(value=30.0)  # 0で上限なし
+        self.redraw_pending_id = None
+        self.pending_event_times = []  # 再描画待ちのイベント受信時刻（perf_counter）
+        self.last_redraw_time = 0.0
 
         self.setup_ui()
         self.master.bind("<Control-z>", self.undo)
         self.master.bind("<Control-y>", self.redo)
+        self.master.bind("<Delete>", lambda event: self.edit_selected_paths())
+        self.master.bind("<Prior>", lambda event: self.show_adjacent_image(-1))
+        self.master.bind("<Next>", lambda event: self.show_adjacent_image(1))
 
     def setup_ui(self):
         self.info_visible = tk.BooleanVar(value=False)
@@ -118,13 +191,27 @@ class ContourEditorApp:
                 "【操作方法】\n"
                 "・画像を開く：画像選択後、自動的にエッジ検出とスプライン補間を実行\n"
                 "・輪郭抽出：エッジ検出のパラメータを変更後、再度エッジ検出とスプライン補間を実行\n"
+                "・抽出方式：輪郭は閉じたパス、中心線はエッジを細線化して一本線の開いたパスとして抽出\n"
+                "・簡略化許容値：スプライン補間前の輪郭とSVG保存時のパスを指定誤差(px)で間引く（0で無効）\n"
+                "・エッジ検出：Canny・大津の2値化・適応的2値化などから選択（きれいな線画は2値化の方が速く輪郭もきれい、計測表示で段階別の所要時間を確認）\n"
                 "・消しゴム：なぞった部分のエッジ点とパスを完全削除→パス再生成\n"
                 "・ペン：クリックでエッジ点追加、ドラッグで複数エッジ点追加→パス再生成\n"
                 "・クロージング：クリックでエッジ選択→2回目で接続、ドラッグで始終点エッジ接続\n"
+                "・端点接続：ツールサイズ以内にある開いたパスの端点どうしを一括で接続\n"
+                "・領域再抽出：パラメータを変更してから矩形をドラッグ→範囲内の抽出パスとエッジ点だけを再抽出（手動パスは保持）\n"
+                "・カラーSVG保存：画像を指定の色数に減色し、色ごとの塗りつぶし領域としてSVGに保存（輪郭抽出・編集結果は使わない）\n"
                 "・右画面：閉じた領域は黒色で塗りつぶし表示\n"
                 "・マウススクロールで拡大・縮小（デフォルトサイズより縮小不可）\n"
                 "・マウスホイール（中ボタン）を押しながらドラッグで画像移動\n"
-                "・「表示リセット」で元に戻る、Ctrl+Zで元に戻す、Ctrl+Yでやり直し"
+                "・「表示リセット」で元に戻る、Ctrl+Zで元に戻す、Ctrl+Yでやり直し\n"
+                "・結果キャッシュ：同じ画像・同じパラメータの抽出結果をディスクに保存して再利用（SVG_MAKER_CACHE_DIR / SVG_MAKER_CACHE_MBで場所と上限を変更）\n"
+                "・編集履歴保存/再生：輪郭抽出と各編集を画像サイズに依存しない座標で保存し、原寸画像や別のパラメータで再生\n"
+                "・前の画像/次の画像（PageUp/PageDown）：同じフォルダの画像を開く。開いた画像ごとに編集状態を保持し、一覧から切り替え（次の画像は裏で先に読み込んで輪郭抽出）\n"
+                "・プロジェクト保存/読込：エッジ点・パス・手動編集・パラメータを保存し、輪郭抽出をやり直さずに再開\n"
+                "・計測表示：直近の操作の段階別所要時間と描画遅延（p50/p95）を表示、計測保存でChromeトレース形式のJSONを保存\n"
+                "・描画上限fps：ドラッグ中の再描画頻度の上限（0で上限なし、軌跡の点はすべて記録）\n"
+                "・描画方式：環境変数 SVG_MAKER_RENDERER=opencv（または起動時の --renderer opencv）でOpenCVによる直接描画に切り替え（パスが多い画像で高速）\n"
+                "・プロファイル：次の1操作をcProfileで計測して.profファイルに保存"
             ),
             font=("Meiryo", 11), justify="left", anchor="w", background="#f0f0f0",
             padding=10, relief="solid", borderwidth=1
@@ -135,6 +222,23 @@ class ContourEditorApp:
         
         font_big = ("Meiryo", 14)
         
+        timing_frame = ttk.Frame(tool_frame)
+        timing_frame.pack(side=tk.LEFT, padx=10)
+        ttk.Checkbutton(timing_frame, text="計測表示", variable=self.show_timing).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(timing_frame, text="計測保存", command=self.save_timing_trace).pack(side=tk.LEFT, padx=2)
+        ttk.Button(timing_frame, text="プロファイル", command=self.arm_cprofile).pack(side=tk.LEFT, padx=2)
+        ttk.Label(timing_frame, text="描画上限fps:").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Entry(timing_frame, textvariable=self.max_redraw_fps, width=4).pack(side=tk.LEFT)
+        ttk.Label(timing_frame, textvariable=self.timing_text, font=("Meiryo", 9), foreground="gray").pack(side=tk.LEFT, padx=(10, 0))
+        
+        document_frame = ttk.Frame(tool_frame)
+        document_frame.pack(side=tk.LEFT, padx=10)
+        ttk.Button(document_frame, text="◀ 前の画像", command=lambda: self.show_adjacent_image(-1)).pack(side=tk.LEFT, padx=2)
+        self.document_list = ttk.Combobox(document_frame, state="readonly", width=30)
+        self.document_list.pack(side=tk.LEFT, padx=2)
+        self.document_list.bind("<<ComboboxSelected>>", lambda event: self.switch_document(self.document_list.current()))
+        ttk.Button(document_frame, text="次の画像 ▶", command=lambda: self.show_adjacent_image(1)).pack(side=tk.LEFT, padx=2)
+        
         left_spacer = ttk.Frame(tool_frame)
         left_spacer.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
@@ -176,7 +280,7 @@ class ContourEditorApp:
         mode_frame.grid(row=0, column=1, sticky="ew", padx=(20, 0))
         param_main_frame.columnconfigure(1, weight=1)
         
-        ttk.Label(mode_frame, text="編集モード", font=("Meiryo", 12, "bold")).grid(row=0, column=0, columnspan=3, pady=(5, 10))
+        ttk.Label(mode_frame, text="編集モード", font=("Meiryo", 12, "bold")).grid(row=0, column=0, columnspan=5, pady=(5, 10))
         
         ttk.Radiobutton(mode_frame, text="消しゴム", variable=self.tool_mode, value="eraser", 
                        style="Tool.TRadiobutton", width=10).grid(row=1, column=0, padx=5, pady=2, sticky="ew")
@@ -184,10 +288,20 @@ class ContourEditorApp:
                        style="Tool.TRadiobutton", width=10).grid(row=1, column=1, padx=5, pady=2, sticky="ew")
         ttk.Radiobutton(mode_frame, text="クロージング", variable=self.tool_mode, value="closing", 
                        style="Tool.TRadiobutton", width=12).grid(row=1, column=2, padx=5, pady=2, sticky="ew")
+        ttk.Radiobutton(mode_frame, text="領域再抽出", variable=self.tool_mode, value="region", 
+                       style="Tool.TRadiobutton", width=12).grid(row=1, column=3, padx=5, pady=2, sticky="ew")
+        ttk.Radiobutton(mode_frame, text="選択", variable=self.tool_mode, value="select", 
+                       style="Tool.TRadiobutton", width=8).grid(row=1, column=4, padx=5, pady=2, sticky="ew")
         
-        mode_desc = ttk.Label(mode_frame, text="消しゴム:エッジ・パス削除 ペン:エッジ追加 クロージング:エッジ接続", 
+        mode_desc = ttk.Label(mode_frame, text="消しゴム:エッジ・パス削除 ペン:エッジ追加 クロージング:エッジ接続 領域再抽出:範囲内を再抽出 選択:クリック・ドラッグでパスを選択（Deleteで削除）", 
                              font=("Meiryo", 9), foreground="gray")
-        mode_desc.grid(row=2, column=0, columnspan=3, pady=(5, 10))
+        mode_desc.grid(row=2, column=0, columnspan=5, pady=(5, 0))
+        selection_frame = ttk.Frame(mode_frame)
+        selection_frame.grid(row=3, column=0, columnspan=5, pady=(0, 10))
+        ttk.Label(selection_frame, text="選択の形:").pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Radiobutton(selection_frame, text="投げ縄", variable=self.selection_shape, value="lasso").pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Radiobutton(selection_frame, text="矩形", variable=self.selection_shape, value="rect").pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Button(selection_frame, text="一括フィルタ", command=self.open_filter_dialog).pack(side=tk.LEFT)
         
         param_row1 = ttk.Frame(param_left_frame)
         param_row1.grid(row=0, column=0, sticky="ew", pady=5)
@@ -202,6 +316,14 @@ class ContourEditorApp:
         ttk.Entry(param_row1, textvariable=self.canny1, width=8, font=font_big).grid(row=0, column=3, padx=(0, 20), sticky="w")
         ttk.Label(param_row1, text="Canny閾値2:", font=font_big).grid(row=0, column=4, padx=(0, 5), sticky="w")
         ttk.Entry(param_row1, textvariable=self.canny2, width=8, font=font_big).grid(row=0, column=5, padx=(0, 20), sticky="w")
+        ttk.Label(param_row1, text="抽出方式:", font=font_big).grid(row=0, column=6, padx=(0, 5), sticky="w")
+        extraction_frame = ttk.Frame(param_row1)
+        extraction_frame.grid(row=0, column=7, sticky="w")
+        ttk.Radiobutton(extraction_frame, text="輪郭", variable=self.extraction_mode, value="contour").pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Radiobutton(extraction_frame, text="中心線", variable=self.extraction_mode, value="centerline").pack(side=tk.LEFT)
+        ttk.Label(param_row1, text="簡略化許容値:", font=font_big).grid(row=0, column=8, padx=(20, 5), sticky="w")
+        ttk.Entry(param_row1, textvariable=self.simplify_tolerance, width=6, font=font_big).grid(row=0, column=9, sticky="w")
+        ttk.Checkbutton(param_row1, text="結果キャッシュ", variable=self.use_result_cache).grid(row=0, column=10, padx=(20, 0), sticky="w")
         
         param_row2 = ttk.Frame(param_left_frame)
         param_row2.grid(row=1, column=0, sticky="ew", pady=5)
@@ -214,14 +336,40 @@ class ContourEditorApp:
                                   background="white", relief="sunken")
         pen_size_label.grid(row=0, column=2, padx=(0, 20), sticky="w")
         
+        ttk.Label(param_row2, text="色数:", font=font_big).grid(row=0, column=3, padx=(0, 5), sticky="w")
+        ttk.Entry(param_row2, textvariable=self.color_count, width=4, font=font_big).grid(row=0, column=4, sticky="w")
+        
+        ttk.Label(param_row2, text="エッジ検出:", font=font_big).grid(row=0, column=5, padx=(20, 5), sticky="w")
+        edge_methods = list(EDGE_BACKENDS)
+        edge_method_list = ttk.Combobox(param_row2, state="readonly", width=16,
+                                        values=[EDGE_BACKENDS[method].label for method in edge_methods])
+        edge_method_list.grid(row=0, column=6, sticky="w")
+        edge_method_list.bind("<<ComboboxSelected>>",
+                              lambda event: self.edge_method.set(edge_methods[edge_method_list.current()]))
+        
+        def show_edge_method(*args):
+            # プロジェクト・編集履歴の読み込みで方式が変わった場合も表示を合わせる
+            if self.edge_method.get() in edge_methods:
+                edge_method_list.current(edge_methods.index(self.edge_method.get()))
+        
+        self.edge_method.trace_add('write', show_edge_method)
+        show_edge_method()
+        
         button_frame = ttk.Frame(param_row2)
-        button_frame.grid(row=0, column=3, sticky="ew", padx=(20, 0))
-        param_row2.columnconfigure(3, weight=1)
+        button_frame.grid(row=0, column=7, sticky="ew", padx=(20, 0))
+        param_row2.columnconfigure(7, weight=1)
         
         button_configs = [
             ("画像を開く", self.open_image, 10),
+            ("SVG読込", self.open_svg, 10),
+            ("プロジェクト読込", self.open_project, 14),
+            ("プロジェクト保存", self.save_project, 14),
+            ("編集履歴保存", self.save_journal, 12),
+            ("編集履歴再生", self.open_journal, 12),
             ("輪郭抽出", self.update_edges, 10),
+            ("端点接続", self.join_all_endpoints, 10),
             ("SVG保存", self.save_svg, 10),
+            ("カラーSVG保存", self.save_color_svg, 14),
             ("表示リセット", self.reset_view, 10),
             ("終了", self.quit_app, 8)
         ]
@@ -243,23 +391,17 @@ class ContourEditorApp:
         right_title_frame.pack(fill=tk.X, pady=(5, 0))
         ttk.Label(right_title_frame, text="パス表示", font=("Meiryo", 14, "bold"), anchor="center").pack(fill=tk.X)
 
-        self.fig_left, self.ax_left = plt.subplots(figsize=(6, 6))
-        self.canvas_left = FigureCanvasTkAgg(self.fig_left, master=left_frame)
-        self.canvas_left.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-        self.fig_center, self.ax_center = plt.subplots(figsize=(6, 6))
-        self.canvas_center = FigureCanvasTkAgg(self.fig_center, master=center_frame)
-        self.canvas_center.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-        self.fig_right, self.ax_right = plt.subplots(figsize=(6, 6))
-        self.canvas_right = FigureCanvasTkAgg(self.fig_right, master=right_frame)
-        self.canvas_right.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-        for canvas in [self.canvas_left, self.canvas_center, self.canvas_right]:
-            canvas.mpl_connect("button_press_event", self.on_trace_press)
-            canvas.mpl_connect("motion_notify_event", self.on_trace_motion)
-            canvas.mpl_connect("button_release_event", self.on_trace_release)
-            canvas.mpl_connect("scroll_event", self.on_scroll)
+        # matplotlibの描画領域は起動を速くするためウィンドウ表示後に作成する（create_canvases）
+        # SVG_MAKER_RENDERER=opencv ならmatplotlibの代わりにOpenCVで直接描画したパネルを使う
+        self.renderer = os.environ.get("SVG_MAKER_RENDERER", "matplotlib")
+        self._raster_image = None       # OpenCV描画で表示範囲に合わせて縮小・拡大した元画像
+        self._raster_image_key = None
+        self.panel_frames = {"left": left_frame, "center": center_frame, "right": right_frame}
+        for name in self.panel_frames:
+            setattr(self, f"fig_{name}", None)
+            setattr(self, f"ax_{name}", None)
+            setattr(self, f"canvas_{name}", None)
+        self._map_binding = self.master.bind("<Map>", self.on_first_map, add="+")
 
         style = ttk.Style()
         style.configure("Big.TButton", font=font_big, padding=(10, 8))
@@ -277,17 +419,145 @@ class ContourEditorApp:
         path = filedialog.askopenfilename(filetypes=[("画像ファイル", "*.png;*.jpg;*.jpeg;*.bmp;*.tif;*.tiff")])
         if not path:
             return
-        
+        self.load_image(path)
+
+    def load_image(self, path):
+        """画像を新しいドキュメントとして読み込み、エッジ検出を実行（開いている画像なら切り替えるだけ）"""
+        index = self.find_document(path)
+        if index is not None:
+            self.switch_document(index)
+            return
         self.show_status("画像読み込み中...")
         self.master.update_idletasks()
         
-        self.filename = path
-        self.image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
-        if self.image is None:
+        loaded = self.prefetcher.load_image(path)
+        if loaded is None:
             messagebox.showerror("エラー", "画像の読み込みに失敗しました")
             return
+        self.store_current_document()
+        self.filename = path
+        self.image, image_hash = loaded
+        self._image_hash = (self.image, image_hash)
         self.h, self.w = self.image.shape[:2]
-        
+        self.reset_editing_state()
+        self.add_document()
+        self.push_undo()
+        self.show_status(f"画像を読み込みました ({self.w}x{self.h}) - 手書きデータをクリアしました")
+        self.prefetcher.wait(path)  # 先読み中の輪郭抽出があれば終わるのを待って結果を使う
+        self.update_edges()
+        self.prefetch_adjacent()
+
+    def open_svg(self):
+        """SVGファイルのパスを編集可能な手動パスとして現在の画像に読み込む"""
+        if self.image is None:
+            messagebox.showinfo("情報", "先にパスを重ねる画像を開いてください")
+            return
+        path = filedialog.askopenfilename(filetypes=[("SVGファイル", "*.svg")])
+        if not path:
+            return
+        self.show_status("SVG読み込み中...")
+        self.master.update_idletasks()
+        try:
+            with self.profiler.span("import_svg") as operation:
+                document = read_svg(path)
+                operation["paths"] = self.import_svg_document(document)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("エラー", f"SVGの読み込みに失敗しました\n{e}")
+            return
+        self.draw_images()
+        self.show_status(f"SVGから{operation['paths']}個のパスを読み込みました: {os.path.basename(path)}")
+
+    def import_svg_document(self, document):
+        """read_svg の結果を手動パスとして加え、加えたパスの数を返す（SVGの大きさが画像と違えば合わせて拡大・縮小）"""
+        scale = (self.w / document.width if document.width else 1.0,
+                 self.h / document.height if document.height else 1.0)
+        paths = to_point_lists(document.paths, scale)
+        if paths:
+            self.push_undo()
+            self.manual_paths.extend(paths)
+            self.smoothed_paths.extend(paths)
+        return len(paths)
+
+    # ドキュメントごとに保持する編集状態（属性名）。画像は共有キャッシュから読み直す
+    DOCUMENT_STATE = ("filename", "h", "w", "contours", "smoothed_paths", "edge_points", "edge_distance_matrix",
+                      "manual_paths", "manual_edge_points", "undo_stack", "redo_stack", "journal",
+                      "edge_group_cache", "edge_calibration", "path_topology", "_topology_paths", "_topology_count", "path_pyramid",
+                      "path_index", "selected_path_ids", "selection_region",
+                      "zoom_factor", "min_zoom", "view_xlim", "view_ylim", "selected_edge")
+
+    def find_document(self, path):
+        """画像が開いているドキュメントの番号（開いていなければNone）"""
+        path = os.path.abspath(path)
+        for i, document in enumerate(self.documents):
+            if os.path.abspath(document["filename"]) == path:
+                return i
+        return None
+
+    def add_document(self):
+        """現在の画像を新しいドキュメントとして一覧に加え、編集中にする"""
+        self.documents.append({"filename": self.filename, "state": None})
+        self.current_document = len(self.documents) - 1
+        self.refresh_document_list()
+
+    def store_current_document(self):
+        """編集中のドキュメントの状態を保存する（切り替え前に呼ぶ）"""
+        if self.current_document is None or self.image is None:
+            return
+        self.cancel_pending_redraw()
+        self.drawing = False
+        self.trace_points = []
+        self.documents[self.current_document]["state"] = {name: getattr(self, name) for name in self.DOCUMENT_STATE}
+
+    def switch_document(self, index):
+        """開いているドキュメントに切り替える（輪郭抽出はやり直さない）"""
+        if index is None or index < 0 or index == self.current_document:
+            return
+        state = self.documents[index]["state"]
+        loaded = self.prefetcher.load_image(state["filename"])
+        if loaded is None:
+            messagebox.showerror("エラー", f"画像の読み込みに失敗しました\n{state['filename']}")
+            self.refresh_document_list()
+            return
+        self.store_current_document()
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.image, image_hash = loaded
+        self._image_hash = (self.image, image_hash)
+        self.documents[index]["state"] = None
+        self.current_document = index
+        self.refresh_document_list()
+        self.draw_images()
+        self.show_status(f"{os.path.basename(self.filename)} に切り替えました: {len(self.smoothed_paths)}個のパス")
+        self.prefetch_adjacent()
+
+    def refresh_document_list(self):
+        self.document_list["values"] = [f"{i + 1}: {os.path.basename(document['filename'])}"
+                                        for i, document in enumerate(self.documents)]
+        if self.current_document is not None:
+            self.document_list.current(self.current_document)
+
+    def show_adjacent_image(self, step):
+        """同じフォルダの前（step=-1）または次（step=1）の画像を開く"""
+        if self.image is None or not self.filename:
+            return
+        path = adjacent_image(self.filename, step)
+        if path is None:
+            self.show_status("フォルダ内の最初の画像です" if step < 0 else "フォルダ内の最後の画像です")
+            return
+        self.load_image(path)
+
+    def prefetch_adjacent(self):
+        """同じフォルダの次の画像を裏で読み込み、結果キャッシュがオンなら輪郭抽出もしておく"""
+        path = adjacent_image(self.filename, 1) if self.filename else None
+        if path is None or self.find_document(path) is not None:
+            return
+        params = None
+        if self.use_result_cache.get():
+            params = {name: getattr(self, name).get() for name in EXTRACT_PARAMS}
+        self.prefetcher.prefetch(path, params)
+
+    def reset_editing_state(self):
+        """手書きデータ・履歴・キャッシュ・表示範囲を初期状態に戻す"""
         # すべての手書きデータと編集状態をリセット
         self.manual_edge_points = []         # 手動エッジ点
         self.manual_paths = []               # 手動パス
@@ -301,80 +571,378 @@ class ContourEditorApp:
         # エッジ点とコントアも初期化
         self.edge_points = []
         self.contours = []
+        self.edge_group_cache = None
+        self.edge_calibration = None
+        self.path_topology = None
+        self.path_pyramid = PathPyramid()
+        self.path_index = PathIndex()
+        self.selected_path_ids = set()
+        self.selection_region = None
+        self.journal = EditJournal()
         
         # ビュー設定をリセット
         self.zoom_factor = 1.0
         self.min_zoom = 1.0
         self.view_xlim = (0, self.w)
         self.view_ylim = (self.h, 0)
-        self.push_undo()
-        self.show_status(f"画像を読み込みました ({self.w}x{self.h}) - 手書きデータをクリアしました")
-        self.update_edges()
 
-    def update_edges(self):
+    # プロジェクトに保存するパラメータ（属性名）
+    PROJECT_PARAMS = ("gaussian_size", "canny1", "canny2", "extraction_mode", "simplify_tolerance", "edge_method",
+                      "pen_size", "trajectory_threshold", "neighbor_distance_factor", "max_neighbors")
+
+    def save_project(self):
         if self.image is None:
+            messagebox.showinfo("情報", "画像が読み込まれていません")
             return
-        
-        self.show_status("処理開始: ガウシアンブラーを適用しています...")
-        self.master.update_idletasks()  # UIを更新してメッセージを表示
-        ksize = self.gaussian_size.get()
-        if ksize % 2 == 0: ksize += 1
-        blurred = cv2.GaussianBlur(cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY), (ksize, ksize), 0)
-        
-        self.show_status("処理中: Cannyエッジ検出を実行しています...")
-        self.master.update_idletasks()
-        edges = cv2.Canny(blurred, self.canny1.get(), self.canny2.get())
-        
-        self.show_status("処理中: 輪郭を検出しています...")
-        self.master.update_idletasks()
-        self.contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        
-        self.show_status("処理中: 有効な輪郭をフィルタリングしています...")
-        self.master.update_idletasks()
-        min_contour_points = 10
-        valid_contours = []
-        
-        for contour in self.contours:
-            if len(contour) >= min_contour_points:
-                valid_contours.append(contour)
-        
-        self.show_status("処理中: エッジ点を抽出しています...")
-        self.master.update_idletasks()
-        # Cannyエッジからエッジ点を抽出
-        canny_edge_points = []
-        for contour in valid_contours:
-            contour_points = contour[:, 0, :]
-            for point in contour_points:
-                canny_edge_points.append((float(point[0]), float(point[1])))
-        
-        # 元のCannyパスを保存（軌跡追跡との重複チェック用）
-        self.show_status("処理中: Cannyパスを生成しています...")
+        save_path = filedialog.asksaveasfilename(defaultextension=PROJECT_EXTENSION,
+                                                 filetypes=[("プロジェクトファイル", "*" + PROJECT_EXTENSION)])
+        if not save_path:
+            return
+        self.show_status("プロジェクトを保存中...")
         self.master.update_idletasks()
-        canny_paths = []
-        for contour in valid_contours:
-            contour_points = contour[:, 0, :]
-            if len(contour_points) >= 3:
-                path = [(float(point[0]), float(point[1])) for point in contour_points]
-                # 閉じたパスにする
-                if len(path) > 2:
-                    path.append(path[0])
-                canny_paths.append(path)
-        
-        # エッジ点を統合（Cannyエッジ + 手動追加エッジ）
-        self.edge_points = self.merge_edge_points(canny_edge_points, getattr(self, 'manual_edge_points', []))
-        
-        # スプライン補間でパスを生成
-        self.show_status("エッジとパスを生成しています - スプライン補間を実行中...")
+        self.export_project(save_path)
+        self.show_status(f"プロジェクトを保存しました: {save_path}")
+
+    def export_project(self, save_path):
+        """編集状態（エッジ点・パス・手動フラグ・パラメータ）をプロジェクトファイルに書き出す"""
+        with self.profiler.span("save_project") as operation:
+            edge_points = np.asarray(self.edge_points, dtype=np.float64).reshape(-1, 2)
+            edge_manual = np.zeros(len(self.edge_points), dtype=bool)
+            if self.manual_edge_points:
+                # 同じ座標の点が複数ある場合は手動点の個数分だけ印を付ける
+                remaining = Counter(self.manual_edge_points)
+                for i, point in enumerate(self.edge_points):
+                    if remaining[point] > 0:
+                        remaining[point] -= 1
+                        edge_manual[i] = True
+            
+            path_points, path_offsets = pack_paths(self.smoothed_paths)
+            manual_ids = {id(path) for path in self.manual_paths}
+            path_manual = np.array([id(path) in manual_ids for path in self.smoothed_paths], dtype=bool)
+            contour_points, contour_offsets = pack_paths([contour.reshape(-1, 2) for contour in self.contours],
+                                                         dtype=np.int32)
+            
+            image_path = os.path.abspath(self.filename)
+            meta = {
+                "image": {
+                    "path": image_path,
+                    "relative_path": os.path.relpath(image_path, os.path.dirname(os.path.abspath(save_path))),
+                    "sha1": file_sha1(image_path) if os.path.exists(image_path) else None,
+                    "width": self.w,
+                    "height": self.h,
+                },
+                "params": {name: getattr(self, name).get() for name in self.PROJECT_PARAMS},
+                "view": {"xlim": list(self.view_xlim or (0, self.w)), "ylim": list(self.view_ylim or (self.h, 0)),
+                         "zoom_factor": self.zoom_factor},
+                "journal": self.journal.to_dict(),
+            }
+            write_project(save_path, meta, {
+                "edge_points": edge_points,
+                "edge_manual": edge_manual,
+                "path_points": path_points,
+                "path_offsets": path_offsets,
+                "path_manual": path_manual,
+                "contour_points": contour_points,
+                "contour_offsets": contour_offsets,
+            })
+            operation["points"] = len(edge_points)
+            operation["paths"] = len(self.smoothed_paths)
+
+    def open_project(self):
+        path = filedialog.askopenfilename(filetypes=[("プロジェクトファイル", "*" + PROJECT_EXTENSION)])
+        if not path:
+            return
+        self.show_status("プロジェクト読み込み中...")
         self.master.update_idletasks()
-        self.smoothed_paths = self.generate_spline_paths(valid_contours)
-        
-        filtered_count = len(self.contours) - len(valid_contours)
-        if filtered_count > 0:
-            self.show_status(f"輪郭抽出完了: {len(self.smoothed_paths)}個のパスと{len(self.edge_points)}個のエッジ点を生成（{filtered_count}個の小さい輪郭を除外、スプライン補間済み）")
-        else:
-            self.show_status(f"輪郭抽出完了: {len(self.smoothed_paths)}個のパスと{len(self.edge_points)}個のエッジ点を生成（スプライン補間済み）")
-        
+        self.store_current_document()
+        if self.import_project(path):
+            self.add_document()
+            self.draw_images()
+            self.show_status(f"プロジェクトを読み込みました: {len(self.edge_points)}点 / {len(self.smoothed_paths)}パス")
+
+    def find_project_image(self, image_info, project_path):
+        """プロジェクトが参照する元画像のパスを探す（見つからなければ選択してもらう）"""
+        candidates = [os.path.join(os.path.dirname(os.path.abspath(project_path)), image_info["relative_path"]),
+                      image_info["path"]]
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                return candidate
+        messagebox.showwarning("確認", f"元画像が見つかりません\n{image_info['path']}\n画像を選択してください")
+        return filedialog.askopenfilename(filetypes=[("画像ファイル", "*.png;*.jpg;*.jpeg;*.bmp;*.tif;*.tiff")])
+
+    def import_project(self, project_path, confirm=True):
+        """プロジェクトファイルから編集状態を復元する（エッジ検出は再実行しない）"""
+        with self.profiler.span("load_project") as operation:
+            try:
+                meta, arrays = read_project(project_path)
+            except (OSError, ProjectFormatError) as e:
+                messagebox.showerror("エラー", f"プロジェクトの読み込みに失敗しました\n{e}")
+                return False
+            
+            image_info = meta["image"]
+            image_path = self.find_project_image(image_info, project_path)
+            if not image_path:
+                return False
+            if confirm and image_info.get("sha1") and file_sha1(image_path) != image_info["sha1"]:
+                if not messagebox.askyesno("確認", "元画像の内容が保存時と異なります。読み込みを続けますか？"):
+                    return False
+            image = read_image(image_path)
+            if image is None or image.shape[:2] != (image_info["height"], image_info["width"]):
+                messagebox.showerror("エラー", "元画像の読み込みに失敗したか、サイズが保存時と異なります")
+                return False
+            
+            self.filename = image_path
+            self.image = image
+            self.h, self.w = image.shape[:2]
+            self.reset_editing_state()
+            for name, value in meta.get("params", {}).items():
+                if name in self.PROJECT_PARAMS:
+                    getattr(self, name).set(value)
+            
+            edge_points = arrays["edge_points"]
+            self.edge_points = list(zip(edge_points[:, 0].tolist(), edge_points[:, 1].tolist()))
+            self.manual_edge_points = [self.edge_points[i] for i in np.flatnonzero(arrays["edge_manual"])]
+            self.smoothed_paths = unpack_point_lists(arrays["path_points"], arrays["path_offsets"])
+            self.manual_paths = [self.smoothed_paths[i] for i in np.flatnonzero(arrays["path_manual"])]
+            # 輪郭はメモリマップのビューのまま持つとファイルが開いたままになり、同じファイルへの
+            # 上書き保存（os.replace）がWindowsで失敗するため、メモリ上にコピーしてから分割する
+            contour_points = np.array(arrays["contour_points"])
+            self.contours = [contour.reshape(-1, 1, 2)
+                             for contour in unpack_paths(contour_points, arrays["contour_offsets"])]
+            
+            if "journal" in meta:
+                self.journal = EditJournal.from_dict(meta["journal"])
+            
+            view = meta.get("view", {})
+            if "xlim" in view:
+                self.view_xlim = tuple(view["xlim"])
+                self.view_ylim = tuple(view["ylim"])
+                self.zoom_factor = view.get("zoom_factor", 1.0)
+            self.push_undo()
+            operation["points"] = len(self.edge_points)
+            operation["paths"] = len(self.smoothed_paths)
+        return True
+
+    def save_journal(self):
+        if not self.journal.operations:
+            messagebox.showinfo("情報", "編集履歴がありません")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("編集履歴", "*.json")])
+        if not save_path:
+            return
+        self.journal.save(save_path)
+        self.show_status(f"編集履歴を保存しました（{len(self.journal)}件）: {save_path}")
+
+    def open_journal(self):
+        if self.image is None:
+            messagebox.showinfo("情報", "再生先の画像を先に開いてください")
+            return
+        path = filedialog.askopenfilename(filetypes=[("編集履歴", "*.json")])
+        if not path:
+            return
+        try:
+            journal = EditJournal.load(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("エラー", f"編集履歴の読み込みに失敗しました\n{e}")
+            return
+        overrides = None
+        if messagebox.askyesno("確認", "現在のパラメータで輪郭抽出して再生しますか？\n（いいえ: 記録時のパラメータを使用）"):
+            overrides = {name: getattr(self, name).get() for name in EXTRACT_PARAMS}
+        self.replay_journal(journal, overrides)
         self.draw_images()
+        self.show_status(f"編集履歴を再生しました（{len(journal)}件）: {len(self.smoothed_paths)}個のパス")
+
+    def replay_journal(self, journal, overrides=None):
+        """編集履歴を現在の画像に先頭から再生する（座標とツールサイズは画像サイズに合わせて変換）
+
+        overrides に指定したパラメータは記録時の値より優先して輪郭抽出に使う。
+        再生した操作はこの画像の編集履歴として記録し直される。
+        """
+        operations = list(journal.operations)
+        pen_size = self.pen_size.get()
+        self.reset_editing_state()
+        self.push_undo()
+        self.redraw_suspended = True
+        try:
+            with self.profiler.span("replay_journal", operations=len(operations)):
+                for operation in operations:
+                    op = operation["op"]
+                    if op == "extract":
+                        # エッジ検出の方式を記録していない編集履歴はCannyで抽出したもの
+                        params = {"edge_method": DEFAULT_EDGE_METHOD, **operation["params"], **(overrides or {})}
+                        for name in EXTRACT_PARAMS:
+                            if name in params:
+                                getattr(self, name).set(params[name])
+                        self.update_edges()
+                    elif op == "join_endpoints":
+                        self.pen_size.set(max(1, int(round(operation["distance"] * max(self.w, self.h)))))
+                        self.join_all_endpoints()
+                    elif op == "filter_paths":
+                        self.apply_path_filter(operation["action"], journal.filter_criteria(operation, self.w, self.h))
+                    elif op in ("remove_paths", "keep_paths"):
+                        points, _, _ = journal.denormalize(operation, self.w, self.h)
+                        self.select_paths_at(points, operation["distance"] * max(self.w, self.h))
+                        self.edit_selected_paths(keep=op == "keep_paths", record=False)
+                        self.journal.record_paths(op, points, operation["distance"] * max(self.w, self.h),
+                                                  self.w, self.h)
+                    else:
+                        trace_points, size, endpoint_distance = journal.denormalize(operation, self.w, self.h)
+                        if len(trace_points) < 2:
+                            continue
+                        self.apply_trace_edit(op, trace_points, tool_size=size,
+                                              endpoint_distance=endpoint_distance if endpoint_distance is not None else 50)
+        finally:
+            self.redraw_suspended = False
+            self.pen_size.set(pen_size)
+
+    def update_edges(self):
+        if self.image is None:
+            return
+        
+        params = {name: getattr(self, name).get() for name in EXTRACT_PARAMS}
+        self.journal.record_extract(params)
+        with self.profiler.span("update_edges") as operation:
+            # 同じ画像・同じパラメータの抽出結果がキャッシュにあれば再利用
+            cache_key = None
+            if self.use_result_cache.get():
+                cache_key = self.result_cache.make_key(self.get_image_hash(), params)
+                with self.profiler.span("cache_lookup") as stage:
+                    # メモリ上のキャッシュ（先読みの結果を含む）、ディスクキャッシュの順に探す
+                    cached = self.memory_cache.get(extraction_cache_key(self.get_image_hash(), params))
+                    stage["source"] = "memory"
+                    if cached is None:
+                        stored = self.result_cache.get(cache_key)
+                        cached = stored[1] if stored is not None else None
+                        stage["source"] = "disk"
+                        if cached is not None:
+                            self.memory_cache.put(extraction_cache_key(self.get_image_hash(), params), cached)
+                    stage["hit"] = cached is not None
+                if cached is not None:
+                    canny_edge_points, self.contours, extracted_paths = self.restore_cached_extraction(cached)
+                    self.edge_points = self.merge_edge_points(canny_edge_points, getattr(self, 'manual_edge_points', []))
+                    self.smoothed_paths = extracted_paths + [path for path in self.manual_paths
+                                                             if len(path) >= self.MIN_CONTOUR_POINTS]
+                    operation["paths"] = len(self.smoothed_paths)
+                    operation["points"] = sum(len(path) for path in self.smoothed_paths)
+                    self.show_status(f"輪郭抽出完了（キャッシュ使用）: {len(self.smoothed_paths)}個のパスと{len(self.edge_points)}個のエッジ点")
+                    self.draw_images()
+                    return
+            
+            method = params["edge_method"]
+            self.show_status(f"処理開始: エッジ検出（{EDGE_BACKENDS[method].label}）を実行しています...")
+            self.master.update_idletasks()  # UIを更新してメッセージを表示
+            # 方式ごとの段階（ブラー・Canny・2値化など）はそれぞれ計測のスパンとして記録される
+            calibration = {}
+            edges = detect_edge_image(self.image, method, params, self.profiler, calibration)
+            self.edge_calibration = (params, calibration)
+            
+            mode = self.extraction_mode.get()
+            if mode == "centerline":
+                # 1画素幅のエッジの両側を二重に追跡しないよう、細線化して一本線で追跡
+                self.show_status("処理中: エッジを細線化して中心線を追跡しています...")
+            else:
+                self.show_status("処理中: 輪郭を検出し、有効な輪郭をフィルタリングしています...")
+            self.master.update_idletasks()
+            with self.profiler.span("find_contours", mode=mode) as stage:
+                self.contours, valid_contours, closed_flags = extract_edge_contours(edges, mode, self.MIN_CONTOUR_POINTS)
+                stage["contours"] = len(valid_contours)
+                stage["points"] = sum(len(contour) for contour in valid_contours)
+            
+            self.show_status("処理中: エッジ点を抽出しています...")
+            self.master.update_idletasks()
+            with self.profiler.span("edge_points") as stage:
+                # Cannyエッジからエッジ点を抽出
+                canny_edge_points = []
+                for contour in valid_contours:
+                    contour_points = contour[:, 0, :]
+                    for point in contour_points:
+                        canny_edge_points.append((float(point[0]), float(point[1])))
+                
+                # 元のCannyパスを保存（軌跡追跡との重複チェック用）
+                self.show_status("処理中: Cannyパスを生成しています...")
+                self.master.update_idletasks()
+                canny_paths = []
+                for contour in valid_contours:
+                    contour_points = contour[:, 0, :]
+                    if len(contour_points) >= 3:
+                        path = [(float(point[0]), float(point[1])) for point in contour_points]
+                        # 閉じたパスにする
+                        if len(path) > 2:
+                            path.append(path[0])
+                        canny_paths.append(path)
+                
+                # エッジ点を統合（Cannyエッジ + 手動追加エッジ）
+                self.edge_points = self.merge_edge_points(canny_edge_points, getattr(self, 'manual_edge_points', []))
+                stage["points"] = len(self.edge_points)
+            
+            # スプライン補間の前に全輪郭をまとめて簡略化
+            tolerance = self.get_simplify_tolerance()
+            if tolerance > 0 and valid_contours:
+                self.show_status("処理中: 輪郭を簡略化しています...")
+                self.master.update_idletasks()
+                with self.profiler.span("simplify", tolerance=tolerance) as stage:
+                    simplified = simplify_paths([contour[:, 0, :] for contour in valid_contours], tolerance)
+                    valid_contours = [points.reshape(-1, 1, 2).astype(np.int32) for points in simplified]
+                    stage["points"] = sum(len(contour) for contour in valid_contours)
+            
+            # スプライン補間でパスを生成
+            self.show_status("エッジとパスを生成しています - スプライン補間を実行中...")
+            self.master.update_idletasks()
+            with self.profiler.span("generate_spline_paths") as stage:
+                extracted_paths = self.generate_spline_paths(valid_contours, closed_flags, include_manual=False)
+                stage["paths"] = len(extracted_paths)
+                stage["points"] = sum(len(path) for path in extracted_paths)
+            if cache_key is not None:
+                with self.profiler.span("cache_store"):
+                    self.store_cached_extraction(cache_key, params, canny_edge_points, extracted_paths)
+            
+            # 手動パスも追加（長さフィルタリング適用）
+            self.smoothed_paths = extracted_paths + [path for path in self.manual_paths
+                                                     if len(path) >= self.MIN_CONTOUR_POINTS]
+            operation["paths"] = len(self.smoothed_paths)
+            operation["points"] = sum(len(path) for path in self.smoothed_paths)
+            
+            filtered_count = len(self.contours) - len(valid_contours)
+            if filtered_count > 0:
+                self.show_status(f"輪郭抽出完了: {len(self.smoothed_paths)}個のパスと{len(self.edge_points)}個のエッジ点を生成（{filtered_count}個の小さい輪郭を除外、スプライン補間済み）")
+            else:
+                self.show_status(f"輪郭抽出完了: {len(self.smoothed_paths)}個のパスと{len(self.edge_points)}個のエッジ点を生成（スプライン補間済み）")
+            
+            self.draw_images()
+
+    def get_image_hash(self):
+        """現在の画像の画素内容のハッシュ（画像が変わるまで再計算しない）"""
+        if self._image_hash is None or self._image_hash[0] is not self.image:
+            self._image_hash = (self.image, image_content_hash(self.image))
+        return self._image_hash[1]
+
+    def store_cached_extraction(self, cache_key, params, canny_edge_points, extracted_paths):
+        """抽出結果（手動編集を含まない）をメモリとディスクのキャッシュに保存"""
+        arrays = self.pack_extraction(canny_edge_points, extracted_paths)
+        self.memory_cache.put(extraction_cache_key(self.get_image_hash(), params), arrays)
+        self.result_cache.put(cache_key, {"params": params, "width": self.w, "height": self.h}, arrays)
+
+    def pack_extraction(self, canny_edge_points, extracted_paths):
+        """抽出結果（現在の輪郭・エッジ点・パス）をキャッシュ用の配列にまとめる"""
+        contour_points, contour_offsets = pack_paths([contour.reshape(-1, 2) for contour in self.contours],
+                                                     dtype=np.int32)
+        path_points, path_offsets = pack_paths(extracted_paths)
+        return {
+            "edge_points": np.asarray(canny_edge_points, dtype=np.int32).reshape(-1, 2),
+            "contour_points": contour_points,
+            "contour_offsets": contour_offsets,
+            "path_points": path_points,
+            "path_offsets": path_offsets,
+        }
+
+    def restore_cached_extraction(self, arrays):
+        """キャッシュの配列を (エッジ点, 輪郭, パス) に戻す"""
+        edge_points = arrays["edge_points"].astype(np.float64)
+        canny_edge_points = list(zip(edge_points[:, 0].tolist(), edge_points[:, 1].tolist()))
+        contours = [contour.reshape(-1, 1, 2)
+                    for contour in unpack_paths(arrays["contour_points"], arrays["contour_offsets"])]
+        extracted_paths = unpack_point_lists(arrays["path_points"], arrays["path_offsets"])
+        return canny_edge_points, contours, extracted_paths
 
     def is_path_closed(self, path):
         """パスが閉じているかどうかを判定（パストレースによる方法）"""
@@ -516,14 +1084,14 @@ class ContourEditorApp:
         
         return False
     
-    def generate_spline_paths(self, contours):
-        """スプライン補間を使用してCannyパスを滑らかにする"""
+    def generate_spline_paths(self, contours, closed_flags=None, include_manual=True):
+        """スプライン補間を使用してCannyパスを滑らかにする（closed_flagsがFalseの輪郭は開いたパスとして処理）"""
+        from scipy.interpolate import splev, splprep  # 起動を速くするため初回使用時に読み込む
         smoothed_paths = []
-        min_contour_points = 10  # 最小輪郭点数を再定義
         
         for i, contour in enumerate(contours):
-            # 長さフィルタリングを再チェック
-            if len(contour) < min_contour_points:
+            # 長さフィルタリングを再チェック（closed_flags指定時は抽出時にフィルタ済み）
+            if closed_flags is None and len(contour) < self.MIN_CONTOUR_POINTS:
                 continue
                 
             # 進行状況を表示
@@ -533,6 +1101,13 @@ class ContourEditorApp:
                 self.master.update_idletasks()
             
             contour_points = contour[:, 0, :]
+            
+            if closed_flags is not None and not closed_flags[i]:
+                # 中心線などの開いたパスは開いた曲線として補間
+                open_path = [(float(point[0]), float(point[1])) for point in contour_points]
+                smoothed_paths.append(self.apply_spline_to_path(open_path))
+                continue
+            
             x = contour_points[:, 0].astype(float)
             y = contour_points[:, 1].astype(float)
             
@@ -561,24 +1136,86 @@ class ContourEditorApp:
                 continue
         
         # 手動パスも追加（長さフィルタリング適用）
-        min_contour_points = 10
-        for manual_path in self.manual_paths:
-            if len(manual_path) >= min_contour_points:
-                smoothed_paths.append(manual_path)
+        if include_manual:
+            for manual_path in self.manual_paths:
+                if len(manual_path) >= self.MIN_CONTOUR_POINTS:
+                    smoothed_paths.append(manual_path)
         
         self.show_status(f"スプライン補間完了: {len(smoothed_paths)}個のパスを生成")
         return smoothed_paths
 
+    def get_simplify_tolerance(self):
+        """簡略化許容値を取得（不正な値は0として扱う）"""
+        try:
+            return max(0.0, float(self.simplify_tolerance.get()))
+        except (tk.TclError, ValueError):
+            return 0.0
+
+    def on_first_map(self, event=None):
+        """ウィンドウが表示されたら描画領域を作成する"""
+        if event is not None and event.widget is not self.master:
+            return
+        self.master.unbind("<Map>", self._map_binding)
+        self.master.after_idle(self.on_window_ready)
+
+    def on_window_ready(self):
+        self.create_canvases()
+        if self.image is not None:
+            self.draw_images()
+
+    def create_canvases(self):
+        """3つの表示パネルのmatplotlib描画領域を作成（作成済みなら何もしない）"""
+        if self.canvas_left is not None:
+            return
+        with self.profiler.span("create_canvases"):
+            if self.renderer == "opencv":
+                for name, frame in self.panel_frames.items():
+                    panel = RasterPanel(frame, self.on_trace_press, self.on_trace_motion, self.on_trace_release,
+                                        self.on_scroll, on_resize=self.schedule_redraw)
+                    panel.widget.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+                    setattr(self, f"canvas_{name}", panel)
+                return
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from matplotlib.figure import Figure
+            for name, frame in self.panel_frames.items():
+                fig = Figure(figsize=(6, 6))
+                ax = fig.add_subplot()
+                canvas = FigureCanvasTkAgg(fig, master=frame)
+                canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+                canvas.mpl_connect("button_press_event", self.on_trace_press)
+                canvas.mpl_connect("motion_notify_event", self.on_trace_motion)
+                canvas.mpl_connect("button_release_event", self.on_trace_release)
+                canvas.mpl_connect("scroll_event", self.on_scroll)
+                setattr(self, f"fig_{name}", fig)
+                setattr(self, f"ax_{name}", ax)
+                setattr(self, f"canvas_{name}", canvas)
+
     def draw_images(self):
+        if self.redraw_suspended:
+            return
+        if self.canvas_left is None:
+            self.create_canvases()
+        if self.renderer == "opencv":
+            draw_left, draw_center, draw_right = self.draw_left_raster, self.draw_center_raster, self.draw_right_raster
+        else:
+            draw_left, draw_center, draw_right = self.draw_left_panel, self.draw_center_panel, self.draw_right_panel
+        with self.profiler.span("draw_images", renderer=self.renderer) as operation:
+            with self.profiler.span("draw_left"):
+                draw_left()
+            with self.profiler.span("draw_center") as stage:
+                draw_center()
+                stage["points"] = len(self.edge_points)
+            with self.profiler.span("draw_right") as stage:
+                stage.update(draw_right())
+            operation["paths"] = len(self.smoothed_paths)
+
+    def draw_left_panel(self):
+        """元画像パネルを描画"""
         self.ax_left.clear()
         if self.image is not None:
             img_rgb = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
             self.ax_left.imshow(img_rgb)
-            if len(self.trace_points) > 1:
-                x, y = zip(*self.trace_points)
-                pen_size = int(self.pen_size.get())
-                pen_width = pen_size * self.zoom_factor
-                self.ax_left.plot(x, y, color=(0, 0.3, 1, 0.5), linewidth=pen_width, solid_capstyle='round')
+            self.draw_trace(self.ax_left)
             self.ax_left.axis('off')
             if self.view_xlim and self.view_ylim:
                 self.ax_left.set_xlim(self.view_xlim)
@@ -588,6 +1225,8 @@ class ContourEditorApp:
                 self.ax_left.set_ylim(self.h, 0)
         self.canvas_left.draw()
 
+    def draw_center_panel(self):
+        """エッジ点パネルを描画"""
         self.ax_center.clear()
         self.ax_center.set_facecolor('white')
         if hasattr(self, 'edge_points') and self.edge_points:
@@ -603,11 +1242,7 @@ class ContourEditorApp:
                 self.ax_center.scatter([self.selected_edge[0]], [self.selected_edge[1]], 
                                      c='red', s=selected_size, alpha=1.0, marker='o', edgecolors='darkred', linewidth=max(1, 2/self.zoom_factor))
         
-        if len(self.trace_points) > 1:
-            x, y = zip(*self.trace_points)
-            pen_size = int(self.pen_size.get())
-            pen_width = pen_size * self.zoom_factor
-            self.ax_center.plot(x, y, color=(0, 0.3, 1, 0.5), linewidth=pen_width, solid_capstyle='round')
+        self.draw_trace(self.ax_center)
         self.ax_center.axis('equal')
         self.ax_center.axis('off')
         if self.view_xlim and self.view_ylim:
@@ -618,38 +1253,61 @@ class ContourEditorApp:
             self.ax_center.set_ylim(self.h, 0)
         self.canvas_center.draw()
 
+    def display_pixel_size(self, ax):
+        """表示中の範囲で画面の1画素が画像の何画素に当たるか（ズーム倍率が大きいほど小さい）"""
+        xlim = self.view_xlim or (0, self.w)
+        ylim = self.view_ylim or (self.h, 0)
+        width, height = ax.bbox.width, ax.bbox.height
+        if width <= 0 or height <= 0:
+            return 0.0
+        # axis('equal')では縦横のうち範囲が画面に対して大きい方に合わせて表示される
+        return max(abs(xlim[1] - xlim[0]) / width, abs(ylim[1] - ylim[0]) / height)
+
+    def visible_bounds(self, ax):
+        """表示される範囲 (x0, y0, x1, y1)（axis('equal')で広がる分を含め、余白として画面の1割を足す）"""
+        xlim = self.view_xlim or (0, self.w)
+        ylim = self.view_ylim or (self.h, 0)
+        pixel = self.display_pixel_size(ax)
+        cx, cy = (xlim[0] + xlim[1]) / 2, (ylim[0] + ylim[1]) / 2
+        half_w = ax.bbox.width * pixel * 0.55
+        half_h = ax.bbox.height * pixel * 0.55
+        return (cx - half_w, cy - half_h, cx + half_w, cy + half_h)
+
+    def draw_right_panel(self):
+        """パス表示パネルを描画し、描画したパス数・点数・段階を返す
+        
+        パスは解像度別の簡略化版のうち、現在のズームで画面の1画素以内の誤差に収まる段階で描画し、
+        拡大中は表示範囲にかからないパスを描画しない。
+        """
         self.ax_right.clear()
         self.ax_right.set_facecolor('white')
         
-        closed_paths = []
-        open_paths = []
-        
-        for path in self.smoothed_paths:
-            if self.is_path_closed(path):
-                closed_paths.append(path)
-            else:
-                open_paths.append(path)
+        # 新しいパス・編集されたパスだけ段階を作り、閉じているかの判定も一緒に保持する
+        self.path_pyramid.update(self.smoothed_paths, self.is_path_closed)
+        level = self.path_pyramid.level_for(self.display_pixel_size(self.ax_right))
+        drawn = self.path_pyramid.paths_at(self.smoothed_paths, level, self.visible_bounds(self.ax_right))
         
+        closed_paths = [path for path, closed in drawn if closed]
         if closed_paths:
             self.fill_paths_with_holes(closed_paths)
         
-        for path in self.smoothed_paths:
+        for path, _ in drawn:
             if len(path) > 1:
                 x, y = zip(*path)
                 # ズーム倍率に応じて線の太さを調整
                 line_width = max(0.5, 1.5 / self.zoom_factor)
                 self.ax_right.plot(x, y, color='black', linewidth=line_width, zorder=2)
         
+        for path in self.selected_path_list():
+            x, y = zip(*path)
+            self.ax_right.plot(x, y, color='red', linewidth=max(1.0, 2.5 / self.zoom_factor), zorder=3)
+        
         if self.selected_edge is not None:
             selected_size = max(5, 15 / self.zoom_factor)
             self.ax_right.scatter([self.selected_edge[0]], [self.selected_edge[1]], 
                                 c='red', s=selected_size, alpha=1.0, marker='o', edgecolors='darkred', linewidth=max(1, 2/self.zoom_factor))
         
-        if len(self.trace_points) > 1:
-            x, y = zip(*self.trace_points)
-            pen_size = int(self.pen_size.get())
-            pen_width = pen_size * self.zoom_factor
-            self.ax_right.plot(x, y, color=(0, 0.3, 1, 0.5), linewidth=pen_width, solid_capstyle='round')
+        self.draw_trace(self.ax_right)
         self.ax_right.axis('equal')
         self.ax_right.axis('off')
         if self.view_xlim and self.view_ylim:
@@ -659,6 +1317,102 @@ class ContourEditorApp:
             self.ax_right.set_xlim(0, self.w)
             self.ax_right.set_ylim(self.h, 0)
         self.canvas_right.draw()
+        return {"paths": len(drawn), "points": sum(len(path) for path, _ in drawn), "level": level}
+
+    def selected_path_list(self):
+        """選択中のパス（2点以上のもの、元の解像度）"""
+        if not self.selected_path_ids:
+            return []
+        return [path for path in self.smoothed_paths if id(path) in self.selected_path_ids and len(path) > 1]
+
+    def panel_viewport(self, panel):
+        """OpenCV描画のパネルの大きさと表示範囲から、画像座標と画面座標の対応を作る"""
+        return Viewport(self.view_xlim or (0, self.w), self.view_ylim or (self.h, 0), panel.width, panel.height)
+
+    def draw_left_raster(self):
+        """元画像パネルをOpenCVで描画"""
+        view = self.panel_viewport(self.canvas_left)
+        buffer = blank(view)
+        if self.image is not None:
+            # 表示範囲が変わらない間（軌跡の描画中など）は縮小・拡大した画像を使い回す
+            key = (id(self.image), view.width, view.height, view.scale, view.center)
+            if self._raster_image_key != key:
+                self._raster_image = draw_image(blank(view), view, self.image)
+                self._raster_image_key = key
+            buffer = self._raster_image.copy()
+            self.draw_trace_raster(buffer, view)
+        self.canvas_left.show(buffer, view)
+
+    def draw_center_raster(self):
+        """エッジ点パネルをOpenCVで描画（点は画面上で2画素四方）"""
+        view = self.panel_viewport(self.canvas_center)
+        buffer = blank(view)
+        if self.edge_points:
+            draw_points(buffer, view, self.edge_points, (51, 51, 51), size=2)
+        if self.selected_edge is not None:
+            draw_marker(buffer, view, self.selected_edge, (255, 0, 0), (139, 0, 0))
+        self.draw_trace_raster(buffer, view)
+        self.canvas_center.show(buffer, view)
+
+    def draw_right_raster(self):
+        """パス表示パネルをOpenCVで描画し、描画したパス数・点数・段階を返す
+        
+        閉じたパスはまとめて偶奇規則で塗るため、matplotlib版のような包含関係の判定は行わない。
+        """
+        view = self.panel_viewport(self.canvas_right)
+        buffer = blank(view)
+        self.path_pyramid.update(self.smoothed_paths, self.is_path_closed)
+        level = self.path_pyramid.level_for(1.0 / view.scale)
+        drawn = self.path_pyramid.paths_at(self.smoothed_paths, level, view.visible_bounds())
+        
+        # matplotlib版と同じく面積が50以下の閉じたパスは塗らない
+        closed_paths = [path for path, closed in drawn if closed and len(path) >= 3
+                        and abs(cv2.contourArea(np.asarray(path, dtype=np.float32))) > 50]
+        fill_evenodd(buffer, view, closed_paths, (0, 0, 0), alpha=0.5)
+        draw_polylines(buffer, view, [path for path, _ in drawn if len(path) > 1], (0, 0, 0))
+        draw_polylines(buffer, view, self.selected_path_list(), (255, 0, 0), thickness=2)
+        if self.selected_edge is not None:
+            draw_marker(buffer, view, self.selected_edge, (255, 0, 0), (139, 0, 0))
+        self.draw_trace_raster(buffer, view)
+        self.canvas_right.show(buffer, view)
+        return {"paths": len(drawn), "points": sum(len(path) for path, _ in drawn), "level": level}
+
+    def draw_trace_raster(self, buffer, view):
+        """描画中の軌跡をOpenCVで描画（軌跡の太さはツールサイズを画面上の大きさにしたもの）"""
+        if len(self.trace_points) < 2:
+            return
+        if self.is_rect_trace():
+            draw_rectangle(buffer, view, self.trace_points[0], self.trace_points[-1], (255, 128, 0))
+            return
+        if self.tool_mode.get() == "select":
+            draw_polylines(buffer, view, [self.trace_points + self.trace_points[:1]], (255, 128, 0))
+            return
+        blend_polyline(buffer, view, self.trace_points, (0, 77, 255), int(self.pen_size.get()) * view.scale, 0.5)
+
+    def is_rect_trace(self):
+        """描画中の軌跡を矩形として表示するか（領域再抽出と矩形選択）"""
+        mode = self.tool_mode.get()
+        return mode == "region" or (mode == "select" and self.selection_shape.get() == "rect")
+
+    def draw_trace(self, ax):
+        """描画中の軌跡を表示（領域再抽出モードでは選択矩形を表示）"""
+        if len(self.trace_points) < 2:
+            return
+        
+        if self.is_rect_trace():
+            (x0, y0), (x1, y1) = self.trace_points[0], self.trace_points[-1]
+            ax.plot([x0, x1, x1, x0, x0], [y0, y0, y1, y1, y0], color=(1, 0.5, 0, 0.9),
+                    linewidth=1.5, linestyle='--')
+            return
+        if self.tool_mode.get() == "select":
+            x, y = zip(*(self.trace_points + self.trace_points[:1]))
+            ax.plot(x, y, color=(1, 0.5, 0, 0.9), linewidth=1.5, linestyle='--')
+            return
+        
+        x, y = zip(*self.trace_points)
+        pen_size = int(self.pen_size.get())
+        pen_width = pen_size * self.zoom_factor
+        ax.plot(x, y, color=(0, 0.3, 1, 0.5), linewidth=pen_width, solid_capstyle='round')
 
     def auto_close_paths(self):
         """エッジ点から滑らかに接続されたパスを生成"""
@@ -975,102 +1729,191 @@ class ContourEditorApp:
         return added_count
 
     def simplify_trace_path(self, trace_points, tolerance=5.0):
-        """軌跡を適度に間引いて滑らかなパスにする（Douglas-Peucker風のアルゴリズム）"""
+        """軌跡をDouglas-Peucker法で間引いて滑らかなパスにする"""
         if len(trace_points) <= 2:
             return trace_points
         
-        def distance_point_to_line(point, line_start, line_end):
-            """点から直線までの距離を計算"""
-            x0, y0 = point
-            x1, y1 = line_start
-            x2, y2 = line_end
-            
-            # 直線の長さ
-            line_length = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
-            if line_length == 0:
-                return ((x0 - x1) ** 2 + (y0 - y1) ** 2) ** 0.5
-            
-            # 点から直線への垂直距離
-            return abs((y2 - y1) * x0 - (x2 - x1) * y0 + x2 * y1 - y2 * x1) / line_length
-        
-        def simplify_recursive(points, start_idx, end_idx, tolerance):
-            """再帰的に点を間引く"""
-            if end_idx - start_idx <= 1:
-                return [start_idx, end_idx]
-            
-            max_distance = 0
-            max_idx = start_idx
-            
-            # 最も直線から離れた点を見つける
-            for i in range(start_idx + 1, end_idx):
-                distance = distance_point_to_line(points[i], points[start_idx], points[end_idx])
-                if distance > max_distance:
-                    max_distance = distance
-                    max_idx = i
-            
-            # 閾値を超える場合は分割して処理
-            if max_distance > tolerance:
-                left_result = simplify_recursive(points, start_idx, max_idx, tolerance)
-                right_result = simplify_recursive(points, max_idx, end_idx, tolerance)
-                return left_result[:-1] + right_result
-            else:
-                return [start_idx, end_idx]
-        
-        # 簡略化を実行
-        keep_indices = simplify_recursive(trace_points, 0, len(trace_points) - 1, tolerance)
-        simplified = [trace_points[i] for i in keep_indices]
-        
-        # 最低でも元の点数の1/3は残す
-        min_points = max(3, len(trace_points) // 3)
-        if len(simplified) < min_points:
-            # より多くの点を保持するために段階的に点を追加
-            step = len(trace_points) // min_points
-            simplified = [trace_points[i] for i in range(0, len(trace_points), step)]
-            if simplified[-1] != trace_points[-1]:
-                simplified.append(trace_points[-1])
-        
-        return simplified
+        simplified = simplify_polyline(trace_points, tolerance)
+        return [(float(x), float(y)) for x, y in simplified]
+
+    def get_path_topology(self):
+        """パス端点の索引を取得（smoothed_pathsが索引の外で変更されていれば再構築）"""
+        if (self.path_topology is None or self._topology_paths is not self.smoothed_paths
+                or self._topology_count != len(self.smoothed_paths)):
+            self.path_topology = PathTopology.from_paths(self.smoothed_paths, self.manual_paths)
+            self._topology_paths = self.smoothed_paths
+            self._topology_count = len(self.smoothed_paths)
+        return self.path_topology
+
+    def sync_paths_from_topology(self):
+        """索引で編集したパスをsmoothed_paths・manual_pathsに反映"""
+        self.smoothed_paths = self.path_topology.path_list()
+        self.manual_paths = self.path_topology.manual_path_list()
+        self._topology_paths = self.smoothed_paths
+        self._topology_count = len(self.smoothed_paths)
 
     def find_nearest_path_endpoint(self, target_point, max_distance=50):
-        """指定した点から最も近いパスの端点を見つける"""
+        """指定した点から最も近いパスの端点を見つける（パスID, 端点, 始点かどうか）"""
         if not self.smoothed_paths:
             return None, None, None
         
-        min_distance = float('inf')
-        nearest_path = None
-        nearest_endpoint = None
-        is_start_point = False
+        return self.get_path_topology().nearest_endpoint(target_point, max_distance)
+
+    def join_all_endpoints(self):
+        """ツールサイズ以内にある開いたパスの端点どうしを一括で接続"""
+        if not self.smoothed_paths:
+            return
         
-        for path_idx, path in enumerate(self.smoothed_paths):
-            if len(path) < 2:
-                continue
-            
-            # パスの開始点をチェック
-            start_point = path[0]
-            distance = ((target_point[0] - start_point[0]) ** 2 + 
-                       (target_point[1] - start_point[1]) ** 2) ** 0.5
-            
-            if distance < min_distance and distance <= max_distance:
-                min_distance = distance
-                nearest_path = path_idx
-                nearest_endpoint = start_point
-                is_start_point = True
-            
-            # パスの終了点をチェック
-            end_point = path[-1]
-            distance = ((target_point[0] - end_point[0]) ** 2 + 
-                       (target_point[1] - end_point[1]) ** 2) ** 0.5
-            
-            if distance < min_distance and distance <= max_distance:
-                min_distance = distance
-                nearest_path = path_idx
-                nearest_endpoint = end_point
-                is_start_point = False
+        distance = max(1, int(self.pen_size.get()))
+        before_count = len(self.smoothed_paths)
+        new_ids = self.get_path_topology().join_within(distance)
         
-        if nearest_path is not None:
-            return nearest_path, nearest_endpoint, is_start_point
+        if new_ids:
+            # 索引の更新前のパスリストをアンドゥ履歴に保存してから反映
+            self.push_undo()
+            self.sync_paths_from_topology()
+            self.journal.record_join(distance, self.w, self.h)
+            self.show_status(f"端点接続: {distance}px以内の端点を接続し、{before_count}個のパスを{len(self.smoothed_paths)}個にしました")
         else:
-            return None, None, None
+            self.show_status(f"端点接続: {distance}px以内に接続できる端点が見つかりませんでした")
+        self.draw_images()
+
+    def get_path_index(self):
+        """パスの空間索引と指標を現在のパスに合わせて返す（閉じているかの判定は表示用の段階と共有）"""
+        self.path_pyramid.update(self.smoothed_paths, self.is_path_closed)
+        self.path_index.update(self.smoothed_paths, self.path_pyramid.closed)
+        return self.path_index
+
+    def select_paths(self, trace_points):
+        """選択モードの操作: クリックは最も近いパス、ドラッグは投げ縄・矩形の内側に全点があるパスを選択"""
+        index = self.get_path_index()
+        pick_distance = max(3, int(self.pen_size.get()))
+        xs, ys = zip(*trace_points)
+        if max(max(xs) - min(xs), max(ys) - min(ys)) < pick_distance:
+            nearest = index.nearest(trace_points[-1], pick_distance)
+            self.selection_region = None
+            self.selected_path_ids = set() if nearest is None else {id(index.paths[nearest])}
+        else:
+            if self.selection_shape.get() == "rect":
+                (x0, y0), (x1, y1) = trace_points[0], trace_points[-1]
+                region = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+            else:
+                region = list(trace_points)
+            self.selection_region = region
+            self.selected_path_ids = {id(index.paths[i]) for i in np.flatnonzero(index.inside(region))}
+        self.show_status(f"選択: {len(self.selected_path_ids)}個のパスを選択しました")
+
+    def selected_mask(self):
+        """get_path_index の並びで選択中のパスを示す真偽値の配列"""
+        return np.array([id(path) in self.selected_path_ids for path in self.path_index.paths], dtype=bool)
+
+    def remove_paths(self, remove):
+        """remove（get_path_index の並びの真偽値の配列）のパスを1回のアンドゥでまとめて削除し、削除した本数を返す"""
+        count = int(np.count_nonzero(remove))
+        if count == 0:
+            return 0
+        self.push_undo()
+        removed_ids = {id(path) for path, flag in zip(self.path_index.paths, remove) if flag}
+        self.smoothed_paths = [path for path in self.smoothed_paths if id(path) not in removed_ids]
+        self.manual_paths = [path for path in self.manual_paths if id(path) not in removed_ids]
+        self.selected_path_ids -= removed_ids
+        return count
+
+    def edit_selected_paths(self, keep=False, record=True):
+        """選択中のパスを削除する（keep=True なら選択中のパスだけを残す）"""
+        index = self.get_path_index()
+        selected = self.selected_mask()
+        if not selected.any():
+            self.show_status("選択: 選択中のパスがありません")
+            return
+        # 再生時に同じパスを探せるよう各パスの中ほどの点を記録する
+        points = [index.paths[i][len(index.paths[i]) // 2] for i in np.flatnonzero(selected)]
+        removed = self.remove_paths(~selected if keep else selected)
+        if removed and record:
+            self.journal.record_paths("keep_paths" if keep else "remove_paths", points,
+                                      max(3, int(self.pen_size.get())), self.w, self.h)
+        self.show_status(f"選択: {removed}個のパスを削除しました（残り{len(self.smoothed_paths)}個）")
+        self.draw_images()
+
+    def select_paths_at(self, points, distance):
+        """各点から distance 以内で最も近いパスを選択する（編集履歴の再生用）"""
+        index = self.get_path_index()
+        nearest = (index.nearest(point, distance) for point in points)
+        self.selected_path_ids = {id(index.paths[i]) for i in nearest if i is not None}
+
+    def apply_path_filter(self, action, criteria):
+        """一括フィルタ: 条件に合うパスを選択（select）・削除（delete）・それだけ残す（keep）し、対象の本数を返す
+
+        criteria は PathIndex.filter の引数。条件の評価は全パスの指標に対する1回の比較で行う。
+        """
+        index = self.get_path_index()
+        with self.profiler.span("filter_paths", action=action, paths=len(index)) as operation:
+            matched = index.filter(**criteria)
+            operation["matched"] = int(np.count_nonzero(matched))
+            if action == "select":
+                self.selected_path_ids = {id(index.paths[i]) for i in np.flatnonzero(matched)}
+                self.show_status(f"一括フィルタ: {operation['matched']}個のパスを選択しました")
+                return operation["matched"]
+            removed = self.remove_paths(~matched if action == "keep" else matched)
+            if removed:
+                self.journal.record_filter(action, criteria, self.w, self.h)
+            self.show_status(f"一括フィルタ: {removed}個のパスを削除しました（残り{len(self.smoothed_paths)}個）")
+            return removed
+
+    def open_filter_dialog(self):
+        """点数・長さ・面積・閉じているか・選択範囲の内外でパスを一括で選択・削除するダイアログ"""
+        if self.filter_dialog is not None and self.filter_dialog.winfo_exists():
+            self.filter_dialog.lift()
+            return
+        dialog = tk.Toplevel(self.master)
+        dialog.title("一括フィルタ")
+        dialog.transient(self.master)
+        self.filter_dialog = dialog
+        bounds = {}
+        for row, (name, label) in enumerate((("points", "点数"), ("length", "長さ(px)"), ("area", "面積(px²)"))):
+            ttk.Label(dialog, text=label).grid(row=row, column=0, padx=5, pady=3, sticky="w")
+            for column, side in ((1, "min"), (3, "max")):
+                bounds[f"{side}_{name}"] = tk.StringVar()
+                ttk.Entry(dialog, textvariable=bounds[f"{side}_{name}"], width=10).grid(row=row, column=column, padx=2)
+            ttk.Label(dialog, text="〜").grid(row=row, column=2)
+        closed = tk.StringVar(value="all")
+        region = tk.StringVar(value="all")
+        ttk.Label(dialog, text="種類").grid(row=3, column=0, padx=5, pady=3, sticky="w")
+        ttk.Combobox(dialog, textvariable=closed, state="readonly", width=12,
+                     values=("all", "closed", "open")).grid(row=3, column=1, columnspan=3, sticky="w")
+        ttk.Label(dialog, text="範囲").grid(row=4, column=0, padx=5, pady=3, sticky="w")
+        ttk.Combobox(dialog, textvariable=region, state="readonly", width=12,
+                     values=("all", "inside", "outside")).grid(row=4, column=1, columnspan=3, sticky="w")
+        ttk.Label(dialog, text="種類: all/closed(閉じたパス)/open(開いたパス)  範囲: 最後に投げ縄・矩形で選んだ範囲の内側/外側",
+                  font=("Meiryo", 9), foreground="gray").grid(row=5, column=0, columnspan=4, padx=5, sticky="w")
+
+        def run(action):
+            criteria = {}
+            try:
+                for name, var in bounds.items():
+                    if var.get().strip():
+                        criteria[name] = float(var.get())
+            except ValueError:
+                messagebox.showerror("エラー", "数値を入力してください", parent=dialog)
+                return
+            if closed.get() != "all":
+                criteria["closed"] = closed.get() == "closed"
+            if region.get() != "all":
+                if self.selection_region is None:
+                    messagebox.showinfo("情報", "選択モードで投げ縄・矩形の範囲を選んでください", parent=dialog)
+                    return
+                criteria["region"] = self.selection_region
+                criteria["inside"] = region.get() == "inside"
+            if not self.smoothed_paths:
+                return
+            self.apply_path_filter(action, criteria)
+            self.draw_images()
+
+        button_frame = ttk.Frame(dialog)
+        button_frame.grid(row=6, column=0, columnspan=4, pady=8)
+        for text, action in (("選択", "select"), ("削除", "delete"), ("これだけ残す", "keep")):
+            ttk.Button(button_frame, text=text, command=lambda action=action: run(action)).pack(side=tk.LEFT, padx=3)
+        ttk.Button(button_frame, text="選択中を削除", command=self.edit_selected_paths).pack(side=tk.LEFT, padx=3)
 
     def remove_edges_in_mask(self, mask):
         """マスク領域内のエッジ点を削除する"""
@@ -1098,13 +1941,14 @@ class ContourEditorApp:
         self.manual_edge_points = remaining_manual_edges
         return removed_count
 
-    def remove_paths_in_mask(self, mask):
-        """マスク領域と交差するパスを部分削除する（改善版）"""
+    def remove_paths_in_mask(self, mask, eraser_width=None):
+        """マスク領域と交差するパスを部分削除する（改善版、eraser_width は履歴の再生時に解像度に合わせて指定する）"""
         new_paths = []
         new_manual_paths = []
         removed_count = 0
         
-        eraser_width = max(self.pen_size.get(), 5)
+        if eraser_width is None:
+            eraser_width = max(int(self.pen_size.get()), 5)
         
         for path in self.smoothed_paths:
             if len(path) < 2:
@@ -1120,9 +1964,8 @@ class ContourEditorApp:
                     new_manual_paths.append(path)
             elif len(path_segments) > 0:
                 # パスが分割された場合、各セグメントを新しいパスとして追加
-                min_contour_points = 10
                 for segment in path_segments:
-                    if len(segment) >= min_contour_points:  # 長さフィルタリング適用
+                    if len(segment) >= self.MIN_CONTOUR_POINTS:  # 長さフィルタリング適用
                         new_paths.append(segment)
                         if path in self.manual_paths:
                             new_manual_paths.append(segment)
@@ -1179,19 +2022,118 @@ class ContourEditorApp:
         
         return segments
 
+    def split_path_by_rect(self, path, rect):
+        """パスを矩形領域で分割し、矩形外の部分だけを残す"""
+        x0, y0, x1, y1 = rect
+        points = np.asarray(path, dtype=float)
+        inside = ((points[:, 0] >= x0) & (points[:, 0] < x1) &
+                  (points[:, 1] >= y0) & (points[:, 1] < y1))
+        if not inside.any():
+            return [path]
+        
+        segments = []
+        current_segment = []
+        for point, is_inside in zip(path, inside):
+            if not is_inside:
+                current_segment.append(point)
+            else:
+                if len(current_segment) >= 2:
+                    segments.append(current_segment)
+                current_segment = []
+        
+        if len(current_segment) >= 2:
+            segments.append(current_segment)
+        
+        return segments
+
+    def reextract_region(self, start_point, end_point):
+        """矩形領域内だけを現在のパラメータで再抽出し、領域内の抽出パスとエッジ点を置き換える"""
+        x0 = int(max(0, min(start_point[0], end_point[0])))
+        y0 = int(max(0, min(start_point[1], end_point[1])))
+        x1 = int(min(self.w, max(start_point[0], end_point[0]) + 1))
+        y1 = int(min(self.h, max(start_point[1], end_point[1]) + 1))
+        if x1 - x0 < 3 or y1 - y0 < 3:
+            self.show_status("領域再抽出: 範囲が小さすぎます。矩形をドラッグしてください")
+            return
+        rect = (x0, y0, x1, y1)
+        
+        self.show_status(f"領域再抽出: ({x0},{y0})-({x1},{y1}) の範囲を処理中...")
+        self.master.update_idletasks()
+        
+        # ブラーやCannyなどの境界の影響を避けるため余白付きで切り出し、処理は範囲内だけで行う
+        params = {name: getattr(self, name).get() for name in EXTRACT_PARAMS}
+        margin = edge_margin(params["edge_method"], params)
+        mx0, my0 = max(0, x0 - margin), max(0, y0 - margin)
+        mx1, my1 = min(self.w, x1 + margin), min(self.h, y1 + margin)
+        edges = detect_edge_image(self.image[my0:my1, mx0:mx1], params["edge_method"], params,
+                                  calibration=self.get_edge_calibration(params))
+        edges = np.ascontiguousarray(edges[y0 - my0:y1 - my0, x0 - mx0:x1 - mx0])
+        
+        _, valid_contours, closed_flags = extract_edge_contours(edges, self.extraction_mode.get(), self.MIN_CONTOUR_POINTS)
+        offset = np.array([x0, y0], dtype=np.int32)
+        valid_contours = [contour + offset for contour in valid_contours]
+        
+        tolerance = self.get_simplify_tolerance()
+        simplified_contours = valid_contours
+        if tolerance > 0 and valid_contours:
+            simplified = simplify_paths([contour[:, 0, :] for contour in valid_contours], tolerance)
+            simplified_contours = [points.reshape(-1, 1, 2).astype(np.int32) for points in simplified]
+        new_paths = self.generate_spline_paths(simplified_contours, closed_flags, include_manual=False)
+        
+        # 範囲内の自動抽出エッジ点を新しいエッジ点で置き換え（手動エッジ点は保持）
+        manual_edge_set = set(self.manual_edge_points)
+        remaining_edges = [point for point in self.edge_points
+                           if point in manual_edge_set
+                           or not (x0 <= point[0] < x1 and y0 <= point[1] < y1)]
+        removed_edges = len(self.edge_points) - len(remaining_edges)
+        new_edges = [(float(point[0]), float(point[1]))
+                     for contour in valid_contours for point in contour[:, 0, :]]
+        self.edge_points = remaining_edges + new_edges
+        
+        # 範囲内の自動抽出パスを除去（範囲をまたぐパスは範囲外の部分を残す、手動パスは保持）
+        # 外接矩形が範囲にかかるパスだけを分割の対象にし、手動パスは同一のオブジェクトかで判定する
+        candidates = set(self.get_path_index().query((x0, y0, x1, y1)).tolist())
+        manual_ids = {id(path) for path in self.manual_paths}
+        kept_paths = []
+        for i, path in enumerate(self.smoothed_paths):
+            if i not in candidates or id(path) in manual_ids:
+                kept_paths.append(path)
+                continue
+            for segment in self.split_path_by_rect(path, rect):
+                if len(segment) >= self.MIN_CONTOUR_POINTS:
+                    kept_paths.append(segment)
+        self.smoothed_paths = kept_paths + new_paths
+        
+        self.show_status(f"領域再抽出完了: 範囲内のエッジ点{removed_edges}個を{len(new_edges)}個に、パス{len(new_paths)}個を再生成しました")
+
+    def get_edge_calibration(self, params):
+        """画像全体から求めた閾値・前景の向き（全体で決まる値を使わない方式はNone）
+
+        切り出した範囲から大津の閾値や前景の向きを求め直すと範囲ごとに結果が変わるため、
+        最後に全体を抽出したときの値を使う。パラメータが変わっていれば画像全体で求め直す。
+        """
+        if not EDGE_BACKENDS[params["edge_method"]].calibrated:
+            return None
+        if self.edge_calibration is None or self.edge_calibration[0] != params:
+            calibration = {}
+            detect_edge_image(self.image, params["edge_method"], params, calibration=calibration)
+            self.edge_calibration = (dict(params), calibration)
+        return self.edge_calibration[1]
+
     def apply_spline_to_path(self, path):
         """パスにスプライン補間を適用する"""
-        if len(path) < 3:
+        if len(path) < 2:
             return path
         
+        from scipy.interpolate import splev, splprep
         try:
             # パスを numpy 配列に変換
             points = np.array(path)
             x = points[:, 0].astype(float)
             y = points[:, 1].astype(float)
             
-            # スプライン補間を実行（開いた曲線として処理）
-            tck, u = splprep([x, y], s=1.0, per=False)  # per=False for open curves
+            # スプライン補間を実行（開いた曲線として処理、点が少ない場合は次数を下げる）
+            tck, u = splprep([x, y], s=1.0, per=False, k=min(3, len(path) - 1))  # per=False for open curves
             
             # より多くの点でスプライン曲線を再サンプリング
             unew = np.linspace(0, 1.0, max(50, len(path) * 3))
@@ -1208,39 +2150,155 @@ class ContourEditorApp:
             return path
 
     def regenerate_paths_from_edges(self):
-        """エッジ点からスプライン補間でパスを再生成（改善版）"""
-        if not self.edge_points:
-            self.smoothed_paths = list(self.manual_paths)
-            self.show_status("パス再生成完了: エッジ点がないため手動パスのみ")
-            return
+        """エッジ点からスプライン補間でパスを再生成（前回から変化したグループだけを再計算）
+
+        GUIの操作からは呼ばれず、SVG_maker_bench.py の計測でのみ使う。
+        """
+        with self.profiler.span("regenerate_paths_from_edges", points=len(self.edge_points)):
+            if not self.edge_points:
+                self.smoothed_paths = list(self.manual_paths)
+                self.edge_group_cache = None
+                self.show_status("パス再生成完了: エッジ点がないため手動パスのみ")
+                return
         
-        self.show_status(f"パス再生成開始: {len(self.edge_points)}個のエッジ点を処理中...")
-        self.master.update_idletasks()
+            self.show_status(f"パス再生成開始: {len(self.edge_points)}個のエッジ点を処理中...")
+            self.master.update_idletasks()
         
-        try:
-            # エッジ点から疑似輪郭を生成してスプライン補間
-            pseudo_contours = self.create_contours_from_edges()
+            try:
+                # 前回のグループ化からの差分で、編集の影響を受けたグループだけを再グループ化
+                records, reused_count = self.update_edge_groups()
             
-            if pseudo_contours:
-                # スプライン補間を実行
-                spline_paths = self.generate_spline_paths(pseudo_contours)
-                
-                # 手動パスと統合
-                self.smoothed_paths = spline_paths + list(self.manual_paths)
-                
-                # 重複パスを除去
-                self.smoothed_paths = self.remove_duplicate_paths(self.smoothed_paths)
+                # 変化のないグループはスプライン補間結果を内容ハッシュで再利用
+                cache = self.edge_group_cache
+                old_splines = cache.get('splines', {})
+                splines = {}
+                pending = []
+                for record in records:
+                    if not record['kept']:
+                        continue
+                    if record['key'] in old_splines:
+                        splines[record['key']] = old_splines[record['key']]
+                    else:
+                        contour = self.group_to_contour(record['points'])
+                        if contour is not None:
+                            pending.append((record['key'], contour))
+                        else:
+                            splines[record['key']] = None
+            
+                if pending:
+                    fitted = self.generate_spline_paths([contour for _, contour in pending], include_manual=False)
+                    # 長さフィルタで除外された輪郭はNoneとして記録
+                    fitted_iter = iter(fitted)
+                    for key, contour in pending:
+                        splines[key] = next(fitted_iter) if len(contour) >= self.MIN_CONTOUR_POINTS else None
+                cache['splines'] = splines
+            
+                # 重複パスの除去も前回残ったパスを基準に新しいパスだけを判定
+                similarity_threshold = min(self.w, self.h) * 0.05
+                previous_survivors = cache.get('survivors', set())
+                survivors = set()
+                unique_paths = []
+                candidates = []
+                for record in records:
+                    path = splines.get(record['key']) if record['kept'] else None
+                    if path is None or len(path) < 2:
+                        continue
+                    if record['key'] in previous_survivors:
+                        unique_paths.append(path)
+                        survivors.add(record['key'])
+                    else:
+                        candidates.append((record['key'], path))
+            
+                spline_count = len(unique_paths)
+                for key, path in candidates:
+                    if not any(self.are_paths_similar(path, existing, similarity_threshold) for existing in unique_paths):
+                        unique_paths.append(path)
+                        survivors.add(key)
+                        spline_count += 1
+                cache['survivors'] = survivors
+            
+                for manual_path in self.manual_paths:
+                    if len(manual_path) < 2:
+                        continue
+                    if not any(self.are_paths_similar(manual_path, existing, similarity_threshold) for existing in unique_paths):
+                        unique_paths.append(manual_path)
+            
+                self.smoothed_paths = unique_paths
+                self.show_status(f"パス再生成完了: {spline_count}個のスプライン補間パス + {len(self.manual_paths)}個の手動パス = 計{len(self.smoothed_paths)}個のパス（{reused_count}グループを再利用、{len(pending)}グループを再計算）")
                 
-                self.show_status(f"パス再生成完了: {len(spline_paths)}個のスプライン補間パス + {len(self.manual_paths)}個の手動パス = 計{len(self.smoothed_paths)}個のパス")
-            else:
-                # 疑似輪郭が生成できない場合は手動パスのみ
+            except Exception as e:
+                # エラーが発生した場合は手動パスのみ保持
                 self.smoothed_paths = list(self.manual_paths)
-                self.show_status(f"パス再生成完了: 有効な輪郭が生成できませんでした（手動パス{len(self.manual_paths)}個のみ）")
-                
-        except Exception as e:
-            # エラーが発生した場合は手動パスのみ保持
-            self.smoothed_paths = list(self.manual_paths)
-            self.show_status(f"パス再生成エラー: {str(e)[:50]}... - 手動パス{len(self.manual_paths)}個のみ保持")
+                self.edge_group_cache = None
+                self.show_status(f"パス再生成エラー: {str(e)[:50]}... - 手動パス{len(self.manual_paths)}個のみ保持")
+    
+    def update_edge_groups(self):
+        """エッジ点のグループを差分更新し、(グループ記録のリスト, 再利用したグループ数) を返す
+
+        前回グループ化したエッジ点と現在のエッジ点の差（消しゴムで削除・ペンで追加された点）から、
+        削除点を含むグループと追加点の近傍にあるグループだけを再グループ化する。
+        """
+        group_distance = min(self.w, self.h) * 0.05
+        reach = group_distance * 2  # グループ化・密度計算の最大距離
+        cache = self.edge_group_cache
+        current = Counter(self.edge_points)
+        
+        if cache is None or cache.get('size') != (self.w, self.h):
+            cache = {'size': (self.w, self.h)}
+            self.edge_group_cache = cache
+            added = current
+            removed = Counter()
+            old_records = []
+        else:
+            added = current - cache['points']
+            removed = cache['points'] - current
+            old_records = cache['records']
+        
+        # 影響を受けたグループを特定
+        dirty = set()
+        if removed:
+            for index, record in enumerate(old_records):
+                if any(point in removed for point in record['points']):
+                    dirty.add(index)
+        if added:
+            grid = {}
+            for index, record in enumerate(old_records):
+                for point in record['points']:
+                    grid.setdefault((int(point[0] // reach), int(point[1] // reach)), set()).add(index)
+            for point in added:
+                cx, cy = int(point[0] // reach), int(point[1] // reach)
+                for gx in (cx - 1, cx, cx + 1):
+                    for gy in (cy - 1, cy, cy + 1):
+                        dirty.update(grid.get((gx, gy), ()))
+        
+        # 影響を受けたグループの点（削除点を除く）と追加点だけを再グループ化
+        regroup_points = Counter()
+        for index in dirty:
+            regroup_points.update(old_records[index]['points'])
+        regroup_points = regroup_points - removed + added
+        subset = list(regroup_points.elements())
+        
+        records = [record for index, record in enumerate(old_records) if index not in dirty]
+        reused_count = sum(1 for record in records if record['kept'])
+        if subset:
+            new_groups = self.group_nearby_edges(subset)
+            grouped = Counter()
+            for group in new_groups:
+                grouped.update(group)
+                records.append(self.make_group_record(group, True))
+            leftover = list((regroup_points - grouped).elements())
+            if leftover:
+                # グループにならなかった点も次回の差分計算のために保持
+                records.append(self.make_group_record(leftover, False))
+        
+        cache['records'] = records
+        cache['points'] = current
+        return records, reused_count
+    
+    def make_group_record(self, group, kept):
+        """グループの点と内容ハッシュをまとめた記録を作成"""
+        key = hashlib.sha1(np.asarray(group, dtype=np.float64).tobytes()).hexdigest()
+        return {'points': group, 'kept': kept, 'key': key}
     
     def create_contours_from_edges(self):
         """エッジ点から疑似輪郭を生成（改善版）"""
@@ -1253,54 +2311,8 @@ class ContourEditorApp:
             pseudo_contours = []
             
             for group in groups:
-                if len(group) < 2:  # 最小2点に変更
-                    continue
-                
-                if len(group) == 2:
-                    # 2点の場合は直線として処理
-                    p1, p2 = group
-                    # 2点を結ぶ直線上に中間点を追加
-                    mid_x = (p1[0] + p2[0]) / 2
-                    mid_y = (p1[1] + p2[1]) / 2
-                    expanded_group = [p1, (mid_x, mid_y), p2]
-                    
-                    # OpenCVの輪郭形式に変換
-                    contour_array = np.array([[[int(p[0]), int(p[1])]] for p in expanded_group])
-                    pseudo_contours.append(contour_array)
-                    
-                elif len(group) >= 3:
-                    # 3点以上の場合は通常の処理
-                    # グループ内の点を重心からの角度でソート（閉じた輪郭にするため）
-                    center_x = sum(p[0] for p in group) / len(group)
-                    center_y = sum(p[1] for p in group) / len(group)
-                    
-                    def angle_from_center(point):
-                        return np.arctan2(point[1] - center_y, point[0] - center_x)
-                    
-                    sorted_group = sorted(group, key=angle_from_center)
-                    
-                    # 点が少ない場合は補間点を追加
-                    if len(sorted_group) < 5:
-                        # 各隣接ペア間に中間点を追加
-                        expanded_group = []
-                        for i in range(len(sorted_group)):
-                            current_point = sorted_group[i]
-                            next_point = sorted_group[(i + 1) % len(sorted_group)]
-                            
-                            expanded_group.append(current_point)
-                            
-                            # 中間点を追加（距離が長い場合のみ）
-                            distance = ((current_point[0] - next_point[0]) ** 2 + 
-                                       (current_point[1] - next_point[1]) ** 2) ** 0.5
-                            if distance > min(self.w, self.h) * 0.02:  # 画像サイズの2%以上の距離
-                                mid_x = (current_point[0] + next_point[0]) / 2
-                                mid_y = (current_point[1] + next_point[1]) / 2
-                                expanded_group.append((mid_x, mid_y))
-                        
-                        sorted_group = expanded_group
-                    
-                    # OpenCVの輪郭形式に変換
-                    contour_array = np.array([[[int(p[0]), int(p[1])]] for p in sorted_group])
+                contour_array = self.group_to_contour(group)
+                if contour_array is not None:
                     pseudo_contours.append(contour_array)
             
             return pseudo_contours
@@ -1309,9 +2321,60 @@ class ContourEditorApp:
             self.show_status(f"輪郭生成エラー: {str(e)[:30]}...")
             return []
     
-    def group_nearby_edges(self):
-        """エッジ点を近接性でグループ化（改善版）"""
-        if not self.edge_points:
+    def group_to_contour(self, group):
+        """エッジ点のグループを疑似輪郭（OpenCVの輪郭形式）に変換"""
+        if len(group) < 2:  # 最小2点に変更
+            return None
+        
+        if len(group) == 2:
+            # 2点の場合は直線として処理
+            p1, p2 = group
+            # 2点を結ぶ直線上に中間点を追加
+            mid_x = (p1[0] + p2[0]) / 2
+            mid_y = (p1[1] + p2[1]) / 2
+            expanded_group = [p1, (mid_x, mid_y), p2]
+            
+            # OpenCVの輪郭形式に変換
+            return np.array([[[int(p[0]), int(p[1])]] for p in expanded_group])
+        
+        # 3点以上の場合は通常の処理
+        # グループ内の点を重心からの角度でソート（閉じた輪郭にするため）
+        center_x = sum(p[0] for p in group) / len(group)
+        center_y = sum(p[1] for p in group) / len(group)
+        
+        def angle_from_center(point):
+            return np.arctan2(point[1] - center_y, point[0] - center_x)
+        
+        sorted_group = sorted(group, key=angle_from_center)
+        
+        # 点が少ない場合は補間点を追加
+        if len(sorted_group) < 5:
+            # 各隣接ペア間に中間点を追加
+            expanded_group = []
+            for i in range(len(sorted_group)):
+                current_point = sorted_group[i]
+                next_point = sorted_group[(i + 1) % len(sorted_group)]
+                
+                expanded_group.append(current_point)
+                
+                # 中間点を追加（距離が長い場合のみ）
+                distance = ((current_point[0] - next_point[0]) ** 2 + 
+                           (current_point[1] - next_point[1]) ** 2) ** 0.5
+                if distance > min(self.w, self.h) * 0.02:  # 画像サイズの2%以上の距離
+                    mid_x = (current_point[0] + next_point[0]) / 2
+                    mid_y = (current_point[1] + next_point[1]) / 2
+                    expanded_group.append((mid_x, mid_y))
+            
+            sorted_group = expanded_group
+        
+        # OpenCVの輪郭形式に変換
+        return np.array([[[int(p[0]), int(p[1])]] for p in sorted_group])
+    
+    def group_nearby_edges(self, points=None):
+        """エッジ点を近接性でグループ化（改善版、pointsを指定するとその点だけを対象にする）"""
+        if points is None:
+            points = self.edge_points
+        if not points:
             return []
         
         try:
@@ -1322,9 +2385,9 @@ class ContourEditorApp:
             
             # エッジ点を密度でソート（近傍点数が多い順）
             edge_density = []
-            for i, point in enumerate(self.edge_points):
+            for i, point in enumerate(points):
                 nearby_count = 0
-                for j, other_point in enumerate(self.edge_points):
+                for j, other_point in enumerate(points):
                     if i != j:
                         distance = ((point[0] - other_point[0]) ** 2 + 
                                    (point[1] - other_point[1]) ** 2) ** 0.5
@@ -1345,7 +2408,7 @@ class ContourEditorApp:
                 used_points.add(i)
                 
                 # このグループに属する他の点を探す（段階的に距離を拡大）
-                max_iterations = len(self.edge_points)
+                max_iterations = len(points)
                 iteration_count = 0
                 
                 # 複数の距離レベルで接続を試行
@@ -1357,7 +2420,7 @@ class ContourEditorApp:
                         changed = False
                         iteration_count += 1
                         
-                        for j, other_point in enumerate(self.edge_points):
+                        for j, other_point in enumerate(points):
                             if j in used_points:
                                 continue
                             
@@ -1463,19 +2526,55 @@ class ContourEditorApp:
         self.show_status("SVGファイルを保存中...")
         self.master.update_idletasks()
         
-        dwg = svgwrite.Drawing(save_path, size=(self.w, self.h))
-        for path in self.smoothed_paths:
-            if len(path) < 2:
-                continue
-            path_data = f"M {path[0][0]},{path[0][1]} " + " ".join(f"L {x},{y}" for x, y in path[1:])
-            dwg.add(dwg.path(d=path_data, stroke='black', fill='none', stroke_width=1))
-        dwg.save()
+        self.export_svg(save_path)
         messagebox.showinfo("保存完了", f"SVGを保存しました\n{save_path}")
         self.show_status("SVG保存完了")
 
+    def export_svg(self, save_path):
+        """現在のパスをSVGファイルに書き出す（保存前に全パスをまとめて簡略化）"""
+        with self.profiler.span("save_svg") as operation:
+            write_svg(self.smoothed_paths, self.w, self.h, save_path, self.get_simplify_tolerance())
+            operation["paths"] = len(self.smoothed_paths)
+
+    def save_color_svg(self):
+        """画像を減色して色ごとの塗りつぶし領域のSVGを保存"""
+        if self.image is None:
+            messagebox.showinfo("情報", "画像が読み込まれていません")
+            return
+        try:
+            n_colors = int(self.color_count.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("エラー", "色数には整数を指定してください")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".svg", filetypes=[("SVGファイル", "*.svg")])
+        if not save_path:
+            return
+        
+        self.show_status(f"{n_colors}色に減色して色ごとの領域を追跡しています...")
+        self.master.update_idletasks()
+        layers = self.export_color_svg(save_path, n_colors)
+        regions = sum(len(layer["regions"]) for layer in layers)
+        self.show_status(f"カラーSVG保存完了: {len(layers)}色 / {regions}領域")
+
+    def export_color_svg(self, save_path, n_colors=8):
+        """画像を減色し、色ごとに塗りつぶしの<g>にまとめたSVGを書き出す（レイヤーのリストを返す）"""
+        layers = vectorize_colors(self.image, n_colors, tolerance=self.get_simplify_tolerance(), profiler=self.profiler)
+        with self.profiler.span("save_svg") as operation:
+            write_color_svg(layers, self.w, self.h, save_path)
+            operation["layers"] = len(layers)
+        return layers
+
+    def export_svg_text(self):
+        """現在のパスをSVGの文字列として返す（export_svgと同じ内容）"""
+        with self.profiler.span("save_svg") as operation:
+            text = build_svg(self.smoothed_paths, self.w, self.h, tolerance=self.get_simplify_tolerance()).tostring()
+            operation["paths"] = len(self.smoothed_paths)
+        return text
+
     def quit_app(self):
         """アプリケーションを終了"""
         if messagebox.askokcancel("終了", "アプリケーションを終了しますか？"):
+            self.prefetcher.shutdown()
             self.master.quit()
             self.master.destroy()
 
@@ -1492,12 +2591,46 @@ class ContourEditorApp:
         """ステータスメッセージを表示"""
         self.status_text.set(message)
 
+    def update_timing_overlay(self, event):
+        """計測表示がオンなら直近の操作の所要時間を表示"""
+        if event is not None and "cprofile" in event["args"]:
+            self.show_status(f"プロファイル結果を保存しました: {event['args']['cprofile']}")
+        if self.show_timing.get():
+            text = self.profiler.format_last_operation()
+            latency = self.profiler.latency.format()
+            self.timing_text.set(f"{text}  {latency}" if latency else text)
+        else:
+            self.timing_text.set("")
+
+    def save_timing_trace(self):
+        """計測結果をChromeトレース形式と集計JSONで保存"""
+        if not self.profiler.events:
+            messagebox.showinfo("情報", "計測結果がありません")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                 filetypes=[("Chromeトレース", "*.json")])
+        if not save_path:
+            return
+        self.profiler.write_chrome_trace(save_path)
+        summary_path = save_path[:-len(".json")] + "_summary.json" if save_path.endswith(".json") else save_path + "_summary.json"
+        self.profiler.write_json(summary_path)
+        self.show_status(f"計測結果を保存しました: {save_path}")
+
+    def arm_cprofile(self):
+        """次の1操作をcProfileで計測するよう設定"""
+        save_path = filedialog.asksaveasfilename(defaultextension=".prof",
+                                                 filetypes=[("cProfile統計", "*.prof")])
+        if not save_path:
+            return
+        self.profiler.arm_cprofile(save_path)
+        self.show_status("プロファイル: 次の操作をcProfileで計測します")
+
     def push_undo(self):
         edge_points = getattr(self, 'edge_points', [])
         selected_edge = getattr(self, 'selected_edge', None)
         manual_paths = getattr(self, 'manual_paths', [])
         manual_edge_points = getattr(self, 'manual_edge_points', [])
-        self.undo_stack.append((list(self.contours), list(self.smoothed_paths), list(edge_points), selected_edge, list(manual_paths), list(manual_edge_points)))
+        self.undo_stack.append((list(self.contours), list(self.smoothed_paths), list(edge_points), selected_edge, list(manual_paths), list(manual_edge_points), list(self.journal.operations)))
         self.redo_stack.clear()
 
     def undo(self, event=None):
@@ -1507,13 +2640,15 @@ class ContourEditorApp:
         selected_edge = getattr(self, 'selected_edge', None)
         manual_paths = getattr(self, 'manual_paths', [])
         manual_edge_points = getattr(self, 'manual_edge_points', [])
-        self.redo_stack.append((list(self.contours), list(self.smoothed_paths), list(edge_points), selected_edge, list(manual_paths), list(manual_edge_points)))
+        self.redo_stack.append((list(self.contours), list(self.smoothed_paths), list(edge_points), selected_edge, list(manual_paths), list(manual_edge_points), list(self.journal.operations)))
         prev = self.undo_stack.pop()
         self.contours, self.smoothed_paths = prev[0], prev[1]
         self.edge_points = prev[2] if len(prev) > 2 else []
         self.selected_edge = prev[3] if len(prev) > 3 else None
         self.manual_paths = prev[4] if len(prev) > 4 else []
         self.manual_edge_points = prev[5] if len(prev) > 5 else []
+        if len(prev) > 6:
+            self.journal.operations = prev[6]
         self.show_status("元に戻しました")
         self.draw_images()
 
@@ -1524,13 +2659,15 @@ class ContourEditorApp:
         selected_edge = getattr(self, 'selected_edge', None)
         manual_paths = getattr(self, 'manual_paths', [])
         manual_edge_points = getattr(self, 'manual_edge_points', [])
-        self.undo_stack.append((list(self.contours), list(self.smoothed_paths), list(edge_points), selected_edge, list(manual_paths), list(manual_edge_points)))
+        self.undo_stack.append((list(self.contours), list(self.smoothed_paths), list(edge_points), selected_edge, list(manual_paths), list(manual_edge_points), list(self.journal.operations)))
         next_state = self.redo_stack.pop()
         self.contours, self.smoothed_paths = next_state[0], next_state[1]
         self.edge_points = next_state[2] if len(next_state) > 2 else []
         self.selected_edge = next_state[3] if len(next_state) > 3 else None
         self.manual_paths = next_state[4] if len(next_state) > 4 else []
         self.manual_edge_points = next_state[5] if len(next_state) > 5 else []
+        if len(next_state) > 6:
+            self.journal.operations = next_state[6]
         self.show_status("やり直しました")
         self.draw_images()
 
@@ -1602,6 +2739,7 @@ class ContourEditorApp:
             self.draw_images()
 
     def on_trace_motion(self, event):
+        received = time.perf_counter()
         if event.xdata is None or event.ydata is None:
             return
         
@@ -1648,12 +2786,51 @@ class ContourEditorApp:
                 
                 self.pan_start = (event.xdata, event.ydata)
                 
-                self.draw_images()
+                self.schedule_redraw(received)
             return
         
         if self.drawing:
             self.trace_points.append((event.xdata, event.ydata))
-            self.draw_images()
+            self.schedule_redraw(received)
+
+    def get_max_redraw_fps(self):
+        try:
+            return max(0.0, float(self.max_redraw_fps.get()))
+        except (tk.TclError, ValueError):
+            return 30.0
+
+    def schedule_redraw(self, received=None):
+        """再描画を予約（保留中の再描画があれば相乗りし、fps上限まで待つ）"""
+        if received is not None:
+            self.pending_event_times.append(received)
+        if self.redraw_pending_id is not None:
+            return
+        delay_ms = 0
+        fps = self.get_max_redraw_fps()
+        if fps > 0:
+            wait = self.last_redraw_time + 1.0 / fps - time.perf_counter()
+            delay_ms = max(0, int(wait * 1000))
+        self.redraw_pending_id = self.master.after(delay_ms, self.flush_redraw)
+
+    def flush_redraw(self):
+        """予約された再描画を実行し、まとめたイベントの描画遅延を記録"""
+        self.redraw_pending_id = None
+        event_times = self.pending_event_times
+        self.pending_event_times = []
+        self.draw_images()
+        painted = time.perf_counter()
+        self.last_redraw_time = painted
+        for received in event_times:
+            self.profiler.latency.add(painted - received)
+        if event_times:
+            self.update_timing_overlay(None)
+
+    def cancel_pending_redraw(self):
+        """保留中の再描画を取り消す（直後に全体を描画し直す場合）"""
+        if self.redraw_pending_id is not None:
+            self.master.after_cancel(self.redraw_pending_id)
+            self.redraw_pending_id = None
+        self.pending_event_times = []
 
     def on_trace_release(self, event):
         if self.panning:
@@ -1661,28 +2838,44 @@ class ContourEditorApp:
             self.pan_start = None
             return
         
+        self.cancel_pending_redraw()
+        if self.drawing and self.tool_mode.get() == "select":
+            # 選択は編集ではないためアンドゥ履歴・編集履歴に記録しない
+            with self.profiler.span("select_paths", points=len(self.trace_points)) as operation:
+                self.select_paths(self.trace_points)
+                operation["selected"] = len(self.selected_path_ids)
+                self.drawing = False
+                self.trace_points = []
+                self.draw_images()
+            return
         if not self.drawing or len(self.trace_points) < 2:
             self.drawing = False
             self.trace_points = []
             self.draw_images()
             return
 
-        self.push_undo()
         mode = self.tool_mode.get()
+        with self.profiler.span(f"on_trace_release:{mode}", points=len(self.trace_points)) as operation:
+            self.apply_trace_edit(mode, self.trace_points)
+            operation["paths"] = len(self.smoothed_paths)
+            self.drawing = False
+            self.trace_points = []
+            self.draw_images()
 
-        points = np.array([(int(x), int(y)) for x, y in self.trace_points])
+    def apply_trace_edit(self, mode, trace_points, tool_size=None, endpoint_distance=50):
+        """軌跡による編集（消しゴム・ペン・クロージング・領域再抽出）を適用し、編集履歴に記録する
+
+        tool_size と endpoint_distance は編集履歴の再生時に解像度に合わせて指定する。
+        """
+        if tool_size is None:
+            tool_size = self.pen_size.get()
+        self.push_undo()
 
         if mode == "eraser":
-            if len(self.trace_points) < 1:
-                self.drawing = False
-                self.trace_points = []
-                self.draw_images()
-                return
-            
             mask = np.zeros((self.h, self.w), dtype=np.uint8)
-            trace_points_int = np.array([(int(x), int(y)) for x, y in self.trace_points])
-            
-            eraser_width = max(self.pen_size.get(), 5)
+            trace_points_int = np.array([(int(x), int(y)) for x, y in trace_points])
+        
+            eraser_width = max(int(tool_size), 5)
             if len(trace_points_int) > 1:
                 cv2.polylines(mask, [trace_points_int], isClosed=False, color=1, thickness=eraser_width)
                 kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (eraser_width, eraser_width))
@@ -1690,10 +2883,10 @@ class ContourEditorApp:
             else:
                 center = (int(trace_points_int[0][0]), int(trace_points_int[0][1]))
                 cv2.circle(mask, center, eraser_width, 1, -1)
-            
+        
             removed_count = self.remove_edges_in_mask(mask)
-            removed_paths = self.remove_paths_in_mask(mask)
-            
+            removed_paths = self.remove_paths_in_mask(mask, eraser_width)
+        
             if removed_count > 0 and removed_paths > 0:
                 self.show_status(f"消しゴム: {removed_count}個のエッジ点と{removed_paths}個のパスを削除しました")
             elif removed_count > 0:
@@ -1704,120 +2897,146 @@ class ContourEditorApp:
                 self.show_status("消しゴム: 削除対象のエッジ点またはパスが見つかりませんでした")
 
         elif mode == "pen":
-            if len(self.trace_points) >= 2:
+            if len(trace_points) >= 2:
                 # 軌跡からパスを生成（エッジ点は追加せず、直接パスを作成）
-                new_path = list(self.trace_points)
-                
+                new_path = list(trace_points)
+            
                 # 軌跡を適度に間引きして基本パスにする
                 simplified_path = self.simplify_trace_path(new_path)
-                
+            
                 # スプライン補間を適用して滑らかなパスにする
                 smooth_path = self.apply_spline_to_path(simplified_path)
-                
+            
                 # 長さフィルタリングを適用
-                min_contour_points = 10
-                if len(smooth_path) >= min_contour_points:
+                if len(smooth_path) >= self.MIN_CONTOUR_POINTS:
                     # 手動パスとして追加
                     self.manual_paths.append(smooth_path)
                     self.smoothed_paths.append(smooth_path)
-                    
+                
                     self.show_status(f"ペン: {len(smooth_path)}点のスプライン補間パスを生成しました")
                 else:
-                    self.show_status(f"ペン: パスが短すぎます（{len(smooth_path)}点 < {min_contour_points}点）。もっと長く描いてください")
+                    self.show_status(f"ペン: パスが短すぎます（{len(smooth_path)}点 < {self.MIN_CONTOUR_POINTS}点）。もっと長く描いてください")
             else:
                 self.show_status("ペン: 軌跡が短すぎます。ドラッグして軌跡を描いてください")
 
         elif mode == "closing":
-            if len(self.trace_points) >= 2:
+            if len(trace_points) >= 2:
                 # 軌跡の始点と終点を取得
-                start_point = self.trace_points[0]
-                end_point = self.trace_points[-1]
-                
+                start_point = trace_points[0]
+                end_point = trace_points[-1]
+            
                 # 始点に最も近いパスの端点を検索
-                start_path_idx, start_endpoint, start_is_start = self.find_nearest_path_endpoint(start_point)
+                start_path_id, start_endpoint, start_is_start = self.find_nearest_path_endpoint(start_point, endpoint_distance)
                 # 終点に最も近いパスの端点を検索
-                end_path_idx, end_endpoint, end_is_start = self.find_nearest_path_endpoint(end_point)
-                
-                if start_path_idx is None:
+                end_path_id, end_endpoint, end_is_start = self.find_nearest_path_endpoint(end_point, endpoint_distance)
+            
+                if start_path_id is None:
                     self.show_status("クロージング: 始点の近くにパスの端点が見つかりません")
-                elif end_path_idx is None:
+                elif end_path_id is None:
                     self.show_status("クロージング: 終点の近くにパスの端点が見つかりません")
-                elif start_path_idx == end_path_idx and start_is_start == end_is_start:
+                elif start_path_id == end_path_id and start_is_start == end_is_start:
                     self.show_status("クロージング: 同じパスの同じ端点です。異なる端点を指定してください")
+                elif start_path_id == end_path_id:
+                    # 同じパスの両端を軌跡で接続（パスを閉じる）
+                    topology = self.path_topology
+                    closed_length = len(topology.paths[start_path_id]) + len(trace_points)
+                
+                    # 長さフィルタリングを適用
+                    if closed_length >= self.MIN_CONTOUR_POINTS:
+                        topology.close(start_path_id, start_is_start, end_is_start, trace_points)
+                        self.sync_paths_from_topology()
+                        self.show_status(f"クロージング: パスを軌跡で閉じました（閉じたパス: {closed_length}点）")
+                    else:
+                        self.show_status(f"クロージング: 閉じたパスが短すぎます（{closed_length}点 < {self.MIN_CONTOUR_POINTS}点）")
                 else:
-                    # 2つのパスを接続
-                    if start_path_idx == end_path_idx:
-                        # 同じパスの両端を軌跡で接続（パスを閉じる）
-                        original_path = self.smoothed_paths[start_path_idx]
-                        
-                        if start_is_start and not end_is_start:
-                            # 開始点と終了点 → 軌跡で閉じる
-                            closed_path = original_path + list(self.trace_points)
-                        elif not start_is_start and end_is_start:
-                            # 終了点と開始点 → 軌跡を反転して閉じる
-                            closed_path = original_path + list(reversed(self.trace_points))
-                        else:
-                            # その他の場合はそのまま
-                            closed_path = original_path + list(self.trace_points)
-                        
-                        # 元のパスを削除し、新しい閉じたパスを追加
-                        del self.smoothed_paths[start_path_idx]
-                        if start_path_idx < len(self.manual_paths):
-                            del self.manual_paths[start_path_idx]
-                        
-                        # 長さフィルタリングを適用
-                        min_contour_points = 10
-                        if len(closed_path) >= min_contour_points:
-                            self.smoothed_paths.append(closed_path)
-                            self.manual_paths.append(closed_path)
-                            self.show_status(f"クロージング: パスを軌跡で閉じました（閉じたパス: {len(closed_path)}点）")
-                        else:
-                            self.show_status(f"クロージング: 閉じたパスが短すぎます（{len(closed_path)}点 < {min_contour_points}点）")
+                    # 異なるパスの接続（端の向きに合わせて path1 + 軌跡 + path2 に結合）
+                    topology = self.path_topology
+                    combined_length = (len(topology.paths[start_path_id]) + len(trace_points) +
+                                       len(topology.paths[end_path_id]))
+                
+                    # 長さフィルタリングを適用
+                    if combined_length >= self.MIN_CONTOUR_POINTS:
+                        topology.join(start_path_id, start_is_start, end_path_id, end_is_start, trace_points)
+                        self.sync_paths_from_topology()
+                        self.show_status(f"クロージング: 2つのパスを軌跡で接続しました（結合パス: {combined_length}点）")
                     else:
-                        # 異なるパスの接続（従来の処理）
-                        path1 = self.smoothed_paths[start_path_idx]
-                        path2 = self.smoothed_paths[end_path_idx]
-                        
-                        # パス1とパス2を結合（方向を考慮）
-                        if start_is_start and end_is_start:
-                            # 両方とも開始点 → path1を反転 + 軌跡 + path2
-                            combined_path = list(reversed(path1)) + list(self.trace_points) + path2
-                        elif start_is_start and not end_is_start:
-                            # start=開始点, end=終了点 → path1を反転 + 軌跡 + path2を反転
-                            combined_path = list(reversed(path1)) + list(self.trace_points) + list(reversed(path2))
-                        elif not start_is_start and end_is_start:
-                            # start=終了点, end=開始点 → path1 + 軌跡 + path2
-                            combined_path = path1 + list(self.trace_points) + path2
-                        else:
-                            # 両方とも終了点 → path1 + 軌跡 + path2を反転
-                            combined_path = path1 + list(self.trace_points) + list(reversed(path2))
-                        
-                        # 元のパスを削除し、新しい結合パスを追加
-                        removed_paths = [self.smoothed_paths[start_path_idx], self.smoothed_paths[end_path_idx]]
-                        
-                        # インデックスの大きい方から削除（インデックスずれを防ぐ）
-                        indices_to_remove = sorted([start_path_idx, end_path_idx], reverse=True)
-                        for idx in indices_to_remove:
-                            del self.smoothed_paths[idx]
-                            if idx < len(self.manual_paths) and self.manual_paths[idx] in removed_paths:
-                                del self.manual_paths[idx]
-                        
-                        # 新しい結合パスを追加
-                        min_contour_points = 10
-                        if len(combined_path) >= min_contour_points:
-                            self.smoothed_paths.append(combined_path)
-                            self.manual_paths.append(combined_path)
-                            self.show_status(f"クロージング: 2つのパスを軌跡で接続しました（結合パス: {len(combined_path)}点）")
-                        else:
-                            self.show_status(f"クロージング: 結合パスが短すぎます（{len(combined_path)}点 < {min_contour_points}点）")
+                        self.show_status(f"クロージング: 結合パスが短すぎます（{combined_length}点 < {self.MIN_CONTOUR_POINTS}点）")
             else:
                 self.show_status("クロージング: 軌跡が短すぎます。ドラッグして2つのパス端点を繋いでください")
 
-        self.drawing = False
-        self.trace_points = []
-        self.draw_images()
+        elif mode == "region":
+            self.reextract_region(trace_points[0], trace_points[-1])
+
+        self.journal.record(mode, trace_points, self.w, self.h, size=tool_size, endpoint_distance=endpoint_distance)
+
+def import_time_breakdown(module="SVG_maker_gui", limit=12):
+    """別プロセスで -X importtime を使い、直接読み込むモジュールごとの読み込み時間（秒）を返す"""
+    import subprocess
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        # 対象モジュール自身（字下げ0）と、それが直接読み込むもの（字下げ2）だけを集計
+        indent = len(name) - len(name.lstrip()) - 1
+        if indent <= 2:
+            modules.append((name.strip(), int(cumulative) / 1_000_000))
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return modules[:limit]
+
+
+def run_startup_report(as_json=False):
+    """ウィンドウを開いて描画領域ができるまでの時間の内訳を表示し、終了する（--startup-report）"""
+    import json
+    timings = {"imports": time.perf_counter() - _IMPORT_START}
+    start = time.perf_counter()
+    root = tk.Tk()
+    timings["tk_root"] = time.perf_counter() - start
+    start = time.perf_counter()
+    app = ContourEditorApp(root)
+    timings["setup_ui"] = time.perf_counter() - start
+    deferred = [name for name in ("matplotlib", "scipy", "svgwrite") if name not in sys.modules]
+    ui_ready = time.perf_counter()
+
+    def finish():
+        root.update_idletasks()
+        timings["total"] = time.perf_counter() - _IMPORT_START
+        report = {"timings": timings, "deferred_until_window": deferred,
+                  "frozen": bool(getattr(sys, "frozen", False))}
+        if not report["frozen"]:
+            report["imports_breakdown"] = import_time_breakdown()
+        if as_json:
+            print(json.dumps(report, ensure_ascii=False))
+        else:
+            for name, seconds in timings.items():
+                print(f"{name:16s} {seconds * 1000:8.1f} ms")
+            print(f"ウィンドウ表示まで読み込みを遅らせたモジュール: {', '.join(deferred) or 'なし'}")
+            for name, seconds in report.get("imports_breakdown", []):
+                print(f"  import {name:40s} {seconds * 1000:8.1f} ms")
+        root.destroy()
+
+    def on_stage(event):
+        if event["name"] == "create_canvases":
+            timings["window_mapped"] = app.profiler._origin + event["start"] - ui_ready
+            timings["create_canvases"] = event["duration"]
+            root.after_idle(finish)
+
+    app.profiler.listeners.append(on_stage)
+    root.mainloop()
+
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # 先読み用のワーカープロセスを実行ファイル化した環境でも起動できるように
+    if "--renderer" in sys.argv[:-1]:
+        os.environ["SVG_MAKER_RENDERER"] = sys.argv[sys.argv.index("--renderer") + 1]
+    if "--startup-report" in sys.argv:
+        run_startup_report(as_json="--json" in sys.argv)
+        sys.exit(0)
     root = tk.Tk()
     root.state('zoomed')
     app = ContourEditorApp(root)
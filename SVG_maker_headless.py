@@ -0,0 +1,187 @@
+"""ウィンドウを開かずにContourEditorAppの処理を実行するための補助
+
+tk変数・ルートウィンドウ・マウスイベントの代わりを用意し、描画はオフスクリーン（Agg）で行う。
+ベンチマークや編集履歴の一括再生で使う。
+"""
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from SVG_maker_cache import ResultCache
+from SVG_maker_core import PathIndex, PathPyramid, read_image
+from SVG_maker_documents import MemoryCache
+from SVG_maker_gui import ContourEditorApp
+from SVG_maker_journal import EditJournal
+from SVG_maker_profiler import StageProfiler
+from SVG_maker_raster import RENDERERS, OffscreenPanel
+
+# GUIの初期値と同じパラメータ
+DEFAULT_PARAMS = {
+    "gaussian_size": 15,
+    "canny1": 200,
+    "canny2": 300,
+    "extraction_mode": "contour",
+    "simplify_tolerance": 1.0,
+    "edge_method": "canny",
+    "pen_size": 10,
+    "max_redraw_fps": 0.0,
+    "cache_dir": None,  # 指定した場合のみ抽出結果のキャッシュを使う
+    "renderer": "matplotlib",
+}
+
+
+class HeadlessVar:
+    """tk変数の代わりに値を保持する（get/setのみ）"""
+
+    def __init__(self, value):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class HeadlessMaster:
+    """Tkのルートウィンドウの代わり（UI更新は何もしない、afterは run_due で実行）"""
+
+    def __init__(self):
+        self.scheduled = {}
+        self._next_id = 0
+
+    def update_idletasks(self):
+        pass
+
+    def after(self, delay_ms, callback):
+        self._next_id += 1
+        self.scheduled[self._next_id] = (time.perf_counter() + delay_ms / 1000, callback)
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.scheduled.pop(after_id, None)
+
+    def run_due(self):
+        """期限の来た予約を実行する"""
+        now = time.perf_counter()
+        for after_id, (due, callback) in sorted(self.scheduled.items(), key=lambda item: item[1][0]):
+            if due <= now:
+                del self.scheduled[after_id]
+                callback()
+
+
+class MouseEvent:
+    """matplotlibのマウスイベントの代わり"""
+
+    def __init__(self, x, y, button=1):
+        self.xdata = x
+        self.ydata = y
+        self.button = button
+
+
+def make_headless_editor(params=None):
+    """ウィンドウを作らずにContourEditorAppの処理を実行できるインスタンスを作成する"""
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    editor = ContourEditorApp.__new__(ContourEditorApp)
+    editor.master = HeadlessMaster()
+    editor.image = None
+    editor.contours = []
+    editor.smoothed_paths = []
+    editor.edge_points = []
+    editor.edge_distance_matrix = []
+    editor.manual_paths = []
+    editor.manual_edge_points = []
+    editor.h = editor.w = 0
+    editor.filename = ""
+    editor.gaussian_size = HeadlessVar(params["gaussian_size"])
+    editor.canny1 = HeadlessVar(params["canny1"])
+    editor.canny2 = HeadlessVar(params["canny2"])
+    editor.extraction_mode = HeadlessVar(params["extraction_mode"])
+    editor.simplify_tolerance = HeadlessVar(params["simplify_tolerance"])
+    editor.edge_method = HeadlessVar(params["edge_method"])
+    editor.pen_size = HeadlessVar(params["pen_size"])
+    editor.pen_size_display = HeadlessVar(str(params["pen_size"]))
+    editor.trajectory_threshold = HeadlessVar(0.3)
+    editor.neighbor_distance_factor = HeadlessVar(0.05)
+    editor.max_neighbors = HeadlessVar(4)
+    editor.undo_stack = []
+    editor.redo_stack = []
+    editor.path_topology = None
+    editor._topology_paths = None
+    editor._topology_count = 0
+    editor.path_pyramid = PathPyramid()
+    editor.path_index = PathIndex()
+    editor.selected_path_ids = set()
+    editor.selection_region = None
+    editor.edge_group_cache = None
+    editor.edge_calibration = None
+    editor.journal = EditJournal()
+    editor.result_cache = ResultCache(params["cache_dir"]) if params["cache_dir"] else None
+    editor.use_result_cache = HeadlessVar(bool(params["cache_dir"]))
+    editor._image_hash = None
+    editor.documents = []
+    editor.current_document = None
+    editor.memory_cache = MemoryCache()
+    editor.prefetcher = None
+    editor.drawing = False
+    editor.trace_points = []
+    editor.zoom_factor = 1.0
+    editor.pan_start = None
+    editor.view_xlim = None
+    editor.view_ylim = None
+    editor.panning = False
+    editor.min_zoom = 1.0
+    editor.redraw_suspended = False
+    editor.tool_mode = HeadlessVar("eraser")
+    editor.selection_shape = HeadlessVar("lasso")
+    editor.filter_dialog = None
+    editor.selected_edge = None
+    editor.status_text = HeadlessVar("")
+    editor.profiler = StageProfiler()
+    editor.show_timing = HeadlessVar(False)
+    editor.timing_text = HeadlessVar("")
+    editor.max_redraw_fps = HeadlessVar(params["max_redraw_fps"])
+    editor.redraw_pending_id = None
+    editor.pending_event_times = []
+    editor.last_redraw_time = 0.0
+    set_headless_renderer(editor, params["renderer"])
+    return editor
+
+
+def set_headless_renderer(editor, renderer):
+    """描画方式を切り替え、その方式の600x600画素のオフスクリーンのパネルを作る"""
+    if renderer not in RENDERERS:
+        raise ValueError(f"不明な描画方式です: {renderer}")
+    editor.renderer = renderer
+    editor._raster_image = None
+    editor._raster_image_key = None
+    for name in ("left", "center", "right"):
+        if renderer == "opencv":
+            setattr(editor, f"fig_{name}", None)
+            setattr(editor, f"ax_{name}", None)
+            setattr(editor, f"canvas_{name}", OffscreenPanel(600, 600))
+        else:
+            fig = Figure(figsize=(6, 6))
+            setattr(editor, f"fig_{name}", fig)
+            setattr(editor, f"ax_{name}", fig.add_subplot())
+            setattr(editor, f"canvas_{name}", FigureCanvasAgg(fig))
+
+
+def load_headless_image(editor, path):
+    """エッジ検出を行わずに画像だけを読み込む（読み込めなければFalse）"""
+    image = read_image(path)
+    if image is None:
+        return False
+    set_headless_image(editor, image, path)
+    return True
+
+
+def set_headless_image(editor, image, filename=""):
+    """読み込み済みの画像を編集対象にする（編集状態はリセット）"""
+    editor.filename = filename
+    editor.image = image
+    editor.h, editor.w = image.shape[:2]
+    editor.reset_editing_state()
@@ -0,0 +1,155 @@
+"""編集履歴（ジャーナル）の記録と再生
+
+輪郭抽出・消しゴム・ペン・クロージング・領域再抽出・端点接続・パスの一括フィルタ・選択したパスの削除の
+各操作を、画像の幅と高さで正規化した座標で記録する。縮小した画像で行った編集を、原寸の画像や別のパラメータで
+再抽出した結果に同じ操作として適用できる。
+
+使い方（ウィンドウを開かずに再生）:
+    python SVG_maker_journal.py edits.json original.png --output original.svg
+    python SVG_maker_journal.py edits.json original.png --canny1 80 --project original.svgproj
+"""
+import argparse
+import json
+import os
+import sys
+
+JOURNAL_VERSION = 1
+
+# 輪郭抽出の操作に記録するパラメータ
+EXTRACT_PARAMS = ("gaussian_size", "canny1", "canny2", "extraction_mode", "simplify_tolerance", "edge_method")
+
+
+class EditJournal:
+    """正規化座標で記録した編集操作の列"""
+
+    def __init__(self, operations=None):
+        self.operations = list(operations or [])
+
+    def __len__(self):
+        return len(self.operations)
+
+    def clear(self):
+        self.operations = []
+
+    def record(self, op, trace_points, width, height, size=None, endpoint_distance=None):
+        """軌跡による編集を記録（座標・ツールサイズ・端点の検索距離を画像サイズで正規化）"""
+        scale = max(width, height)
+        operation = {
+            "op": op,
+            "points": [[x / width, y / height] for x, y in trace_points],
+        }
+        if size is not None:
+            operation["size"] = size / scale
+        if endpoint_distance is not None:
+            operation["endpoint_distance"] = endpoint_distance / scale
+        self.operations.append(operation)
+
+    def record_extract(self, params):
+        """輪郭抽出（全体の再抽出）を記録"""
+        self.operations.append({"op": "extract", "params": {name: params[name] for name in EXTRACT_PARAMS}})
+
+    def record_join(self, distance, width, height):
+        """端点の一括接続を記録"""
+        self.operations.append({"op": "join_endpoints", "distance": distance / max(width, height)})
+
+    def record_paths(self, op, points, distance, width, height):
+        """選択したパスの削除（remove_paths）・保持（keep_paths）を記録（各パス上の1点と、再生時にパスを探す距離）"""
+        self.operations.append({
+            "op": op,
+            "points": [[x / width, y / height] for x, y in points],
+            "distance": distance / max(width, height),
+        })
+
+    def record_filter(self, action, criteria, width, height):
+        """パスの一括フィルタを記録（長さは画像サイズ、面積はその2乗、範囲は幅と高さで正規化）"""
+        scale = max(width, height)
+        normalized = {}
+        for name, value in criteria.items():
+            if name in ("min_length", "max_length"):
+                value = value / scale
+            elif name in ("min_area", "max_area"):
+                value = value / (scale * scale)
+            elif name == "region":
+                value = [[x / width, y / height] for x, y in value]
+            normalized[name] = value
+        self.operations.append({"op": "filter_paths", "action": action, "criteria": normalized})
+
+    @staticmethod
+    def filter_criteria(operation, width, height):
+        """記録した一括フィルタの条件を指定した画像サイズに戻す"""
+        scale = max(width, height)
+        criteria = {}
+        for name, value in operation["criteria"].items():
+            if name in ("min_length", "max_length"):
+                value = value * scale
+            elif name in ("min_area", "max_area"):
+                value = value * scale * scale
+            elif name == "region":
+                value = [(x * width, y * height) for x, y in value]
+            criteria[name] = value
+        return criteria
+
+    @staticmethod
+    def denormalize(operation, width, height):
+        """記録した操作の座標・サイズを指定した画像サイズに戻す (軌跡, ツールサイズ, 端点の検索距離)"""
+        scale = max(width, height)
+        points = [(x * width, y * height) for x, y in operation.get("points", [])]
+        size = operation["size"] * scale if "size" in operation else None
+        endpoint_distance = operation["endpoint_distance"] * scale if "endpoint_distance" in operation else None
+        return points, size, endpoint_distance
+
+    def to_dict(self):
+        return {"version": JOURNAL_VERSION, "operations": self.operations}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version", JOURNAL_VERSION) > JOURNAL_VERSION:
+            raise ValueError(f"未対応の編集履歴のバージョンです: {data['version']}")
+        return cls(data.get("operations", []))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def main(argv=None):
+    from SVG_maker_edges import EDGE_BACKENDS
+
+    parser = argparse.ArgumentParser(description="編集履歴を別の解像度の画像や別のパラメータで再生する")
+    parser.add_argument("journal", help="編集履歴のJSONファイル")
+    parser.add_argument("image", help="再生先の画像")
+    parser.add_argument("--output", help="SVGの出力先（省略時は画像と同じ名前の.svg）")
+    parser.add_argument("--project", help="再生結果をプロジェクトファイルにも保存する")
+    parser.add_argument("--gaussian-size", type=int)
+    parser.add_argument("--canny1", type=int)
+    parser.add_argument("--canny2", type=int)
+    parser.add_argument("--extraction-mode", choices=["contour", "centerline"])
+    parser.add_argument("--simplify-tolerance", type=float)
+    parser.add_argument("--edge-method", choices=list(EDGE_BACKENDS))
+    parser.add_argument("--cache-dir", help="抽出結果のキャッシュを使う場合の保存先")
+    args = parser.parse_args(argv)
+
+    from SVG_maker_headless import load_headless_image, make_headless_editor
+
+    overrides = {name: getattr(args, name) for name in EXTRACT_PARAMS if getattr(args, name) is not None}
+    editor = make_headless_editor({"cache_dir": args.cache_dir})
+    if not load_headless_image(editor, args.image):
+        print(f"画像を読み込めません: {args.image}", file=sys.stderr)
+        return 1
+    editor.replay_journal(EditJournal.load(args.journal), overrides)
+
+    output = args.output or os.path.splitext(args.image)[0] + ".svg"
+    editor.export_svg(output)
+    if args.project:
+        editor.export_project(args.project)
+    print(f"{len(editor.journal)}件の操作を再生しました: {len(editor.smoothed_paths)}パス -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
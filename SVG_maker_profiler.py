@@ -0,0 +1,192 @@
+"""処理段階ごとの計測（タイミングスパン・件数・Chromeトレース出力・cProfile）"""
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    """処理段階の所要時間と点数・パス数を記録する
+
+    span() で囲んだ区間を入れ子のイベントとして記録し、JSONまたは
+    Chromeトレース形式（chrome://tracing / Perfetto で表示可能）で書き出す。
+    arm_cprofile() を呼ぶと次の最上位スパン1回だけをcProfileで計測する。
+    """
+
+    def __init__(self, max_events=20000):
+        self.events = deque(maxlen=max_events)
+        self.last_root = None       # 直近に完了した最上位スパン
+        self.listeners = []         # 最上位スパン完了時に呼ばれる関数（引数はイベント）
+        self._depth = 0
+        self._origin = time.perf_counter()
+        self._cprofile_path = None
+        self.latency = LatencyHistogram()
+
+    @contextmanager
+    def span(self, name, **args):
+        """区間の所要時間を記録する（yieldした辞書に件数などを追加できる）"""
+        info = dict(args)
+        profile = None
+        if self._depth == 0 and self._cprofile_path:
+            profile = cProfile.Profile()
+            profile.enable()
+
+        depth = self._depth
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            end = time.perf_counter()
+            self._depth -= 1
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self._cprofile_path)
+                info["cprofile"] = self._cprofile_path
+                self._cprofile_path = None
+
+            event = {
+                "name": name,
+                "start": start - self._origin,
+                "duration": end - start,
+                "depth": depth,
+                "thread": threading.get_ident(),
+                "args": info,
+            }
+            self.events.append(event)
+            if depth == 0:
+                self.last_root = event
+                for listener in self.listeners:
+                    listener(event)
+
+    def arm_cprofile(self, output_path):
+        """次の最上位スパン1回だけをcProfileで計測し、統計を output_path に保存する"""
+        self._cprofile_path = output_path
+
+    @property
+    def cprofile_armed(self):
+        return self._cprofile_path is not None
+
+    def last_operation(self):
+        """直近の最上位スパンとその内側のスパンを開始順に返す"""
+        if self.last_root is None:
+            return []
+        root = self.last_root
+        root_end = root["start"] + root["duration"]
+        return sorted((event for event in self.events
+                       if event["start"] >= root["start"] and event["start"] + event["duration"] <= root_end
+                       and event["thread"] == root["thread"]),
+                      key=lambda event: (event["start"], event["depth"]))
+
+    def format_last_operation(self, max_items=6):
+        """直近の操作の所要時間を1行の文字列にする（ステータス表示用）"""
+        events = self.last_operation()
+        if not events:
+            return ""
+        root = events[0]
+        text = f"{root['name']} {root['duration'] * 1000:.0f}ms"
+        children = [event for event in events[1:] if event["depth"] == root["depth"] + 1]
+        if children:
+            text += " (" + ", ".join(f"{event['name']} {event['duration'] * 1000:.0f}ms"
+                                     for event in children[:max_items])
+            if len(children) > max_items:
+                text += ", …"
+            text += ")"
+        counts = {key: value for key, value in root["args"].items() if isinstance(value, int)}
+        if counts:
+            text += " " + " ".join(f"{key}={value}" for key, value in counts.items())
+        return text
+
+    def summary(self):
+        """スパン名ごとの回数・合計・最大・直近の所要時間（秒）を返す"""
+        stats = {}
+        for event in self.events:
+            item = stats.setdefault(event["name"], {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            item["count"] += 1
+            item["total"] += event["duration"]
+            item["max"] = max(item["max"], event["duration"])
+            item["last"] = event["duration"]
+        return stats
+
+    def write_json(self, path):
+        """集計とイベント一覧をJSONで保存する"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "latency": self.latency.to_dict(),
+                       "events": list(self.events)}, f, ensure_ascii=False, indent=2)
+
+    def write_chrome_trace(self, path):
+        """Chromeトレース形式（Trace Event Format）で保存する"""
+        pid = os.getpid()
+        trace_events = [{
+            "name": event["name"],
+            "ph": "X",
+            "ts": event["start"] * 1_000_000,
+            "dur": event["duration"] * 1_000_000,
+            "pid": pid,
+            "tid": event["thread"],
+            "args": event["args"],
+        } for event in self.events]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def clear(self):
+        self.events.clear()
+        self.last_root = None
+        self.latency.clear()
+
+
+class LatencyHistogram:
+    """イベント受信から描画完了までの遅延（秒）を対数刻みのビンに集計する"""
+
+    # ビンの上限（ms）。最後のビンはそれ以上すべて
+    BOUNDS_MS = (1, 2, 4, 8, 16, 33, 50, 100, 200, 500, 1000)
+
+    def __init__(self, max_samples=5000):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, latency):
+        latency_ms = latency * 1000
+        index = len(self.BOUNDS_MS)
+        for i, bound in enumerate(self.BOUNDS_MS):
+            if latency_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.samples.append(latency)
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def percentile(self, fraction):
+        """直近のサンプルから分位点（秒）を返す"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def format(self):
+        """ステータス表示用の1行の文字列"""
+        if not self.samples:
+            return ""
+        return (f"描画遅延 p50={self.percentile(0.5) * 1000:.0f}ms "
+                f"p95={self.percentile(0.95) * 1000:.0f}ms "
+                f"max={max(self.samples) * 1000:.0f}ms n={self.total}")
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}ms"]
+        return {
+            "histogram": dict(zip(labels, self.counts)),
+            "count": self.total,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+    def clear(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.samples.clear()
@@ -0,0 +1,130 @@
+"""編集セッションを保存・再開するためのプロジェクトファイル（.svgproj）
+
+ファイル構成（リトルエンディアン）:
+    マジック "SVGMKPRJ"(8) | バージョン uint32 | 予約 uint32 | メタデータ長 uint64
+    メタデータ（UTF-8のJSON）
+    配列データ（各配列の先頭は64バイト境界）
+メタデータには元画像の参照とハッシュ・パラメータ・各配列のdtype/shape/オフセットを記録する。
+配列はそのままの並びで書き出すため、読み込み時はメモリマップで開くだけで済む。
+"""
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+
+import numpy as np
+
+PROJECT_MAGIC = b"SVGMKPRJ"
+PROJECT_VERSION = 1
+PROJECT_EXTENSION = ".svgproj"
+_HEADER = struct.Struct("<8sIIQ")
+_ALIGN = 64
+
+
+class ProjectFormatError(ValueError):
+    """プロジェクトファイルとして読めない場合の例外"""
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    """ファイル内容のSHA-1（元画像の同一性確認用）"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pack_paths(paths, dtype=np.float64):
+    """パスのリストを (連結した点列(N,2), 各パスの開始位置(len+1,)) に詰める"""
+    offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    if not paths:
+        return np.zeros((0, 2), dtype=dtype), offsets
+    arrays = [np.asarray(path, dtype=dtype).reshape(-1, 2) for path in paths]
+    np.cumsum([len(array) for array in arrays], out=offsets[1:])
+    return np.concatenate(arrays), offsets
+
+
+def unpack_paths(points, offsets):
+    """pack_pathsの逆。各パスは points のビュー（コピーしない）"""
+    if len(offsets) < 2:
+        return []
+    return np.split(points, offsets[1:-1])
+
+
+def unpack_point_lists(points, offsets):
+    """pack_pathsの逆。各パスを (x, y) タプルのリストで返す（エディタ内部の形式）"""
+    all_points = list(zip(points[:, 0].tolist(), points[:, 1].tolist()))
+    bounds = offsets.tolist()
+    return [all_points[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _aligned(position):
+    return (position + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_project(path, meta, arrays):
+    """メタデータ（JSON化できる辞書）と名前付き配列をプロジェクトファイルに書き出す
+
+    書き込み途中で失敗しても既存のファイルを壊さないよう、一時ファイルに書いてから置き換える。
+    一時ファイルの名前はホスト・プロセス・スレッドごとに変え、同じファイルへの同時の書き込みが混ざらないようにする。
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # メタデータの長さが配列のオフセットに影響するため、オフセットが確定するまで繰り返す
+    layout = {}
+    meta_bytes = b""
+    for _ in range(4):
+        position = _aligned(_HEADER.size + len(meta_bytes))
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+            position = _aligned(position + array.nbytes)
+        new_bytes = json.dumps(dict(meta, arrays=layout), ensure_ascii=False).encode("utf-8")
+        if len(new_bytes) == len(meta_bytes):
+            break
+        meta_bytes = new_bytes
+
+    temp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(_HEADER.pack(PROJECT_MAGIC, PROJECT_VERSION, 0, len(meta_bytes)))
+            f.write(meta_bytes)
+            for name, array in arrays.items():
+                f.write(b"\0" * (layout[name]["offset"] - f.tell()))
+                array.tofile(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_project(path, mmap=True):
+    """プロジェクトファイルを読み、(メタデータ, {名前: 配列}) を返す
+
+    mmap=True の場合、配列はコピーオンライトのメモリマップ（書き換えてもファイルは変わらない）。
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ProjectFormatError("ヘッダーが短すぎます")
+        magic, version, _, meta_length = _HEADER.unpack(header)
+        if magic != PROJECT_MAGIC:
+            raise ProjectFormatError("プロジェクトファイルではありません")
+        if version > PROJECT_VERSION:
+            raise ProjectFormatError(f"未対応のバージョンです: {version}")
+        meta = json.loads(f.read(meta_length).decode("utf-8"))
+
+        arrays = {}
+        for name, spec in meta.get("arrays", {}).items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape, dtype=np.int64))
+            if mmap and count > 0:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="c", offset=spec["offset"], shape=shape)
+            else:
+                f.seek(spec["offset"])
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    return meta, arrays
@@ -0,0 +1,232 @@
+"""OpenCVで表示範囲を直接ラスタライズするパネル描画（matplotlibの代わりの描画方式）
+
+表示範囲をパネルの画素数のNumPy配列（RGB）に cv2.polylines / cv2.fillPoly などで描き、
+TkのPhotoImageに転送する。matplotlibのように点やパスごとの描画オブジェクトを作らないため、
+パス・点の数が多くても描画時間がほぼ点数に比例するだけで済む。
+
+座標の対応はmatplotlibの axis('equal') と同じく、表示範囲（view_xlim, view_ylim）を縦横比を保って
+パネルの中央に収める。マウスイベントは xdata・ydata・button を持つ PanelEvent に変換して、
+matplotlibのイベントと同じ処理関数（on_trace_press など）に渡す。
+
+GUIで使うには環境変数 SVG_MAKER_RENDERER=opencv を設定するか、--renderer opencv を付けて起動する。
+"""
+import tkinter as tk
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+RENDERERS = ("matplotlib", "opencv")
+SHIFT = 4                   # 座標を 1/16 画素の固定小数点で渡してアンチエイリアスを効かせる
+WHITE = (255, 255, 255)
+
+PanelEvent = namedtuple("PanelEvent", ["xdata", "ydata", "button"])
+
+
+class Viewport:
+    """画像座標と画面（パネルの画素）座標の対応"""
+
+    def __init__(self, xlim, ylim, width, height):
+        self.width = max(1, int(width))
+        self.height = max(1, int(height))
+        view_w = max(abs(xlim[1] - xlim[0]), 1e-6)
+        view_h = max(abs(ylim[1] - ylim[0]), 1e-6)
+        self.scale = min(self.width / view_w, self.height / view_h)  # 画像1画素あたりの画面の画素数
+        self.center = ((xlim[0] + xlim[1]) / 2, (ylim[0] + ylim[1]) / 2)
+
+    def to_screen(self, points):
+        """画像座標の (N, 2) 配列を画面座標に変換する"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return (points - self.center) * self.scale + (self.width / 2, self.height / 2)
+
+    def to_data(self, x, y):
+        """画面座標を画像座標に変換する"""
+        return ((x - self.width / 2) / self.scale + self.center[0],
+                (y - self.height / 2) / self.scale + self.center[1])
+
+    def visible_bounds(self):
+        """画面に映る画像座標の範囲 (x0, y0, x1, y1)"""
+        x0, y0 = self.to_data(0, 0)
+        x1, y1 = self.to_data(self.width, self.height)
+        return (x0, y0, x1, y1)
+
+
+def blank(viewport, color=WHITE):
+    buffer = np.empty((viewport.height, viewport.width, 3), dtype=np.uint8)
+    buffer[:] = color
+    return buffer
+
+
+def draw_image(buffer, viewport, image):
+    """BGR画像の表示範囲を拡大・縮小してRGBのバッファに描く（縮小は面積平均、拡大は最近傍）"""
+    h, w = image.shape[:2]
+    x0, y0, x1, y1 = viewport.visible_bounds()
+    cx0, cy0 = max(0, int(np.floor(x0))), max(0, int(np.floor(y0)))
+    cx1, cy1 = min(w, int(np.ceil(x1))), min(h, int(np.ceil(y1)))
+    if cx1 <= cx0 or cy1 <= cy0:
+        return buffer
+    (sx0, sy0), (sx1, sy1) = viewport.to_screen([(cx0, cy0), (cx1, cy1)])
+    dst_w, dst_h = max(1, int(round(sx1 - sx0))), max(1, int(round(sy1 - sy0)))
+    interpolation = cv2.INTER_AREA if viewport.scale < 1 else cv2.INTER_NEAREST
+    scaled = cv2.resize(image[cy0:cy1, cx0:cx1], (dst_w, dst_h), interpolation=interpolation)
+    # バッファからはみ出す分を切り落として貼り付ける
+    left, top = int(round(sx0)), int(round(sy0))
+    bx0, by0 = max(0, left), max(0, top)
+    bx1, by1 = min(viewport.width, left + dst_w), min(viewport.height, top + dst_h)
+    if bx1 > bx0 and by1 > by0:
+        region = scaled[by0 - top:by1 - top, bx0 - left:bx1 - left]
+        buffer[by0:by1, bx0:bx1] = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+    return buffer
+
+
+def draw_points(buffer, viewport, points, color, size=1):
+    """点を size 画素四方の正方形として描く（画面外の点は除く）"""
+    if len(points) == 0:
+        return buffer
+    screen = np.floor(viewport.to_screen(points)).astype(np.int64)
+    for dy in range(size):
+        for dx in range(size):
+            x = screen[:, 0] + dx - size // 2
+            y = screen[:, 1] + dy - size // 2
+            inside = (x >= 0) & (x < viewport.width) & (y >= 0) & (y < viewport.height)
+            buffer[y[inside], x[inside]] = color
+    return buffer
+
+
+def _screen_polylines(viewport, paths):
+    """パスのリストをまとめて画面座標の固定小数点の int32 配列のリストにする"""
+    arrays = [np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in paths]
+    arrays = [array for array in arrays if len(array)]
+    if not arrays:
+        return []
+    lengths = [len(array) for array in arrays]
+    screen = viewport.to_screen(np.concatenate(arrays)) * (1 << SHIFT)
+    # 極端に拡大したときにint32をはみ出さないよう画面の周囲に制限する
+    limit = (max(viewport.width, viewport.height) * 4) << SHIFT
+    screen = np.clip(np.rint(screen), -limit, limit).astype(np.int32)
+    return np.split(screen, np.cumsum(lengths)[:-1])
+
+
+def draw_polylines(buffer, viewport, paths, color, thickness=1):
+    """折れ線をまとめて描く（アンチエイリアスあり）"""
+    polylines = _screen_polylines(viewport, paths)
+    if polylines:
+        cv2.polylines(buffer, polylines, False, color, max(1, int(thickness)), cv2.LINE_AA, SHIFT)
+    return buffer
+
+
+def fill_evenodd(buffer, viewport, polygons, color, alpha=1.0):
+    """閉じたパスを偶奇規則で塗る（内側のパスは穴になり、その内側はまた塗られる）
+
+    cv2.fillPoly に全ポリゴンをまとめて渡すと偶奇規則で塗られるため、包含関係を調べる必要がない。
+    """
+    polylines = _screen_polylines(viewport, polygons)
+    if not polylines:
+        return buffer
+    mask = np.zeros(buffer.shape[:2], dtype=np.uint8)
+    cv2.fillPoly(mask, polylines, 255, cv2.LINE_8, SHIFT)
+    inside = mask > 0
+    if alpha >= 1.0:
+        buffer[inside] = color
+    else:
+        blended = buffer[inside] * (1.0 - alpha) + np.array(color, dtype=np.float64) * alpha
+        buffer[inside] = blended.astype(np.uint8)
+    return buffer
+
+
+def blend_polyline(buffer, viewport, points, color, thickness, alpha):
+    """半透明の太い折れ線（ツールの軌跡）を描く"""
+    overlay = buffer.copy()
+    polylines = _screen_polylines(viewport, [points])
+    if not polylines:
+        return buffer
+    cv2.polylines(overlay, polylines, False, color, max(1, int(round(thickness))), cv2.LINE_AA, SHIFT)
+    cv2.addWeighted(overlay, alpha, buffer, 1.0 - alpha, 0, dst=buffer)
+    return buffer
+
+
+def draw_rectangle(buffer, viewport, start, end, color, dash=6):
+    """2点を対角とする破線の矩形を描く"""
+    (x0, y0), (x1, y1) = np.rint(viewport.to_screen([start, end])).astype(int)
+    corners = [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]
+    for (ax, ay), (bx, by) in zip(corners, corners[1:]):
+        length = max(abs(bx - ax), abs(by - ay))
+        for offset in range(0, length, dash * 2):
+            t0, t1 = offset / length, min(offset + dash, length) / length
+            cv2.line(buffer, (int(ax + (bx - ax) * t0), int(ay + (by - ay) * t0)),
+                     (int(ax + (bx - ax) * t1), int(ay + (by - ay) * t1)), color, 1)
+    return buffer
+
+
+def draw_marker(buffer, viewport, point, color, edge_color, radius=4):
+    """選択中の点の印（縁取りした円）を描く"""
+    (x, y), = np.rint(viewport.to_screen([point])).astype(int)
+    cv2.circle(buffer, (int(x), int(y)), radius, color, -1, cv2.LINE_AA)
+    cv2.circle(buffer, (int(x), int(y)), radius, edge_color, 1, cv2.LINE_AA)
+    return buffer
+
+
+def ppm_data(buffer):
+    """RGBのバッファをTkのPhotoImageが読めるPPM形式のバイト列にする"""
+    h, w = buffer.shape[:2]
+    return b"P6 %d %d 255 " % (w, h) + np.ascontiguousarray(buffer).tobytes()
+
+
+class OffscreenPanel:
+    """画面に表示しないパネル（ヘッドレス実行とベンチマーク用、最後に描いたバッファを保持する）"""
+
+    def __init__(self, width=600, height=600):
+        self.width = width
+        self.height = height
+        self.buffer = None
+        self.viewport = None
+
+    def show(self, buffer, viewport):
+        self.buffer = buffer
+        self.viewport = viewport
+
+
+class RasterPanel:
+    """描画済みのバッファを表示するTkのCanvasと、マウス操作のPanelEventへの変換"""
+
+    def __init__(self, master, on_press, on_motion, on_release, on_scroll, on_resize=None):
+        self.widget = tk.Canvas(master, background="white", highlightthickness=0)
+        self.width = self.height = 1
+        self.viewport = None        # 最後に描画したときの座標の対応（イベントの座標変換に使う）
+        self._photo = None
+        self._item = self.widget.create_image(0, 0, anchor="nw")
+        self._on_resize = on_resize
+        self.widget.bind("<ButtonPress>", lambda e: self._press(e, on_press, on_scroll))
+        self.widget.bind("<Motion>", lambda e: on_motion(self._event(e, None)))
+        self.widget.bind("<ButtonRelease>", lambda e: self._release(e, on_release))
+        # Windows・macOSのホイール（Linuxはボタン4・5として届く）
+        self.widget.bind("<MouseWheel>", lambda e: on_scroll(self._event(e, "up" if e.delta > 0 else "down")))
+        self.widget.bind("<Configure>", self._configure)
+
+    def _event(self, tk_event, button):
+        if self.viewport is None:
+            return PanelEvent(None, None, button)
+        x, y = self.viewport.to_data(tk_event.x, tk_event.y)
+        return PanelEvent(x, y, button)
+
+    def _press(self, tk_event, on_press, on_scroll):
+        if tk_event.num in (4, 5):
+            on_scroll(self._event(tk_event, "up" if tk_event.num == 4 else "down"))
+        else:
+            on_press(self._event(tk_event, tk_event.num))
+
+    def _release(self, tk_event, on_release):
+        if tk_event.num not in (4, 5):
+            on_release(self._event(tk_event, tk_event.num))
+
+    def _configure(self, tk_event):
+        if (tk_event.width, tk_event.height) == (self.width, self.height):
+            return
+        self.width, self.height = tk_event.width, tk_event.height
+        if self._on_resize is not None:
+            self._on_resize()
+
+    def show(self, buffer, viewport):
+        self.viewport = viewport
+        self._photo = tk.PhotoImage(data=ppm_data(buffer), format="PPM")
+        self.widget.itemconfigure(self._item, image=self._photo)
@@ -0,0 +1,266 @@
+"""動画・連番画像のベクター化（前のフレームから変わった範囲だけを再抽出）
+
+1フレーム目は全体を輪郭抽出し、以降のフレームは各範囲を最後に抽出したときの画像との差分から変化した範囲の
+矩形を求めて、その範囲だけを領域再抽出（GUIの「領域再抽出」と同じ処理）する。範囲にかかるパスは範囲の境界で
+切らないよう、範囲をそのパスの外接矩形まで広げてから抽出し直す。変化のない範囲のパスはそのまま引き継ぎ、
+変化のないフレームは前のフレームのSVGを使い回す。変化した面積が大きい（場面転換など）フレームは全体を抽出し直す。
+少しずつの変化も、抽出し直すまで差分が積み重なるため、しきい値を超えた時点で再抽出される。
+
+フレームの読み込み・抽出・SVGの書き出しはそれぞれ別のスレッドで並行して行う。
+
+使い方:
+    python SVG_maker_sequence.py movie.mp4 --output-dir svg/
+    python SVG_maker_sequence.py "frames/*.png" --output-dir svg/ --canny1 80 --canny2 160
+    python SVG_maker_sequence.py frames/ --output-dir svg/ --pattern "scene_%04d.svg" --report report.json
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from SVG_maker_core import read_image, write_svg
+from SVG_maker_edges import DEFAULT_EDGE_METHOD, EDGE_BACKENDS
+from SVG_maker_journal import EXTRACT_PARAMS
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+_END = object()  # キューの終わりの印
+
+
+def iter_frames(source):
+    """動画ファイル・連番画像のglob・画像のディレクトリから (番号, フレーム) を順に返す"""
+    if any(char in source for char in "*?["):
+        paths = sorted(glob.glob(source))
+    elif os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+    else:
+        paths = None
+
+    if paths is not None:
+        for index, path in enumerate(paths):
+            frame = read_image(path)
+            if frame is None:
+                raise ValueError(f"画像を読み込めません: {path}")
+            yield index, frame
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"動画を開けません: {source}")
+    try:
+        index = 0
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield index, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def changed_regions(previous, current, threshold=8, tile=32):
+    """2枚のグレースケール画像の差分から変化した範囲の矩形 (x0, y0, x1, y1) のリストと変化した面積の割合を返す
+
+    画素の差を tile 画素四方のタイルにまとめ、隣接する変化タイルを1つの矩形にする。
+    ブラーやCannyの影響が境界の外へ及ぶ分を含めるため、変化タイルの周囲1タイルも範囲に含める。
+    """
+    h, w = current.shape
+    changed = cv2.absdiff(previous, current) > threshold
+    rows, cols = -(-h // tile), -(-w // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:h, :w] = changed
+    tiles = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3)).astype(np.uint8)
+    if not tiles.any():
+        return [], 0.0
+    tiles = cv2.dilate(tiles, np.ones((3, 3), dtype=np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(tiles, connectivity=8)
+    regions = []
+    covered = np.zeros_like(tiles)  # 矩形が重なる場合も面積を二重に数えないようタイル上で塗る
+    for x, y, width, height, _ in stats[1:count]:
+        covered[y:y + height, x:x + width] = 1
+        regions.append((int(x * tile), int(y * tile), int(min(w, (x + width) * tile)), int(min(h, (y + height) * tile))))
+    return regions, float(covered.mean())
+
+
+def grow_to_paths(editor, rect):
+    """矩形 (x0, y0, x1, y1) にかかる自動抽出パスの外接矩形をすべて含むまで矩形を広げる
+
+    領域再抽出は範囲をまたぐパスを範囲の境界で切るため、かかるパスごと抽出し直して断片が増えないようにする。
+    手動パスは領域再抽出で置き換わらないため広げる対象にしない。
+    """
+    index = editor.get_path_index()
+    manual_ids = {id(path) for path in editor.manual_paths}
+    x0, y0, x1, y1 = rect
+    while True:
+        hits = [i for i in index.query((x0, y0, x1, y1)) if id(index.paths[i]) not in manual_ids]
+        if not hits:
+            return x0, y0, x1, y1
+        boxes = index.bboxes[hits]
+        grown = (max(0, min(x0, int(np.floor(boxes[:, 0].min())))), max(0, min(y0, int(np.floor(boxes[:, 1].min())))),
+                 min(editor.w, max(x1, int(np.ceil(boxes[:, 2].max())) + 1)),
+                 min(editor.h, max(y1, int(np.ceil(boxes[:, 3].max())) + 1)))
+        if grown == (x0, y0, x1, y1):
+            return grown
+        x0, y0, x1, y1 = grown
+
+
+def _run_thread(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def vectorize_sequence(source, output_dir, params=None, pattern="frame_%05d.svg", threshold=8, tile=32,
+                       full_ratio=0.5, queue_size=4):
+    """フレームを順にベクター化してSVGの連番を書き出し、フレームごとの記録のリストを返す"""
+    from SVG_maker_headless import make_headless_editor, set_headless_image
+
+    os.makedirs(output_dir, exist_ok=True)
+    editor = make_headless_editor(params)
+    editor.redraw_suspended = True
+    tolerance = editor.get_simplify_tolerance()
+
+    frames = queue.Queue(maxsize=queue_size)
+    outputs = queue.Queue(maxsize=queue_size)
+    errors = []
+    records = {}
+
+    def read_frames():
+        try:
+            for index, frame in iter_frames(source):
+                start = time.perf_counter()
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                frames.put((index, frame, gray, time.perf_counter() - start))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            frames.put(_END)
+
+    def write_outputs():
+        previous_text = None
+        while True:
+            item = outputs.get()
+            if item is _END:
+                return
+            index, paths, width, height, reuse = item
+            start = time.perf_counter()
+            path = os.path.join(output_dir, pattern % index)
+            try:
+                if reuse and previous_text is not None:
+                    # 変化のないフレームは前のフレームのSVGをそのまま書く
+                    with open(path, "wb") as f:
+                        f.write(previous_text)
+                else:
+                    write_svg(paths, width, height, path, tolerance)
+                    with open(path, "rb") as f:
+                        previous_text = f.read()
+            except Exception as e:
+                errors.append(e)
+            records[index]["write"] = time.perf_counter() - start
+
+    reader = _run_thread(read_frames)
+    writer = _run_thread(write_outputs)
+    reference_gray = None  # 各範囲を最後に抽出したときのグレースケール画像
+    try:
+        while True:
+            item = frames.get()
+            if item is _END:
+                break
+            index, frame, gray, decode_seconds = item
+            start = time.perf_counter()
+            if reference_gray is None or reference_gray.shape != gray.shape:
+                regions, ratio = None, 1.0
+            else:
+                regions, ratio = changed_regions(reference_gray, gray, threshold, tile)
+
+            if regions is None or ratio >= full_ratio:
+                mode = "full"
+                set_headless_image(editor, frame)
+                editor.update_edges()
+                reference_gray = gray.copy()
+            elif regions:
+                mode = "partial"
+                editor.image = frame
+                for region in regions:
+                    x0, y0, x1, y1 = grow_to_paths(editor, region)
+                    editor.reextract_region((x0, y0), (x1 - 1, y1 - 1))
+                    reference_gray[y0:y1, x0:x1] = gray[y0:y1, x0:x1]
+            else:
+                mode = "reuse"
+                editor.image = frame
+
+            records[index] = {"frame": index, "mode": mode, "regions": len(regions or []), "changed": ratio,
+                              "paths": len(editor.smoothed_paths), "decode": decode_seconds,
+                              "extract": time.perf_counter() - start}
+            # パスのリストは編集のたびに作り直されるため、書き出し側へはその時点のリストを渡せばよい
+            outputs.put((index, list(editor.smoothed_paths), editor.w, editor.h, mode == "reuse"))
+    finally:
+        outputs.put(_END)
+        writer.join()
+        # 読み込み側が満杯のキューで止まらないよう残りを捨ててから待つ
+        while reader.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join()
+    if errors:
+        raise errors[0]
+    return [records[index] for index in sorted(records)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="動画・連番画像を前のフレームからの差分だけ再抽出してSVGの連番にする")
+    parser.add_argument("source", help="動画ファイル、連番画像のglob（\"frames/*.png\"）、または画像のディレクトリ")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--pattern", default="frame_%05d.svg", help="出力ファイル名（%%d にフレーム番号）")
+    parser.add_argument("--gaussian-size", type=int, default=15)
+    parser.add_argument("--canny1", type=int, default=200)
+    parser.add_argument("--canny2", type=int, default=300)
+    parser.add_argument("--extraction-mode", choices=["contour", "centerline"], default="contour")
+    parser.add_argument("--simplify-tolerance", type=float, default=1.0)
+    parser.add_argument("--edge-method", choices=list(EDGE_BACKENDS), default=DEFAULT_EDGE_METHOD)
+    parser.add_argument("--threshold", type=int, default=8, help="変化とみなす画素値の差")
+    parser.add_argument("--tile", type=int, default=32, help="変化範囲をまとめるタイルの大きさ（画素）")
+    parser.add_argument("--full-ratio", type=float, default=0.5,
+                        help="変化した面積の割合がこれ以上なら全体を抽出し直す")
+    parser.add_argument("--report", help="フレームごとの記録をJSONで保存する")
+    args = parser.parse_args(argv)
+
+    params = {name: getattr(args, name) for name in EXTRACT_PARAMS}
+    start = time.perf_counter()
+    try:
+        records = vectorize_sequence(args.source, args.output_dir, params, args.pattern,
+                                     args.threshold, args.tile, args.full_ratio)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    modes = {mode: sum(1 for record in records if record["mode"] == mode) for mode in ("full", "partial", "reuse")}
+    summary = {
+        "frames": len(records),
+        "seconds": elapsed,
+        "fps": len(records) / elapsed if elapsed > 0 else 0.0,
+        "modes": modes,
+        "median_extract": statistics.median(record["extract"] for record in records) if records else 0.0,
+    }
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "summary": summary, "frames": records}, f, ensure_ascii=False, indent=2)
+    print(f"{len(records)}フレーム {elapsed:.2f}秒（全体抽出{modes['full']} / 部分再抽出{modes['partial']} / "
+          f"使い回し{modes['reuse']}） -> {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""常駐型の変換サーバー（localhostのHTTPまたはUnixソケット）
+
+起動時にワーカープロセスを立ち上げてOpenCV・matplotlib・SciPyの読み込みを済ませておき、
+画像ごとの起動コストなしにGUIと同じ処理（update_edges → SVG書き出し）で変換する。
+
+    python SVG_maker_server.py --port 8765 --workers 4 --max-queue 16
+    curl --data-binary @input.png "http://127.0.0.1:8765/convert?canny1=80&canny2=160" -o output.svg
+    curl http://127.0.0.1:8765/metrics
+
+POST /convert   本文に画像ファイルのバイト列、クエリにパラメータ。SVGを返す
+GET  /metrics   待ち行列の長さ・処理中の件数・段階ごとの所要時間（p50/p95）などのJSON
+GET  /health    ワーカーが起動していれば200
+処理中と待ち行列の合計が上限に達している間は503（Retry-After付き）を返してすぐに断り、
+--timeout 秒以内に終わらなければ504を返す。
+"""
+import argparse
+import json
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from SVG_maker_profiler import LatencyHistogram
+
+# クエリで指定できるパラメータと型
+PARAM_TYPES = {
+    "gaussian_size": int,
+    "canny1": int,
+    "canny2": int,
+    "extraction_mode": str,
+    "simplify_tolerance": float,
+    "edge_method": str,
+}
+# 数値のパラメータの範囲（最小, 最大）。範囲外の値はワーカーで cv2.error になるため受け付けない
+PARAM_RANGES = {
+    "gaussian_size": (0, 255),
+    "canny1": (0, None),
+    "canny2": (0, None),
+    "simplify_tolerance": (0.0, None),
+}
+MAX_BODY_BYTES = 256 * 1024 * 1024
+
+_editor = None  # ワーカープロセスごとのヘッドレスエディタ
+
+
+def _init_worker(cache_dir):
+    """ワーカープロセスの初期化（重いモジュールの読み込みとエディタの作成をここで済ませる）"""
+    global _editor
+    from SVG_maker_headless import make_headless_editor
+    _editor = make_headless_editor({"cache_dir": cache_dir})
+    _editor.redraw_suspended = True
+
+
+def _ping():
+    return os.getpid()
+
+
+def _convert(data, params):
+    """ワーカープロセスで1枚を変換し、(SVG文字列, {段階名: 秒}, 件数) を返す"""
+    import cv2
+    import numpy as np
+    from SVG_maker_headless import DEFAULT_PARAMS, set_headless_image
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("画像として読み込めません")
+    # 前の要求のパラメータが残らないよう、指定のないものは既定値に戻す
+    for name in PARAM_TYPES:
+        getattr(_editor, name).set(params.get(name, DEFAULT_PARAMS[name]))
+    set_headless_image(_editor, image)
+    _editor.update_edges()
+    stages = {event["name"]: event["duration"] for event in _editor.profiler.last_operation()
+              if event["depth"] <= 1}
+    svg_text = _editor.export_svg_text()
+    stages["save_svg"] = _editor.profiler.last_root["duration"]
+    return svg_text, stages, {"paths": len(_editor.smoothed_paths), "width": _editor.w, "height": _editor.h}
+
+
+class ServerBusy(Exception):
+    """処理中と待ち行列の合計が上限に達している"""
+
+
+class ConversionService:
+    """ワーカープールと上限付きの待ち行列・計測値をまとめる"""
+
+    def __init__(self, workers=2, max_queue=8, timeout=60.0, cache_dir=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,))
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.outstanding = 0          # 受け付けてまだ終わっていない件数（時間切れで応答済みのものも含む）
+        self.counters = Counter()
+        self.stage_latency = defaultdict(LatencyHistogram)
+        self.request_latency = LatencyHistogram()
+        self.started = time.time()
+
+    def warm_up(self):
+        """全ワーカーを起動して初期化を済ませる"""
+        for future in [self.executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, data, params):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise ServerBusy()
+        with self._lock:
+            self.outstanding += 1
+            self.counters["accepted"] += 1
+        try:
+            future = self.executor.submit(_convert, data, params)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _release(self):
+        with self._lock:
+            self.outstanding -= 1
+        self._slots.release()
+
+    def _on_done(self, future):
+        # 時間切れで先に応答した要求も、ワーカーが空くまでは枠を占有したままにする
+        self._release()
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, stages, _ = future.result()
+        with self._lock:
+            for stage, seconds in stages.items():
+                self.stage_latency[stage].add(seconds)
+
+    def convert(self, data, params):
+        """変換して (SVG文字列, 件数) を返す（ServerBusy / TimeoutError / ValueError を送出）"""
+        start = time.perf_counter()
+        future = self.submit(data, params)
+        try:
+            svg_text, _, counts = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise TimeoutError(f"{self.timeout}秒以内に変換が終わりませんでした")
+        except Exception:
+            with self._lock:
+                self.counters["failed"] += 1
+            raise
+        with self._lock:
+            self.counters["completed"] += 1
+            self.request_latency.add(time.perf_counter() - start)
+        return svg_text, counts
+
+    def metrics(self):
+        with self._lock:
+            outstanding = self.outstanding
+            return {
+                "workers": self.workers,
+                "capacity": self.workers + self.max_queue,
+                "in_flight": min(outstanding, self.workers),
+                "queue_depth": max(0, outstanding - self.workers),
+                "counters": dict(self.counters),
+                "uptime_seconds": time.time() - self.started,
+                "request_latency": self.request_latency.to_dict(),
+                "stage_latency": {stage: histogram.to_dict() for stage, histogram in self.stage_latency.items()},
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_params(query):
+    """クエリ文字列から変換パラメータを取り出す（不正な値はValueError）"""
+    params = {}
+    for name, values in parse_qs(query).items():
+        if name not in PARAM_TYPES:
+            raise ValueError(f"不明なパラメータです: {name}")
+        params[name] = PARAM_TYPES[name](values[-1])
+        if name in PARAM_RANGES:
+            low, high = PARAM_RANGES[name]
+            value = params[name]
+            if not math.isfinite(value) or value < low or (high is not None and value > high):
+                limit = f"{low}以上" + (f"{high}以下" if high is not None else "")
+                raise ValueError(f"{name} は{limit}の値を指定してください: {values[-1]}")
+    if params.get("extraction_mode", "contour") not in ("contour", "centerline"):
+        raise ValueError(f"不明な抽出方式です: {params['extraction_mode']}")
+    if "edge_method" in params:
+        from SVG_maker_edges import get_backend
+        get_backend(params["edge_method"])
+    return params
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SVGMaker/1"
+
+    def address_string(self):
+        # Unixソケットでは接続元アドレスが文字列になる
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False)
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self._send(200, self.server.service.metrics())
+        elif path == "/health":
+            self._send(200, {"status": "ok"})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            self._send(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send(400, {"error": "画像のバイト列を本文に指定してください"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": "画像が大きすぎます"})
+            return
+        try:
+            params = parse_params(url.query)
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        data = self.rfile.read(length)
+
+        try:
+            svg_text, counts = self.server.service.convert(data, params)
+        except ServerBusy:
+            self._send(503, {"error": "混雑しています"}, headers={"Retry-After": "1"})
+        except TimeoutError as e:
+            self._send(504, {"error": str(e)})
+        except ValueError as e:
+            self._send(422, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            self._send(200, svg_text, "image/svg+xml; charset=utf-8",
+                       {"X-Paths": str(counts["paths"]), "X-Image-Size": f"{counts['width']}x{counts['height']}"})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host="127.0.0.1", port=8765, unix_socket=None, verbose=False):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, ConversionRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ConversionRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="常駐型の変換サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", help="TCPの代わりにUnixソケットで待ち受ける")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--max-queue", type=int, default=16, help="処理中以外に待たせる要求の上限")
+    parser.add_argument("--timeout", type=float, default=60.0, help="1件あたりの時間切れ（秒）")
+    parser.add_argument("--cache-dir", help="抽出結果のキャッシュの保存先")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    service = ConversionService(args.workers, args.max_queue, args.timeout, args.cache_dir)
+    service.warm_up()
+    server = make_server(service, args.host, args.port, args.unix_socket, args.verbose)
+    where = args.unix_socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"変換サーバーを起動しました: {where}（ワーカー{args.workers}、待ち行列{args.max_queue}）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
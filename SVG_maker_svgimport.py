@@ -0,0 +1,461 @@
+"""SVGファイルの読み込み（パスを編集可能な手動パスとして取り込む）
+
+XMLを木として組み立てずにexpatのイベントで先頭から順に読み、<path> の d 属性と
+<polyline> <polygon> <line> <rect> <circle> <ellipse> を折れ線に変換する。メモリ使用量は
+取り込んだ点の数にほぼ比例し、ファイルの大きさにはよらない。
+
+d 属性は M/L/H/V/C/S/Q/T/Z（絶対・相対）に対応し、曲線は指定の許容誤差（画素）以内の折れ線にする。
+円弧（A）は終点への直線として扱う。このツールが書き出すSVG（M と L だけのパス）は
+数値をまとめて配列に変換する速い経路で読む。transform 属性（matrix/translate/scale/rotate/skewX/skewY）と
+ルートの viewBox を適用し、<defs> などの描画されない要素の中身は取り込まない。
+
+使い方:
+    python SVG_maker_svgimport.py drawing.svg
+    python SVG_maker_svgimport.py drawing.svg --image original.png --project drawing.svgproj
+"""
+import argparse
+import math
+import os
+import re
+import sys
+import time
+import xml.parsers.expat
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_TOLERANCE = 0.25    # 曲線を折れ線にするときの許容誤差（画素）
+READ_CHUNK = 1 << 20
+BATCH_PATHS = 4096          # M と L だけのパスをまとめて数値に変換する単位
+
+SVGDocument = namedtuple("SVGDocument", ["width", "height", "paths"])
+
+_TOKEN = re.compile(r"[A-Za-z]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_NEXT_TOKEN = re.compile(r"[\s,]*(?:([A-Za-z])|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?))")
+_FLAG = re.compile(r"[\s,]*([01])")
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_SIMPLE_SUBPATH = re.compile(r"^\s*M[\d\s,.eE+-]*(?:L[\d\s,.eE+-]*)*[Zz]?\s*$")
+_LINE_SEPARATORS = str.maketrans("ML,", "   ")
+_LINE_ONLY = str.maketrans("", "", "0123456789.,eE+- \t\r\nL")
+_SKIPPED = {"defs", "clipPath", "mask", "marker", "pattern", "symbol", "metadata", "title", "desc", "style"}
+_IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+_PARAMETER_COUNTS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0}
+
+
+def _numbers(text):
+    return [float(value) for value in _NUMBER.findall(text or "")]
+
+
+def _length(text, default=None):
+    """長さの属性を数値にする（単位は画素とみなし、%などの解釈できない値は default）"""
+    match = _NUMBER.match((text or "").strip())
+    if match is None or (text or "").strip().endswith("%"):
+        return default
+    return float(match.group())
+
+
+def multiply(m1, m2):
+    """アフィン変換 (a, b, c, d, e, f) の合成（m2 を適用してから m1）"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2, a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+def parse_transform(text):
+    """transform 属性をアフィン変換 (a, b, c, d, e, f) にする"""
+    matrix = _IDENTITY
+    for name, arguments in _TRANSFORM.findall(text or ""):
+        values = _numbers(arguments)
+        if name == "matrix" and len(values) == 6:
+            step = tuple(values)
+        elif name == "translate" and values:
+            step = (1.0, 0.0, 0.0, 1.0, values[0], values[1] if len(values) > 1 else 0.0)
+        elif name == "scale" and values:
+            step = (values[0], 0.0, 0.0, values[1] if len(values) > 1 else values[0], 0.0, 0.0)
+        elif name == "rotate" and values:
+            angle = math.radians(values[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            step = (cos, sin, -sin, cos, 0.0, 0.0)
+            if len(values) == 3:
+                cx, cy = values[1], values[2]
+                step = multiply(multiply((1.0, 0.0, 0.0, 1.0, cx, cy), step), (1.0, 0.0, 0.0, 1.0, -cx, -cy))
+        elif name == "skewX" and values:
+            step = (1.0, 0.0, math.tan(math.radians(values[0])), 1.0, 0.0, 0.0)
+        elif name == "skewY" and values:
+            step = (1.0, math.tan(math.radians(values[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        matrix = multiply(matrix, step)
+    return matrix
+
+
+def _segments(degree, second_difference, tolerance):
+    """次数 degree のベジェ曲線を誤差 tolerance 以内に収める分割数（Wangの公式）"""
+    if second_difference <= 0:
+        return 1
+    return max(1, int(math.ceil(math.sqrt(degree * (degree - 1) / 8 * second_difference / tolerance))))
+
+
+def _flatten_cubic(points, x0, y0, x1, y1, x2, y2, x3, y3, tolerance):
+    difference = max(math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2), math.hypot(x1 - 2 * x2 + x3, y1 - 2 * y2 + y3))
+    n = _segments(3, difference, tolerance)
+    for i in range(1, n + 1):
+        t = i / n
+        s = 1 - t
+        a, b, c, d = s * s * s, 3 * s * s * t, 3 * s * t * t, t * t * t
+        points.append((a * x0 + b * x1 + c * x2 + d * x3, a * y0 + b * y1 + c * y2 + d * y3))
+
+
+def _flatten_quadratic(points, x0, y0, x1, y1, x2, y2, tolerance):
+    n = _segments(2, math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2), tolerance)
+    for i in range(1, n + 1):
+        t = i / n
+        s = 1 - t
+        a, b, c = s * s, 2 * s * t, t * t
+        points.append((a * x0 + b * x1 + c * x2, a * y0 + b * y1 + c * y2))
+
+
+def _parse_simple(d):
+    """絶対座標の M/L/Z だけのパスを数値の一括変換で読む"""
+    subpaths = []
+    for part in re.split(r"(?=M)", d):
+        if not part.strip():
+            continue
+        closed = part.rstrip()[-1] in "Zz"
+        values = np.array(_NUMBER.findall(part), dtype=np.float64)
+        if len(values) < 2:
+            continue
+        points = values[:len(values) // 2 * 2].reshape(-1, 2)
+        if closed and len(points) > 1 and not np.array_equal(points[0], points[-1]):
+            points = np.vstack([points, points[:1]])
+        subpaths.append(points)
+    return subpaths
+
+
+def _parse_line_batch(ds):
+    """M 1つと L だけの絶対座標の d 属性の列をまとめて1回で数値に変換する（形式が合わなければNone）"""
+    counts = [d.count("L") + 1 for d in ds]
+    try:
+        values = np.array(" ".join(ds).translate(_LINE_SEPARATORS).split(), dtype=np.float64)
+    except ValueError:
+        return None
+    if len(values) != 2 * sum(counts):  # L の後に座標が複数続く書き方など
+        return None
+    return np.split(values.reshape(-1, 2), np.cumsum(counts)[:-1])
+
+
+def _path_tokens(d):
+    """d 属性をコマンドの文字と数値の字句に分ける（円弧のフラグは区切りのない「0110」のような書き方も1文字ずつ読む）"""
+    if "a" not in d and "A" not in d:
+        return _TOKEN.findall(d)
+    tokens = []
+    command = ""
+    index = 0   # コマンドの文字からの数値の番号
+    position = 0
+    length = len(d)
+    while position < length:
+        if command in "Aa" and index % 7 in (3, 4):
+            match = _FLAG.match(d, position)
+            if match:
+                tokens.append(match.group(1))
+                index += 1
+                position = match.end()
+                continue
+        match = _NEXT_TOKEN.match(d, position)
+        if match is None:
+            position += 1   # 解釈できない文字は読み飛ばす
+            continue
+        position = match.end()
+        if match.group(1):
+            command = match.group(1)
+            index = 0
+            tokens.append(command)
+        elif match.group(2):
+            index += 1
+            tokens.append(match.group(2))
+    return tokens
+
+
+def parse_path_data(d, tolerance=DEFAULT_TOLERANCE):
+    """d 属性を折れ線（(N, 2) の配列）のリストにする（閉じたパスは始点を末尾にも加える）"""
+    if _SIMPLE_SUBPATH.match(d) or all(_SIMPLE_SUBPATH.match(part) for part in re.split(r"(?=M)", d) if part.strip()):
+        return _parse_simple(d)
+
+    tokens = _path_tokens(d)
+    subpaths = []
+    points = []
+    x = y = start_x = start_y = 0.0
+    control_x = control_y = None     # S/T で反転する直前の制御点
+    previous = ""
+    command = None
+    i = 0
+    count = len(tokens)
+    while i < count:
+        token = tokens[i]
+        if token.isalpha():
+            command = token
+            i += 1
+            if command in "Zz":
+                if points:
+                    if points[-1] != (start_x, start_y):
+                        points.append((start_x, start_y))
+                    subpaths.append(points)
+                    points = []
+                x, y = start_x, start_y
+                previous = "Z"
+                command = None  # Z の後に続く数値は不正な書き方なので読み飛ばす
+                continue
+        elif command is None:
+            i += 1
+            continue
+        upper = command.upper()
+        n = _PARAMETER_COUNTS.get(upper)
+        if n is None or i + n > count:
+            break
+        try:
+            values = [float(value) for value in tokens[i:i + n]]
+        except ValueError:
+            break
+        i += n
+        relative = command.islower()
+        ox, oy = (x, y) if relative else (0.0, 0.0)
+        if upper != "M" and not points:
+            points = [(x, y)]   # Z の後に M なしで続くコマンドは閉じた始点から始める
+
+        if upper == "M":
+            if len(points) > 1:
+                subpaths.append(points)
+            x, y = values[0] + ox, values[1] + oy
+            start_x, start_y = x, y
+            points = [(x, y)]
+            command = "l" if relative else "L"  # Mに続く座標は直線
+        elif upper == "L":
+            x, y = values[0] + ox, values[1] + oy
+            points.append((x, y))
+        elif upper == "H":
+            x = values[0] + ox
+            points.append((x, y))
+        elif upper == "V":
+            y = values[0] + oy
+            points.append((x, y))
+        elif upper in "CS":
+            if upper == "C":
+                x1, y1 = values[0] + ox, values[1] + oy
+                rest = values[2:]
+            else:
+                x1, y1 = (2 * x - control_x, 2 * y - control_y) if previous in "CS" else (x, y)
+                rest = values
+            x2, y2 = rest[0] + ox, rest[1] + oy
+            x3, y3 = rest[2] + ox, rest[3] + oy
+            _flatten_cubic(points, x, y, x1, y1, x2, y2, x3, y3, tolerance)
+            control_x, control_y = x2, y2
+            x, y = x3, y3
+        elif upper in "QT":
+            if upper == "Q":
+                x1, y1 = values[0] + ox, values[1] + oy
+                x2, y2 = values[2] + ox, values[3] + oy
+            else:
+                x1, y1 = (2 * x - control_x, 2 * y - control_y) if previous in "QT" else (x, y)
+                x2, y2 = values[0] + ox, values[1] + oy
+            _flatten_quadratic(points, x, y, x1, y1, x2, y2, tolerance)
+            control_x, control_y = x1, y1
+            x, y = x2, y2
+        elif upper == "A":
+            x, y = values[5] + ox, values[6] + oy
+            points.append((x, y))
+        previous = upper
+    if len(points) > 1:
+        subpaths.append(points)
+    return [np.array(subpath, dtype=np.float64) for subpath in subpaths if len(subpath) > 1]
+
+
+def _ellipse(cx, cy, rx, ry, tolerance):
+    """楕円を誤差 tolerance 以内の閉じた折れ線にする"""
+    radius = max(rx, ry)
+    if radius <= 0:
+        return None
+    step = 2 * math.acos(max(-1.0, 1 - tolerance / radius)) if tolerance < radius else math.pi / 2
+    n = max(8, int(math.ceil(2 * math.pi / step)))
+    angles = np.linspace(0, 2 * math.pi, n + 1)
+    points = np.stack([cx + rx * np.cos(angles), cy + ry * np.sin(angles)], axis=1)
+    points[-1] = points[0]
+    return points
+
+
+def shape_paths(name, attributes, tolerance=DEFAULT_TOLERANCE):
+    """図形の要素を折れ線のリストにする（対応しない要素は空のリスト）"""
+    get = attributes.get
+    if name == "path":
+        return parse_path_data(get("d", ""), tolerance)
+    if name in ("polyline", "polygon"):
+        values = _numbers(get("points"))
+        points = np.array(values[:len(values) // 2 * 2], dtype=np.float64).reshape(-1, 2)
+        if name == "polygon" and len(points) > 2:
+            points = np.vstack([points, points[:1]])
+        return [points] if len(points) > 1 else []
+    if name == "line":
+        return [np.array([[_length(get("x1"), 0.0), _length(get("y1"), 0.0)],
+                          [_length(get("x2"), 0.0), _length(get("y2"), 0.0)]])]
+    if name == "rect":
+        x, y = _length(get("x"), 0.0), _length(get("y"), 0.0)
+        w, h = _length(get("width"), 0.0), _length(get("height"), 0.0)
+        if w <= 0 or h <= 0:
+            return []
+        return [np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h], [x, y]], dtype=np.float64)]
+    if name in ("circle", "ellipse"):
+        r = _length(get("r"), 0.0)
+        rx = _length(get("rx"), r) if name == "ellipse" else r
+        ry = _length(get("ry"), r) if name == "ellipse" else r
+        points = _ellipse(_length(get("cx"), 0.0), _length(get("cy"), 0.0), rx, ry, tolerance)
+        return [] if points is None else [points]
+    return []
+
+
+def _apply(matrix, points):
+    if matrix == _IDENTITY:
+        return points
+    a, b, c, d, e, f = matrix
+    return points @ np.array([[a, b], [c, d]]) + (e, f)
+
+
+def _root_matrix(attributes):
+    """ルートの viewBox を width・height に合わせる変換と、画像の大きさ (幅, 高さ)"""
+    view_box = _numbers(attributes.get("viewBox"))
+    width = _length(attributes.get("width"))
+    height = _length(attributes.get("height"))
+    if len(view_box) != 4 or view_box[2] <= 0 or view_box[3] <= 0:
+        return _IDENTITY, width, height
+    vx, vy, vw, vh = view_box
+    width = width or vw
+    height = height or vh
+    sx, sy = width / vw, height / vh
+    return (sx, 0.0, 0.0, sy, -vx * sx, -vy * sy), width, height
+
+
+def read_svg(source, tolerance=DEFAULT_TOLERANCE):
+    """SVGファイル（パスまたはバイナリのファイルオブジェクト）を読み、SVGDocument を返す
+
+    paths は画像座標（viewBox と transform を適用済み）の (N, 2) 配列のリスト。
+    大きさの指定がない場合、width と height は None。
+    """
+    if tolerance <= 0:
+        raise ValueError("許容誤差は正の値にしてください")
+    paths = []
+    pending = []            # まとめて変換する (paths の位置, d 属性, 変換)
+    matrices = []           # 開いている要素ごとの変換（親の変換を合成済み）
+    skip_depth = 0          # 描画されない要素の中にいる深さ
+    size = {"width": None, "height": None}
+
+    def flush():
+        arrays = _parse_line_batch([d for _, d, _ in pending])
+        for i, (index, d, matrix) in enumerate(pending):
+            if arrays is not None:
+                points = arrays[i]
+            else:
+                subpaths = parse_path_data(d, tolerance)
+                points = subpaths[0] if subpaths else None
+            if points is not None and len(points) > 1:
+                paths[index] = _apply(matrix, points)
+        pending.clear()
+
+    def start(tag, attributes):
+        nonlocal skip_depth
+        name = tag.rsplit(":", 1)[-1]
+        parent = matrices[-1] if matrices else _IDENTITY
+        if not matrices and name == "svg":
+            matrix, size["width"], size["height"] = _root_matrix(attributes)
+            parent = multiply(parent, matrix)
+        matrix = multiply(parent, parse_transform(attributes["transform"])) if "transform" in attributes else parent
+        matrices.append(matrix)
+        if skip_depth or name in _SKIPPED:
+            skip_depth += 1
+            return
+        if name == "path" and attributes.get("d", "").translate(_LINE_ONLY) == "M":
+            pending.append((len(paths), attributes["d"], matrix))
+            paths.append(None)
+            if len(pending) >= BATCH_PATHS:
+                flush()
+            return
+        for points in shape_paths(name, attributes, tolerance):
+            paths.append(_apply(matrix, points))
+
+    def end(tag):
+        nonlocal skip_depth
+        matrices.pop()
+        if skip_depth:
+            skip_depth -= 1
+
+    parser = xml.parsers.expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.buffer_text = True
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                _feed(parser, f)
+        else:
+            _feed(parser, source)
+    except xml.parsers.expat.ExpatError as e:
+        raise ValueError(f"SVGとして読み込めません: {e}") from None
+    flush()
+    return SVGDocument(size["width"], size["height"], [points for points in paths if points is not None])
+
+
+def _feed(parser, f):
+    while True:
+        chunk = f.read(READ_CHUNK)
+        parser.Parse(chunk, not chunk)
+        if not chunk:
+            return
+
+
+def to_point_lists(paths, scale=(1.0, 1.0)):
+    """配列のパスをエディタのパス（(x, y) のタプルのリスト）にする"""
+    sx, sy = scale
+    result = []
+    for points in paths:
+        if sx != 1.0 or sy != 1.0:
+            points = points * (sx, sy)
+        result.append(list(zip(points[:, 0].tolist(), points[:, 1].tolist())))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SVGのパスを読み込み、編集可能な手動パスとしてプロジェクトに保存する")
+    parser.add_argument("svg")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="曲線を折れ線にする許容誤差（画素）")
+    parser.add_argument("--image", help="パスを重ねる元画像（--project を指定するときは必須）")
+    parser.add_argument("--project", help="読み込んだパスを手動パスとしてプロジェクトファイルに保存する")
+    args = parser.parse_args(argv)
+    if args.project and not args.image:
+        parser.error("--project には --image が必要です")
+
+    start = time.perf_counter()
+    try:
+        document = read_svg(args.svg, args.tolerance)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    points = sum(len(path) for path in document.paths)
+    print(f"{len(document.paths)}パス / {points}点 ({elapsed:.2f}秒) "
+          f"大きさ: {document.width or '-'} x {document.height or '-'}")
+
+    if args.project:
+        from SVG_maker_headless import load_headless_image, make_headless_editor
+
+        editor = make_headless_editor()
+        editor.redraw_suspended = True
+        if not load_headless_image(editor, args.image):
+            print(f"画像を読み込めません: {args.image}", file=sys.stderr)
+            return 1
+        added = editor.import_svg_document(document)
+        editor.export_project(args.project)
+        print(f"{added}パスを手動パスとして保存しました -> {args.project}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())